@@ -0,0 +1,115 @@
+# Description: Async tool-calling agent loop for the Inflection AI OpenAI compatible API.
+import json
+import asyncio
+import logging
+import inspect
+from typing import Any, Callable, Dict, List, Optional
+from deadline import step, timeout_for
+from inference import fetch_message
+
+logger = logging.getLogger(__name__)
+
+
+class ToolRegistry:
+    """
+    Maps tool names to Python callables, keyed by the schemas sent to the model in the `tools` list.
+
+    Tools can be sync or async functions taking the schema's parameters as keyword arguments. Sync
+    tools run in a worker thread so they never block the event loop.
+    """
+
+    def __init__(self, default_timeout: float = 10.0):
+        self.default_timeout = default_timeout
+        self._tools: Dict[str, Dict[str, Any]] = {}
+
+    def register(self, schema: Dict[str, Any], function: Optional[Callable] = None, timeout: Optional[float] = None):
+        """
+        Registers `function` under the name in `schema`, a `tool_list` entry such as
+        {"type": "function", "function": {"name": "get_weather", "parameters": {...}}}.
+        Can also be used as a decorator: `@registry.register(schema)`.
+        """
+        def decorator(function: Callable) -> Callable:
+            name = schema["function"]["name"]
+            self._tools[name] = {
+                "schema": schema,
+                "function": function,
+                "timeout": timeout if timeout is not None else self.default_timeout,
+            }
+            return function
+
+        return decorator(function) if function is not None else decorator
+
+    @property
+    def tool_list(self) -> List[Dict[str, Any]]:
+        return [tool["schema"] for tool in self._tools.values()]
+
+    async def call(self, tool_call: Dict[str, Any]) -> Dict[str, str]:
+        """Executes one tool call from an assistant message and returns the `tool` message with its result."""
+        name = tool_call["function"]["name"]
+        tool = self._tools.get(name)
+        if tool is None:
+            result = {"error": f"Unknown tool '{name}'"}
+        else:
+            # Under a deadline, the tool gets whatever is left of it if that's shorter than its own timeout
+            async with step(f"tool {name}"):
+                try:
+                    arguments = json.loads(tool_call["function"].get("arguments") or "{}")
+                    function = tool["function"]
+                    if inspect.iscoroutinefunction(function):
+                        coro = function(**arguments)
+                    else:
+                        coro = asyncio.to_thread(function, **arguments)
+                    result = await asyncio.wait_for(coro, timeout_for(tool["timeout"]))
+                except asyncio.TimeoutError:
+                    result = {"error": f"Tool '{name}' timed out"}
+                except Exception as e:
+                    logger.error(f"Tool '{name}' failed: {str(e)}")
+                    result = {"error": str(e)}
+
+        return {
+            "role": "tool",
+            "tool_call_id": tool_call["id"],
+            "content": result if isinstance(result, str) else json.dumps(result),
+        }
+
+
+async def run_agent(
+        messages: List[Dict[str, Any]],
+        registry: ToolRegistry,
+        model: str = "inflection_3_with_tools",
+        max_iterations: int = 5,
+        temperature: float = 0.0,
+        ) -> Optional[str]:
+    """
+    Runs the model with the registered tools until it answers without calling a tool.
+
+    All tool calls returned in one assistant turn are executed concurrently, so a question needing
+    several tools costs one model round trip per turn rather than one per tool.
+
+    Args:
+        messages: The conversation so far in the OpenAI (role/content) format. It is not modified.
+        registry: The tools the model may call.
+        max_iterations: Maximum number of model round trips before giving up.
+
+    Returns:
+        Optional: The final assistant response, or None if an error occurs or the iteration limit is hit.
+    """
+    # Work on one list that grows in place; only the new turns are appended each iteration
+    messages = list(messages)
+    tools = registry.tool_list
+
+    for iteration in range(max_iterations):
+        message = await fetch_message(messages, model=model, tools=tools, temperature=temperature)
+        if message is None:
+            return None
+
+        tool_calls = message.get("tool_calls")
+        if not tool_calls:
+            return message.get("content")
+
+        logger.info(f"Running {len(tool_calls)} tool call(s) in iteration {iteration + 1}")
+        messages.append(message)
+        messages.extend(await asyncio.gather(*(registry.call(tool_call) for tool_call in tool_calls)))
+
+    logger.error(f"Agent stopped after reaching max_iterations={max_iterations}")
+    return None
@@ -0,0 +1,281 @@
+# Description: Client-side load balancing over several (base URL, API key) backends with latency-aware selection, health checks and per-key quotas.
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence
+import aiohttp
+import cassettes
+
+logger = logging.getLogger(__name__)
+
+
+class NoBackendAvailable(Exception):
+    """Raised when every backend is out of quota."""
+
+
+def retry_after_seconds(value: Optional[str], default: float = 60.0) -> float:
+    """Seconds to wait from a Retry-After header, given either as seconds or as an HTTP date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid Retry-After header '{value}', waiting {default:.0f} s")
+        return default
+
+
+class KeyQuota:
+    """Requests sent with one API key in the last minute, shared by every backend using the key."""
+
+    def __init__(self, requests_per_minute: Optional[int] = None):
+        self.requests_per_minute = requests_per_minute
+        self.sent: Deque[float] = deque()
+        self.blocked_until = 0.0  # set from the Retry-After of a 429 response
+
+    def available(self, now: float) -> bool:
+        if now < self.blocked_until:
+            return False
+        while self.sent and self.sent[0] <= now - 60:
+            self.sent.popleft()
+        return self.requests_per_minute is None or len(self.sent) < self.requests_per_minute
+
+    def consume(self, now: float) -> None:
+        self.sent.append(now)
+
+
+class Backend:
+    """One endpoint and key, with the state the balancer keeps about it."""
+
+    def __init__(self, base_url: str, api_key: str, weight: float = 1.0, quota: Optional[KeyQuota] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.weight = weight
+        self.quota = quota or KeyQuota()
+        self.outstanding = 0
+        self.ewma: Optional[float] = None  # seconds
+        self.failures = 0  # consecutive
+        self.ejections = 0  # consecutive, for the ejection backoff
+        self.ejected_until = 0.0
+        self.probing = False  # a request is testing the backend after its ejection time
+        self.stats = {"requests": 0, "errors": 0, "ejections": 0}
+
+    @property
+    def name(self) -> str:
+        # Only the end of the key, it ends up in logs
+        return f"{self.base_url} (key ...{self.api_key[-4:]})"
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def admits(self, now: float) -> bool:
+        # Once the ejection time has passed, a single probe request is let through; its success brings
+        # the backend back to full traffic, its failure re-ejects it for twice as long
+        return self.healthy(now) and not (self.ejections and self.probing)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma * 1000, 2) if self.ewma is not None else None,
+            "healthy": self.healthy(time.monotonic()),
+        }
+
+
+class LoadBalancer:
+    """
+    Spreads requests over a pool of backends.
+
+    Args:
+        backends: The pool.
+        strategy: "ewma" picks the lowest latency EWMA times outstanding requests, "least_outstanding"
+            the fewest outstanding requests, both divided by the backend weight.
+        failure_threshold: Consecutive failures (connection errors, timeouts, 5xx) after which a backend is ejected.
+        ejection_time: Seconds a backend stays ejected the first time, doubled on every consecutive ejection.
+        max_ejection_time: Upper bound of the ejection time.
+        max_attempts: Backends tried for one request before the error is raised.
+        decay: Weight of the newest latency in the EWMA.
+        health_path: Path probed by the active health checks, see `check_health`.
+    """
+
+    def __init__(
+            self,
+            backends: Sequence[Backend],
+            strategy: str = "ewma",
+            failure_threshold: int = 3,
+            ejection_time: float = 10.0,
+            max_ejection_time: float = 300.0,
+            max_attempts: int = 2,
+            decay: float = 0.3,
+            health_path: str = "/",
+            ):
+        if not backends:
+            raise ValueError("The load balancer needs at least one backend")
+        if strategy not in ("ewma", "least_outstanding"):
+            raise ValueError(f"Unknown strategy '{strategy}', expected 'ewma' or 'least_outstanding'")
+        self.backends = list(backends)
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.ejection_time = ejection_time
+        self.max_ejection_time = max_ejection_time
+        self.max_attempts = max_attempts
+        self.decay = decay
+        self.health_path = health_path
+        self._health_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["LoadBalancer"]:
+        """
+        The pool configured in INFLECTION_BACKENDS, a comma separated list of `base_url|api_key` or
+        `base_url|api_key|requests_per_minute` entries, or None if it isn't set.
+        """
+        spec = os.getenv("INFLECTION_BACKENDS")
+        if not spec:
+            return None
+        quotas: Dict[str, KeyQuota] = {}
+        backends = []
+        for entry in spec.split(","):
+            base_url, api_key, *limit = entry.strip().split("|")
+            quota = quotas.setdefault(api_key, KeyQuota(int(limit[0]) if limit else None))
+            backends.append(Backend(base_url, api_key, quota=quota))
+        return cls(backends, strategy=os.getenv("INFLECTION_BALANCER_STRATEGY", "ewma"))
+
+    def _score(self, backend: Backend) -> float:
+        if self.strategy == "least_outstanding":
+            return backend.outstanding / backend.weight
+        known = [b.ewma for b in self.backends if b.ewma is not None]
+        # Backends without samples yet are scored like an average one, so they get tried
+        latency = backend.ewma if backend.ewma is not None else (sum(known) / len(known) if known else 1.0)
+        return latency * (backend.outstanding + 1) / backend.weight
+
+    def pick(self, exclude: Sequence[Backend] = ()) -> Backend:
+        now = time.monotonic()
+        candidates = [b for b in self.backends if b not in exclude and b.quota.available(now)]
+        if not candidates:
+            raise NoBackendAvailable("Every backend is out of quota")
+        healthy = [b for b in candidates if b.admits(now)]
+        # With every backend ejected, keep sending rather than failing everything
+        candidates = healthy or candidates
+        best = min(self._score(b) for b in candidates)
+        return random.choice([b for b in candidates if self._score(b) == best])
+
+    def _success(self, backend: Backend, latency: float) -> None:
+        backend.ewma = latency if backend.ewma is None else self.decay * latency + (1 - self.decay) * backend.ewma
+        self._recover(backend)
+
+    def _recover(self, backend: Backend) -> None:
+        if backend.ejections:
+            logger.info(f"Backend {backend.name} recovered")
+        backend.failures = 0
+        backend.ejections = 0
+        backend.ejected_until = 0.0
+
+    def _failure(self, backend: Backend) -> None:
+        backend.failures += 1
+        backend.stats["errors"] += 1
+        if backend.failures >= self.failure_threshold:
+            duration = min(self.max_ejection_time, self.ejection_time * 2 ** backend.ejections)
+            backend.ejections += 1
+            backend.stats["ejections"] += 1
+            backend.ejected_until = time.monotonic() + duration
+            logger.warning(f"Ejected backend {backend.name} for {duration:.0f} s after {backend.failures} failure(s)")
+
+    async def request_json(
+            self,
+            session: aiohttp.ClientSession,
+            method: str,
+            path: str,
+            headers: Optional[Dict[str, str]] = None,
+            data: Optional[bytes] = None,
+            params: Optional[Dict[str, Any]] = None,
+            ) -> Any:
+        """
+        Sends the request to `path` on the best backend, with its API key, and returns the decoded JSON body.
+        Connection errors, timeouts, 429 and 5xx responses are retried on another backend.
+        """
+        tried: List[Backend] = []
+        while True:
+            backend = self.pick(exclude=tried)
+            tried.append(backend)
+            now = time.monotonic()
+            probe = bool(backend.ejections) and backend.admits(now)
+            backend.probing = backend.probing or probe
+            backend.quota.consume(now)
+            backend.outstanding += 1
+            backend.stats["requests"] += 1
+            try:
+                result = await cassettes.request_json(
+                    session, method, backend.base_url + path,
+                    headers={**(headers or {}), "Authorization": f"Bearer {backend.api_key}"}, data=data, params=params)
+            except aiohttp.ClientResponseError as e:
+                if e.status == 429:
+                    retry_after = retry_after_seconds((e.headers or {}).get("Retry-After"))
+                    backend.quota.blocked_until = time.monotonic() + retry_after
+                    logger.warning(f"Backend {backend.name} is rate limited")
+                elif e.status >= 500:
+                    self._failure(backend)
+                else:
+                    raise
+                if len(tried) >= min(self.max_attempts, len(self.backends)):
+                    raise
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                self._failure(backend)
+                if len(tried) >= min(self.max_attempts, len(self.backends)):
+                    raise
+            else:
+                self._success(backend, time.monotonic() - now)
+                return result
+            finally:
+                backend.outstanding -= 1
+                if probe:
+                    backend.probing = False
+            logger.info(f"Retrying on another backend after a failure of {backend.name}")
+
+    async def check_health(self, session: aiohttp.ClientSession) -> Dict[str, bool]:
+        """
+        Probes every backend with a GET of `health_path`. Any response below 500 counts as healthy and
+        brings an ejected backend back; errors count as failures, so a dead backend is ejected even
+        without traffic.
+        """
+        async def probe(backend: Backend) -> bool:
+            try:
+                async with session.get(backend.base_url + self.health_path,
+                                       headers={"Authorization": f"Bearer {backend.api_key}"}) as response:
+                    healthy = response.status < 500
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                healthy = False
+            if healthy:
+                self._recover(backend)
+            else:
+                self._failure(backend)
+            return healthy
+
+        results = await asyncio.gather(*(probe(backend) for backend in self.backends))
+        return {backend.base_url: healthy for backend, healthy in zip(self.backends, results)}
+
+    def start_health_checks(self, session: aiohttp.ClientSession, interval: float = 10.0) -> asyncio.Task:
+        """Runs `check_health` every `interval` seconds in the background until `close()`."""
+        async def loop() -> None:
+            while True:
+                await self.check_health(session)
+                await asyncio.sleep(interval)
+
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(loop())
+        return self._health_task
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        return {backend.name: backend.report() for backend in self.backends}
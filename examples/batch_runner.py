@@ -0,0 +1,242 @@
+# Description: Resumable JSONL batch runner: streams items through get_context + get_response with bounded concurrency, checkpointing progress.
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import importlib
+from typing import Any, Dict, List, Optional, Set
+from prompts import PromptTemplate, get_template, register_template, templates
+from scheduler import schedule_as
+from tokens import attribute_usage
+from utils import get_response
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """
+    Progress of a run: every input line below `watermark` is done, as are the lines in `done` above it.
+    `output_offset` is the size of the output file when the checkpoint was written; on resume the output
+    is truncated back to it, so results written after the last checkpoint aren't duplicated. If the output
+    is missing or shorter than that, the checkpoint is discarded and the run starts over.
+
+    Only lines above the watermark are kept, so the checkpoint stays small however long the input is.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.reset()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+            self.watermark = data["watermark"]
+            self.done = set(data["done"])
+            self.output_offset = data["output_offset"]
+            self.stats = data["stats"]
+
+    def reset(self) -> None:
+        self.watermark = 0
+        self.done: Set[int] = set()
+        self.output_offset = 0
+        self.stats = {"ok": 0, "error": 0}
+
+    def is_done(self, line_number: int) -> bool:
+        return line_number < self.watermark or line_number in self.done
+
+    def mark_done(self, line_number: int) -> None:
+        self.done.add(line_number)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self, output_offset: int) -> None:
+        self.output_offset = output_offset
+        if not self.path:
+            return
+        # Write then rename, so an interrupted save leaves the previous checkpoint intact
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump({"watermark": self.watermark, "done": sorted(self.done),
+                       "output_offset": output_offset, "stats": self.stats}, file)
+        os.replace(temporary_path, self.path)
+
+
+def load_prompts(path: str) -> None:
+    """Registers the system prompts of a JSON file mapping prompt ids to system prompt text."""
+    with open(path, encoding="utf-8") as file:
+        for name, system_prompt in json.load(file).items():
+            register_template(PromptTemplate(name, system_prompt))
+
+
+def count_lines(path: str) -> int:
+    with open(path, "rb") as file:
+        return sum(1 for line in file if line.strip())
+
+
+async def process_item(
+        item: Dict[str, Any],
+        model: str,
+        legacy_api: bool,
+        user_input_label: str,
+        default_keys: Optional[List[str]] = None,
+        ) -> Dict[str, Any]:
+    """Runs one input item, {"id", "prompt", "input", "keys"}, and returns its output record."""
+    output = {"id": item.get("id")}
+    try:
+        keys = item.get("keys") or default_keys
+        if not keys:
+            raise ValueError("The item has no keys to extract")
+        if item.get("prompt") not in templates:
+            raise ValueError(f"Unknown prompt id '{item.get('prompt')}'")
+        template = get_template(item["prompt"])
+        context = template.render(f"{item.get('label', user_input_label)}: {item['input']}", legacy_api=legacy_api)
+        result = await get_response(context, keys, model, legacy_api=legacy_api)
+        if not any(result.values()):
+            raise ValueError("None of the keys were found in the response")
+        output["result"] = result
+    except KeyError as e:
+        output["error"] = f"Missing field {e}"
+    except Exception as e:
+        output["error"] = str(e) or type(e).__name__
+    return output
+
+
+async def run_batch(
+        input_path: str,
+        output_path: str,
+        checkpoint_path: Optional[str] = None,
+        concurrency: int = 16,
+        model: str = "inflection_3_productivity",
+        legacy_api: bool = True,
+        user_input_label: str = "User's input",
+        default_keys: Optional[List[str]] = None,
+        checkpoint_every: int = 100,
+        progress_interval: float = 10.0,
+        ) -> Dict[str, int]:
+    """
+    Streams the items of `input_path` (JSONL) through the model and appends one record per item to
+    `output_path` (JSONL), in completion order. Memory use doesn't grow with the input: at most
+    `concurrency` items are in flight and lines are read as they are needed.
+
+    With `checkpoint_path`, progress is saved every `checkpoint_every` items and an interrupted
+    run started again with the same arguments resumes where it stopped.
+
+    Returns:
+        The number of "ok" and "error" items, including those of previous runs.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    total = count_lines(input_path)
+    # Items completed ahead of the oldest unfinished one are kept in the checkpoint; this caps them
+    max_ahead = concurrency * 64
+
+    output_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    if output_size < checkpoint.output_offset:
+        # Truncating would pad the file with zero bytes, and the results it should hold are gone anyway
+        logger.warning(f"{output_path} is missing or shorter than its checkpoint ({output_size} < "
+                       f"{checkpoint.output_offset} bytes), discarding the checkpoint and starting over")
+        checkpoint.reset()
+    mode = "r+b" if checkpoint.output_offset else "wb"
+    with open(input_path, encoding="utf-8") as input_file, open(output_path, mode) as output_file:
+        output_file.truncate(checkpoint.output_offset)
+        output_file.seek(checkpoint.output_offset)
+        skipped = checkpoint.watermark + len(checkpoint.done)
+        if skipped:
+            logger.info(f"Resuming {input_path}: {skipped} of {total} item(s) already done")
+
+        start_time = time.time()
+        completed, last_progress, since_checkpoint = 0, start_time, 0
+        pending: Set[asyncio.Task] = set()
+
+        def report_progress() -> None:
+            elapsed = time.time() - start_time
+            rate = completed / elapsed if elapsed else 0.0
+            left = total - skipped - completed
+            eta = f"{left / rate:.0f} s" if rate else "unknown"
+            logger.info(f"{skipped + completed}/{total} items ({checkpoint.stats['error']} errors), "
+                        f"{rate:.1f} items/s, ETA {eta}")
+
+        async def run(line_number: int, item: Dict[str, Any]):
+            return line_number, await process_item(item, model, legacy_api, user_input_label, default_keys)
+
+        async def collect() -> None:
+            nonlocal completed, last_progress, since_checkpoint
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.remove(task)
+                line_number, output = task.result()
+                output_file.write((json.dumps(output, ensure_ascii=False) + "\n").encode("utf-8"))
+                checkpoint.stats["error" if "error" in output else "ok"] += 1
+                checkpoint.mark_done(line_number)
+                completed += 1
+                since_checkpoint += 1
+            if since_checkpoint >= checkpoint_every:
+                output_file.flush()
+                checkpoint.save(output_file.tell())
+                since_checkpoint = 0
+            if time.time() - last_progress >= progress_interval:
+                report_progress()
+                last_progress = time.time()
+
+        try:
+            with schedule_as("batch"), attribute_usage("batch_runner"):
+                for line_number, line in enumerate(line for line in input_file if line.strip()):
+                    if checkpoint.is_done(line_number):
+                        continue
+                    while len(pending) >= concurrency or (pending and line_number - checkpoint.watermark >= max_ahead):
+                        await collect()
+                    try:
+                        item = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        output_file.write((json.dumps({"id": None, "line": line_number, "error": f"Invalid JSON: {e}"}) + "\n").encode("utf-8"))
+                        checkpoint.stats["error"] += 1
+                        checkpoint.mark_done(line_number)
+                        continue
+                    pending.add(asyncio.create_task(run(line_number, item)))
+                while pending:
+                    await collect()
+        finally:
+            # Also on interruption: the results written so far are kept, unfinished items are redone next time
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            output_file.flush()
+            checkpoint.save(output_file.tell())
+
+    report_progress()
+    return dict(checkpoint.stats)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through the model, resumably.")
+    parser.add_argument("input", help='Input JSONL, one {"id", "prompt", "input", "keys"} item per line')
+    parser.add_argument("output", help="Output JSONL, one {\"id\", \"result\"} or {\"id\", \"error\"} record per item")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--prompts", default=None, help="JSON file mapping prompt ids to system prompts")
+    parser.add_argument("--import", dest="modules", nargs="*", default=[],
+                        help="Modules that register prompt templates when imported, e.g. tests.helpers")
+    parser.add_argument("--keys", nargs="*", default=None, help="Keys to extract for items without their own")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--model", default="inflection_3_productivity")
+    parser.add_argument("--legacy-api", action="store_true")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        importlib.import_module(module)
+    if args.prompts:
+        load_prompts(args.prompts)
+    if not templates:
+        parser.error("No prompt templates registered, use --prompts or --import")
+
+    stats = asyncio.run(run_batch(args.input, args.output, args.checkpoint or args.output + ".checkpoint",
+                                  args.concurrency, args.model, args.legacy_api, default_keys=args.keys,
+                                  progress_interval=args.progress_interval))
+    logger.info(f"Done: {stats['ok']} ok, {stats['error']} error(s), results in {args.output}")
+    return 1 if stats["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+# Description: Record/replay of HTTP request/response pairs ("cassettes") so tests and evals can run deterministically without network access.
+import os
+import json
+import atexit
+import time
+import codecs
+import asyncio
+import hashlib
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlencode, urlsplit
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+logger = logging.getLogger(__name__)
+
+modes = ("off", "record", "replay")
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+def request_key(method: str, url: str, body: Any = None, params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Canonical hash of a request: method, URL path and query, and body with JSON keys sorted.
+    The host is left out so recordings replay against any BASE_URL, and headers are left out so
+    API keys never influence (or end up in) a cassette.
+    """
+    parts = urlsplit(url)
+    query = parts.query
+    if params:
+        query = "&".join(filter(None, [query, urlencode(sorted((k, str(v)) for k, v in params.items()))]))
+    if isinstance(body, (bytes, bytearray)):
+        body = body.decode("utf-8", errors="replace")
+    if isinstance(body, str):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            pass
+    canonical = json.dumps([method.upper(), parts.path, query, body], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class Cassette:
+    """
+    Recorded responses keyed by `request_key`, stored as one compact JSON line per request.
+
+    Each entry keeps the status, the content type and the body as a list of [offset_ms, text] chunks,
+    the offset being the time since the request was sent, so streamed responses replay chunk by chunk.
+
+    Args:
+        path: The cassette file, None for an in-memory cassette.
+        mode: "record" performs real requests and saves them, "replay" serves recorded responses only,
+            "off" sends requests untouched.
+        replay_latency: In replay mode, wait the recorded time before each chunk instead of answering instantly.
+    """
+
+    def __init__(self, path: Optional[str], mode: str = "replay", replay_latency: bool = False):
+        if mode not in modes:
+            raise ValueError(f"Unknown cassette mode '{mode}', expected one of {modes}")
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.modified = False
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    def get(self, key: str, method: str, url: str) -> Dict[str, Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            raise CassetteMiss(f"No recorded response for {method} {urlsplit(url).path} ({key[:12]}) in {self.path}")
+        return entry
+
+    def put(self, key: str, method: str, url: str, status: int, content_type: str, chunks: List[List[Any]]) -> None:
+        self.entries[key] = {
+            "key": key,
+            "method": method.upper(),
+            "path": urlsplit(url).path,
+            "status": status,
+            "content_type": content_type,
+            "chunks": chunks,
+        }
+        self.modified = True
+
+    def save(self) -> None:
+        if not self.modified or not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            for entry in self.entries.values():
+                file.write(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self.modified = False
+        logger.info(f"Saved {len(self.entries)} recorded response(s) to {self.path}")
+
+    async def play(self, entry: Dict[str, Any]) -> str:
+        """Returns the recorded body, waiting the recorded chunk offsets when `replay_latency` is set."""
+        if not self.replay_latency:
+            return "".join(text for _, text in entry["chunks"])
+        body, elapsed = [], 0.0
+        for offset_ms, text in entry["chunks"]:
+            await asyncio.sleep(max(0.0, offset_ms - elapsed) / 1000)
+            elapsed = offset_ms
+            body.append(text)
+        return "".join(body)
+
+
+class Recorder:
+    """Collects decoded body chunks with their offset from the start of the request."""
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.chunks: List[List[Any]] = []
+
+    def feed(self, data: bytes, final: bool = False) -> None:
+        text = self.decoder.decode(data, final=final)
+        if text:
+            self.chunks.append([round((time.perf_counter() - self.start_time) * 1000, 1), text])
+
+
+_cassette: Optional[Cassette] = None
+
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    Returns the active cassette: the one set by `use_cassette`, or one configured by the
+    CASSETTE_MODE / CASSETTE_PATH / CASSETTE_LATENCY environment variables. None when disabled.
+    """
+    global _cassette
+    if _cassette is None:
+        mode = os.getenv("CASSETTE_MODE", "off")
+        if mode != "off":
+            path = os.getenv("CASSETTE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "cassettes", "default.jsonl"))
+            _cassette = Cassette(path, mode, os.getenv("CASSETTE_LATENCY") == "1")
+            atexit.register(_cassette.save)
+    return _cassette
+
+
+@contextmanager
+def use_cassette(path: Optional[str], mode: str = "replay", replay_latency: bool = False) -> Iterator[Cassette]:
+    """Activates a cassette for the duration of the block and saves new recordings on exit."""
+    global _cassette
+    previous, _cassette = _cassette, Cassette(path, mode, replay_latency)
+    try:
+        yield _cassette
+    finally:
+        _cassette.save()
+        _cassette = previous
+
+
+async def request_json(
+        session: aiohttp.ClientSession,
+        method: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        data: Optional[bytes] = None,
+        params: Optional[Dict[str, Any]] = None,
+        ) -> Any:
+    """
+    Sends an aiohttp request through the active cassette, if any, and returns the decoded JSON body.
+    Raises `aiohttp.ClientResponseError` for error statuses, recorded or live.
+    """
+    cassette = get_cassette()
+    if cassette is None or cassette.mode == "off":
+        async with session.request(method, url, headers=headers, data=data, params=params) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    key = request_key(method, url, data, params)
+    if cassette.mode == "replay":
+        entry = cassette.get(key, method, url)
+        body = await cassette.play(entry)
+        if entry["status"] >= 400:
+            request_info = aiohttp.RequestInfo(URL(url), method.upper(), CIMultiDictProxy(CIMultiDict()))
+            raise aiohttp.ClientResponseError(request_info, (), status=entry["status"], message=body)
+        return json.loads(body)
+
+    recorder = Recorder()
+    async with session.request(method, url, headers=headers, data=data, params=params) as response:
+        async for data_chunk in response.content.iter_any():
+            recorder.feed(data_chunk)
+        recorder.feed(b"", final=True)
+        cassette.put(key, method, url, response.status, response.content_type, recorder.chunks)
+        response.raise_for_status()
+    return json.loads("".join(text for _, text in recorder.chunks))
+
+
+try:
+    import httpx
+except ImportError:  # httpx ships with openai, only needed for the judge client
+    httpx = None
+
+if httpx is not None:
+    class CassetteTransport(httpx.AsyncBaseTransport):
+        """httpx transport that records or replays through the active cassette, for OpenAI SDK clients."""
+
+        def __init__(self, transport: Optional["httpx.AsyncBaseTransport"] = None):
+            self.transport = transport or httpx.AsyncHTTPTransport()
+
+        async def handle_async_request(self, request: "httpx.Request") -> "httpx.Response":
+            cassette = get_cassette()
+            if cassette is None or cassette.mode == "off":
+                return await self.transport.handle_async_request(request)
+
+            url = str(request.url)
+            key = request_key(request.method, url, await request.aread())
+            if cassette.mode == "replay":
+                entry = cassette.get(key, request.method, url)
+                body = await cassette.play(entry)
+                return httpx.Response(entry["status"], headers={"content-type": entry["content_type"]},
+                                      content=body.encode(), request=request)
+
+            recorder = Recorder()
+            response = await self.transport.handle_async_request(request)
+            # Reading through a Response decodes any content-encoding, so recordings are plain text
+            response = httpx.Response(response.status_code, headers=response.headers, stream=response.stream, request=request)
+            try:
+                async for data_chunk in response.aiter_bytes():
+                    recorder.feed(data_chunk)
+                recorder.feed(b"", final=True)
+            finally:
+                await response.aclose()
+            content_type = response.headers.get("content-type", "application/json")
+            cassette.put(key, request.method, url, response.status_code, content_type, recorder.chunks)
+            return httpx.Response(response.status_code, headers={"content-type": content_type},
+                                  content="".join(text for _, text in recorder.chunks).encode(), request=request)
+
+        async def aclose(self) -> None:
+            await self.transport.aclose()
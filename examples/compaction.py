@@ -0,0 +1,98 @@
+# Description: Compacts markdown artifacts before they are embedded in prompts, with a reversible map for the URLs it shortens.
+import re
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, NamedTuple
+
+_image_pattern = re.compile(r"!\[[^\]]*\]\([^)]*\)\s*")
+_link_pattern = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+_url_pattern = re.compile(r"https?://[^\s)\]|>]+")
+_table_separator_pattern = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?$")
+_rule_pattern = re.compile(r"^(-{3,}|\*{3,}|_{3,})$")
+_emphasis_pattern = re.compile(r"(\*\*|__)(.+?)\1")
+_heading_pattern = re.compile(r"^#{1,6}\s+")
+_reference_pattern = re.compile(r"\[(r\d+)\]")
+
+
+class CompactArtifact(NamedTuple):
+    text: str
+    references: Dict[str, str]  # reference id (e.g. "r1") -> original URL
+
+
+def _clean_url(url: str) -> str:
+    # Some artifacts carry stray quotes at the end of profile URLs
+    return url.strip("\"'”")
+
+
+def _strip_symbols(text: str) -> str:
+    return "".join(char for char in text if unicodedata.category(char) not in ("So", "Mn")).strip()
+
+
+def _compact_table_row(line: str) -> str:
+    cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+    return " | ".join(cells)
+
+
+def _compact(text: str) -> CompactArtifact:
+    references: Dict[str, str] = {}
+    ids: Dict[str, str] = {}
+
+    def reference(url: str) -> str:
+        url = _clean_url(url)
+        if url not in ids:
+            ids[url] = f"r{len(ids) + 1}"
+            references[ids[url]] = url
+        return ids[url]
+
+    text = _image_pattern.sub("", text)
+    text = _link_pattern.sub(lambda match: f"{match.group(1)} [{reference(match.group(2))}]", text)
+    text = _url_pattern.sub(lambda match: f"[{reference(match.group(0))}]", text)
+
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        quoted = line.startswith(">")
+        if quoted:
+            line = line.lstrip("> ").strip()
+        if _table_separator_pattern.match(line) or _rule_pattern.match(line):
+            continue
+        if line.startswith("|"):
+            line = _compact_table_row(line)
+        if _heading_pattern.match(line):
+            # Headings inside quotes are just attribution lines; section headings lose their icons
+            title = _strip_symbols(_heading_pattern.sub("", line))
+            line = title if quoted else f"# {title}"
+        line = _emphasis_pattern.sub(r"\2", line)
+        line = re.sub(r"[ \t]+", " ", line)
+        # At most one blank line between blocks
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return CompactArtifact("\n".join(lines).strip(), references)
+
+
+# Compacted artifacts by content hash; the same notifications are embedded in many prompts
+_memo: "OrderedDict[str, CompactArtifact]" = OrderedDict()
+memo_size = 128
+
+
+def compact_artifact(text: str) -> CompactArtifact:
+    """
+    Returns the compact form of a markdown artifact: tables as plain "a | b" rows, whitespace collapsed,
+    images, icons in headings, emphasis, blockquote and rule markup removed, and URLs replaced by short
+    reference ids such as [r1]. Use `expand_references` to restore the URLs in generated text.
+    """
+    key = hashlib.sha256(text.encode()).hexdigest()
+    compacted = _memo.get(key)
+    if compacted is None:
+        compacted = _memo[key] = _compact(text)
+        if len(_memo) > memo_size:
+            _memo.popitem(last=False)
+    else:
+        _memo.move_to_end(key)
+    return compacted
+
+
+def expand_references(text: str, references: Dict[str, str]) -> str:
+    """Replaces the [rN] reference ids in `text` (e.g. a generated reply) by their original URLs."""
+    return _reference_pattern.sub(lambda match: references.get(match.group(1), match.group(0)), text)
@@ -0,0 +1,324 @@
+# Description: Compliance engine that checks many functions against an indexed rule set concurrently, with cached verdicts.
+import os
+import re
+import ast
+import sys
+import json
+import asyncio
+import hashlib
+import logging
+import argparse
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from inference import fetch as fetch_inflection
+from packing import split_results
+from scheduler import schedule_as
+from utils import get_context, get_response
+
+logger = logging.getLogger(__name__)
+
+compliance_system_prompt = """
+You are a compliance expert with a deep understanding of regulatory requirements and best practices in the field. Your goal is to analyze the provided code and provided specification to ensure that they meet all necessary compliance standards.
+
+# Your Responsibilities
+1. You will receive a Python code implementation from the user.
+2. You will also receive an industry compliance specification that describes the expected behavior of the code.
+3. Based on these inputs, you must analyze the code and specification to identify any compliance issues.
+
+# Compliance Analysis Guidelines:
+- Identify if the code meets the specifications: yes or no
+- Provide an explanation of the compliance status: explain why the code is compliant or not
+- Provide recommendations for improvement: suggest changes to ensure compliance
+
+# Output Format - XML
+You will respond using XML tags. You don't need to provide explanation or any other information, just return the extracted parts within the appropriate XML tags.
+
+# Format of the Output:
+<parts>
+    <compliant>yes or no</compliant>
+    <explanation>explanation of the compliance status</explanation>
+    <recommendations>recommendations for improvement</recommendations>
+</parts>
+"""
+
+compliance_packed_instruction = """
+# Multiple Specifications
+You may receive several industry compliance specifications, each wrapped in <rule index="N"></rule> tags. Evaluate the code against every specification independently and wrap the complete output for each one in <result index="N"></result> tags carrying the same index.
+"""
+
+verdict_keys = ["compliant", "explanation", "recommendations"]
+
+_rule_pattern = re.compile(r"^(\d+)\.\s+([A-Za-z][A-Za-z \-]*):\s+(.+?)\s*$", re.MULTILINE)
+
+
+def sha256(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class Rule(NamedTuple):
+    id: int
+    title: str
+    text: str
+
+    @property
+    def hash(self) -> str:
+        return sha256(f"{self.title}: {self.text}")
+
+    def __str__(self) -> str:
+        return f"{self.id}. {self.title}: {self.text}"
+
+
+class RuleSet:
+    """The numbered "Title: description" rules of a compliance document, indexed by id and title."""
+
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules = list(rules)
+        self.by_id = {rule.id: rule for rule in self.rules}
+        self.by_title = {rule.title.lower(): rule for rule in self.rules}
+
+    @classmethod
+    def parse(cls, text: str) -> "RuleSet":
+        return cls([Rule(int(number), title.strip(), description) for number, title, description in _rule_pattern.findall(text)])
+
+    @classmethod
+    def load(cls, path: str) -> "RuleSet":
+        with open(path, encoding="utf-8") as file:
+            return cls.parse(file.read())
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def select(self, ids_or_titles: Sequence[str]) -> "RuleSet":
+        selected = []
+        for key in ids_or_titles:
+            rule = self.by_id.get(int(key)) if str(key).isdigit() else self.by_title.get(str(key).lower())
+            if rule is None:
+                raise KeyError(f"Unknown compliance rule '{key}'")
+            selected.append(rule)
+        return RuleSet(selected)
+
+
+class VerdictCache:
+    """
+    Verdicts keyed by (code hash, rule hash, model), optionally persisted to a JSON file so unchanged
+    code is never re-checked across runs.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.verdicts: Dict[str, Dict[str, str]] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self.verdicts = json.load(file)
+
+    @staticmethod
+    def key(code_hash: str, rule: Rule, model: str) -> str:
+        return f"{code_hash}:{rule.hash}:{model}"
+
+    def get(self, code_hash: str, rule: Rule, model: str) -> Optional[Dict[str, str]]:
+        return self.verdicts.get(self.key(code_hash, rule, model))
+
+    def put(self, code_hash: str, rule: Rule, model: str, verdict: Dict[str, str]) -> None:
+        self.verdicts[self.key(code_hash, rule, model)] = verdict
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.verdicts, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def normalize_verdict(parsed: Dict[str, object]) -> Optional[Dict[str, str]]:
+    """Returns the verdict with `compliant` as "yes"/"no", or None when the response didn't parse."""
+    compliant = str(parsed.get("compliant", "")).strip().lower()
+    if compliant not in ("yes", "no"):
+        return None
+    return {
+        "compliant": compliant,
+        "explanation": str(parsed.get("explanation", "")).strip(),
+        "recommendations": str(parsed.get("recommendations", "")).strip(),
+    }
+
+
+class ComplianceEngine:
+    """
+    Checks (function, rule) pairs concurrently.
+
+    Args:
+        rules: The rule set to check against.
+        cache: Verdict cache; verdicts found there are reused without a request.
+        rules_per_request: Number of rules packed into one request per function. 1 sends one rule per request.
+        concurrency: Maximum number of requests in flight.
+    """
+
+    def __init__(
+            self,
+            rules: RuleSet,
+            cache: Optional[VerdictCache] = None,
+            rules_per_request: int = 1,
+            concurrency: int = 8,
+            model: str = "inflection_3_productivity",
+            legacy_api: bool = True,
+            ):
+        self.rules = rules
+        self.cache = cache if cache is not None else VerdictCache()
+        self.rules_per_request = max(1, rules_per_request)
+        self.concurrency = concurrency
+        self.model = model
+        self.legacy_api = legacy_api
+
+    async def _check_one(self, code: str, rule: Rule) -> Optional[Dict[str, str]]:
+        query = f"User function: {code}\nIndustry compliance specification: {rule}"
+        context = get_context(compliance_system_prompt, query, legacy_api=self.legacy_api)
+        try:
+            parsed = await get_response(context, verdict_keys, self.model, legacy_api=self.legacy_api)
+        except Exception as e:
+            logger.error(f"Compliance check failed for rule {rule.id}: {str(e)}")
+            return None
+        return normalize_verdict(parsed)
+
+    async def _check_packed(self, code: str, rules: List[Rule]) -> Dict[int, Dict[str, str]]:
+        specifications = "\n".join(f'<rule index="{rule.id}">{rule}</rule>' for rule in rules)
+        query = f"User function: {code}\nIndustry compliance specifications:\n{specifications}"
+        context = get_context(compliance_system_prompt + compliance_packed_instruction, query, legacy_api=self.legacy_api)
+        response = await fetch_inflection(context, self.model, legacy_api=self.legacy_api)
+        verdicts = {}
+        for rule_id, parsed in split_results(response, verdict_keys, required=["compliant"]).items():
+            verdict = normalize_verdict(parsed)
+            if verdict is not None:
+                verdicts[rule_id] = verdict
+        return verdicts
+
+    async def check(self, functions: Dict[str, str]) -> Dict[str, object]:
+        """
+        Checks every function (name -> source code) against every rule and returns the report.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: Dict[str, Dict[int, Dict[str, object]]] = {name: {} for name in functions}
+        code_hashes = {name: sha256(code) for name, code in functions.items()}
+
+        async def check_single(name: str, rule: Rule) -> None:
+            async with semaphore:
+                verdict = await self._check_one(functions[name], rule)
+            record(name, rule, verdict)
+
+        async def check_group(name: str, rules: List[Rule]) -> None:
+            async with semaphore:
+                verdicts = await self._check_packed(functions[name], rules)
+            for rule in rules:
+                if rule.id in verdicts:
+                    record(name, rule, verdicts[rule.id])
+            # Re-issue only the rules the packed response didn't answer
+            await asyncio.gather(*(check_single(name, rule) for rule in rules if rule.id not in verdicts))
+
+        def record(name: str, rule: Rule, verdict: Optional[Dict[str, str]], cached: bool = False) -> None:
+            if verdict is not None and not cached:
+                self.cache.put(code_hashes[name], rule, self.model, verdict)
+            results[name][rule.id] = {
+                "rule_id": rule.id,
+                "rule": rule.title,
+                **(verdict or {"compliant": "error", "explanation": "", "recommendations": ""}),
+                "cached": cached,
+            }
+
+        jobs = []
+        for name in functions:
+            pending = []
+            for rule in self.rules:
+                verdict = self.cache.get(code_hashes[name], rule, self.model)
+                if verdict is not None:
+                    record(name, rule, verdict, cached=True)
+                else:
+                    pending.append(rule)
+            if self.rules_per_request == 1:
+                jobs += [check_single(name, rule) for rule in pending]
+            else:
+                jobs += [check_group(name, pending[i:i + self.rules_per_request])
+                         for i in range(0, len(pending), self.rules_per_request)]
+
+        # A compliance scan is bulk work, it must not delay interactive requests
+        with schedule_as("batch"):
+            await asyncio.gather(*jobs)
+        self.cache.save()
+        return self.report(functions, code_hashes, results)
+
+    def report(self, functions: Dict[str, str], code_hashes: Dict[str, str], results: Dict[str, Dict[int, Dict[str, object]]]) -> Dict[str, object]:
+        entries = []
+        for name in functions:
+            checks = [results[name][rule.id] for rule in self.rules]
+            entries.append({
+                "function": name,
+                "code_hash": code_hashes[name],
+                "compliant": all(check["compliant"] == "yes" for check in checks),
+                "checks": checks,
+            })
+        all_checks = [check for entry in entries for check in entry["checks"]]
+        return {
+            "model": self.model,
+            "rules": [{"id": rule.id, "title": rule.title, "hash": rule.hash} for rule in self.rules],
+            "functions": entries,
+            "summary": {
+                "functions": len(entries),
+                "checks": len(all_checks),
+                "cached": sum(check["cached"] for check in all_checks),
+                "non_compliant": sum(check["compliant"] == "no" for check in all_checks),
+                "errors": sum(check["compliant"] == "error" for check in all_checks),
+            },
+        }
+
+
+def extract_functions(path: str) -> Dict[str, str]:
+    """Returns the source of every top-level function and class in a Python file, keyed by "path::name"."""
+    with open(path, encoding="utf-8") as file:
+        source = file.read()
+    functions = {}
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            functions[f"{path}::{node.name}"] = ast.get_source_segment(source, node)
+    return functions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check Python functions against a compliance document.")
+    parser.add_argument("paths", nargs="+", help="Python files whose top-level functions are checked")
+    parser.add_argument("--rules", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "compliance_doc.txt"),
+                        help="Compliance document with numbered 'Title: description' rules")
+    parser.add_argument("--only", nargs="*", default=None, help="Rule ids or titles to check (default: all)")
+    parser.add_argument("--cache", default=".compliance_cache.json", help="Verdict cache file ('' to disable)")
+    parser.add_argument("--rules-per-request", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--model", default="inflection_3_productivity")
+    parser.add_argument("--legacy-api", action="store_true")
+    parser.add_argument("--output", default="-", help="Report path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    rules = RuleSet.load(args.rules)
+    if args.only:
+        rules = rules.select(args.only)
+    functions = {}
+    for path in args.paths:
+        functions.update(extract_functions(path))
+
+    engine = ComplianceEngine(rules, VerdictCache(args.cache or None), args.rules_per_request,
+                              args.concurrency, args.model, args.legacy_api)
+    report = asyncio.run(engine.check(functions))
+
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    summary = report["summary"]
+    logger.info(f"Checked {summary['functions']} function(s) against {len(rules)} rule(s): "
+                f"{summary['non_compliant']} non-compliant, {summary['errors']} error(s), {summary['cached']} cached")
+    # Non-zero exit code so CI fails on non-compliant code
+    return 1 if summary["non_compliant"] or summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+# Description: Deadlines that flow through multi-step pipelines via contextvars, with per-step timing and partial results.
+import asyncio
+import contextvars
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict, List, NamedTuple, Optional, TypeVar
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class StepTiming(NamedTuple):
+    name: str
+    start_ms: float  # since the deadline was set
+    duration_ms: float
+    status: str  # "ok", "error", "timeout" or "cancelled"
+
+
+class Deadline:
+    """The time budget of a pipeline run, with the timing of the steps run under it and their results so far."""
+
+    def __init__(self, timeout: float, parent: Optional["Deadline"] = None):
+        self.loop = asyncio.get_running_loop()
+        self.started_at = self.loop.time()
+        self.expires_at = self.started_at + timeout
+        if parent is not None:
+            # A nested deadline can only shorten the budget
+            self.expires_at = min(self.expires_at, parent.expires_at)
+        self.parent = parent
+        self.steps: List[StepTiming] = []
+        self.partial: Dict[str, Any] = {}
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self.loop.time())
+
+    @property
+    def expired(self) -> bool:
+        return self.loop.time() >= self.expires_at
+
+    def record(self, name: str, start_time: float, status: str) -> None:
+        deadline = self
+        while deadline is not None:
+            deadline.steps.append(StepTiming(
+                name,
+                round((start_time - deadline.started_at) * 1000, 2),
+                round((self.loop.time() - start_time) * 1000, 2),
+                status,
+            ))
+            deadline = deadline.parent
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "budget_ms": round((self.expires_at - self.started_at) * 1000, 2),
+            "elapsed_ms": round((self.loop.time() - self.started_at) * 1000, 2),
+            "expired": self.expired,
+            "steps": [step._asdict() for step in self.steps],
+            "partial": list(self.partial),
+        }
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a deadline passes. `deadline` holds the step timings and the partial results."""
+
+    def __init__(self, deadline: Deadline):
+        completed = [step.name for step in deadline.steps if step.status == "ok"]
+        super().__init__(f"Deadline of {(deadline.expires_at - deadline.started_at) * 1000:.0f} ms exceeded "
+                         f"after steps {completed}")
+        self.deadline = deadline
+
+
+current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("current_deadline", default=None)
+
+
+@asynccontextmanager
+async def deadline(timeout: float) -> AsyncIterator[Deadline]:
+    """
+    Runs the block under a deadline of `timeout` seconds. Everything awaited in the block, including tasks
+    it starts, sees the deadline through `current_deadline`. When it passes, the block is cancelled and
+    DeadlineExceeded is raised.
+
+        async with deadline(5.0) as run:
+            answer = await handle_query(query)
+        print(run.report())
+    """
+    run = Deadline(timeout, current_deadline.get())
+    token = current_deadline.set(run)
+    try:
+        async with asyncio.timeout_at(run.expires_at) as timeout_context:
+            yield run
+    except TimeoutError as e:
+        # Timeouts of nested deadlines and of calls inside the block (e.g. `asyncio.wait_for`) aren't ours
+        if isinstance(e, DeadlineExceeded) or not timeout_context.expired():
+            raise
+        logger.error(f"Deadline exceeded: {run.report()}")
+        raise DeadlineExceeded(run) from e
+    finally:
+        current_deadline.reset(token)
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the current deadline, or `default` when no deadline is set."""
+    run = current_deadline.get()
+    return run.remaining() if run is not None else default
+
+
+def timeout_for(timeout: Optional[float]) -> Optional[float]:
+    """The smaller of `timeout` and the time left before the current deadline."""
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def check_deadline() -> None:
+    """Raises DeadlineExceeded if the current deadline has passed, e.g. before starting blocking work."""
+    run = current_deadline.get()
+    if run is not None and run.expired:
+        raise DeadlineExceeded(run)
+
+
+@asynccontextmanager
+async def step(name: str) -> AsyncIterator[None]:
+    """Times the block as a step of the current deadline, and as a tracing span."""
+    run = current_deadline.get()
+    if run is None:
+        with span(name):
+            yield
+        return
+    check_deadline()
+    start_time, status = run.loop.time(), "ok"
+    try:
+        with span(name):
+            yield
+    except asyncio.CancelledError:
+        status = "timeout" if run.expired else "cancelled"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        run.record(name, start_time, status)
+
+
+async def run_step(name: str, awaitable: Awaitable[T]) -> T:
+    """Awaits `awaitable` as a step and keeps its result in the deadline's partial results."""
+    try:
+        check_deadline()
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise
+    async with step(name):
+        result = await awaitable
+    run = current_deadline.get()
+    if run is not None:
+        run.partial[name] = result
+    return result
@@ -0,0 +1,139 @@
+# Description: Concurrent evaluation runner: generate-then-judge scenarios, repeated for pass rates, with a JSON latency/token report.
+import time
+import asyncio
+import inspect
+import logging
+import statistics
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Union
+from latency import latency_summary, percentile
+from tokens import count_tokens, count_context_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class Scenario(NamedTuple):
+    """
+    One evaluation case.
+
+    Args:
+        name: Scenario name used in the report.
+        generate: Produces the output under test from the context (None when `context` is None) and `legacy_api`.
+        judge: Returns a verdict dict for the output; the run passes when `verdict["is_valid"]` is True.
+        context: Builds (or, if async, awaits) the generation context for `legacy_api`, used for prompt token accounting.
+    """
+    name: str
+    generate: Callable[[Optional[List[Dict[str, str]]], bool], Awaitable[Any]]
+    judge: Callable[[Any], Awaitable[Optional[Dict[str, Any]]]]
+    context: Optional[Callable[[bool], Union[List[Dict[str, str]], Awaitable[List[Dict[str, str]]]]]] = None
+
+
+class RunResult(NamedTuple):
+    scenario: str
+    legacy_api: bool
+    passed: bool
+    error: Optional[str]
+    generate_ms: Optional[float]
+    judge_ms: Optional[float]
+    prompt_tokens: Optional[int]
+    output_tokens: Optional[int]
+
+
+async def run_scenario(scenario: Scenario, legacy_api: bool, semaphore: asyncio.Semaphore) -> RunResult:
+    """
+    Runs one generate-then-judge pass. The semaphore is held per stage rather than for the whole run,
+    so judge calls of finished generations overlap with generations still waiting for a slot.
+    """
+    generate_ms = judge_ms = prompt_tokens = output_tokens = None
+    try:
+        context = scenario.context(legacy_api) if scenario.context else None
+        if inspect.isawaitable(context):
+            context = await context
+        if context is not None:
+            prompt_tokens = count_context_tokens(context)
+
+        async with semaphore:
+            start_time = time.perf_counter()
+            output = await scenario.generate(context, legacy_api)
+            generate_ms = (time.perf_counter() - start_time) * 1000
+        if output is None:
+            raise ValueError("generation returned no output")
+        output_tokens = count_tokens(output if isinstance(output, str) else str(output))
+
+        async with semaphore:
+            start_time = time.perf_counter()
+            verdict = await scenario.judge(output)
+            judge_ms = (time.perf_counter() - start_time) * 1000
+        if verdict is None or not isinstance(verdict.get("is_valid"), bool):
+            raise ValueError(f"invalid judge verdict: {verdict}")
+        passed, error = verdict["is_valid"], None
+    except Exception as e:
+        logger.error(f"Scenario '{scenario.name}' (legacy_api={legacy_api}) failed: {str(e)}")
+        passed, error = False, str(e)
+
+    return RunResult(scenario.name, legacy_api, passed, error, generate_ms, judge_ms, prompt_tokens, output_tokens)
+
+
+def summarize(results: List[RunResult]) -> List[Dict[str, Any]]:
+    """Aggregates run results per (scenario, legacy_api), in first-seen order."""
+    groups: Dict[tuple, List[RunResult]] = {}
+    for result in results:
+        groups.setdefault((result.scenario, result.legacy_api), []).append(result)
+
+    summaries = []
+    for (name, legacy_api), runs in groups.items():
+        passed = sum(run.passed for run in runs)
+        prompt_tokens = [run.prompt_tokens for run in runs if run.prompt_tokens is not None]
+        output_tokens = [run.output_tokens for run in runs if run.output_tokens is not None]
+        summaries.append({
+            "scenario": name,
+            "legacy_api": legacy_api,
+            "runs": len(runs),
+            "passed": passed,
+            "pass_rate": round(passed / len(runs), 4),
+            "errors": sum(run.error is not None for run in runs),
+            "generate_ms": latency_summary([run.generate_ms for run in runs if run.generate_ms is not None]),
+            "judge_ms": latency_summary([run.judge_ms for run in runs if run.judge_ms is not None]),
+            "prompt_tokens": round(statistics.fmean(prompt_tokens), 1) if prompt_tokens else None,
+            "output_tokens": round(statistics.fmean(output_tokens), 1) if output_tokens else None,
+        })
+    return summaries
+
+
+async def run_evals(
+        scenarios: Sequence[Scenario],
+        repeats: int = 1,
+        legacy_apis: Sequence[bool] = (True, False),
+        concurrency: int = 8,
+        label: Optional[str] = None,
+        ) -> Dict[str, Any]:
+    """
+    Runs every scenario `repeats` times for each `legacy_api` value, all concurrently under a global cap
+    of `concurrency` requests in flight.
+
+    Returns:
+        The report: run metadata, wall time and the per-scenario pass rate, latency and token summaries.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    start_time = time.perf_counter()
+    results = await asyncio.gather(*(
+        run_scenario(scenario, legacy_api, semaphore)
+        for scenario in scenarios
+        for legacy_api in legacy_apis
+        for _ in range(repeats)
+    ))
+    wall_ms = (time.perf_counter() - start_time) * 1000
+
+    summaries = summarize(list(results))
+    passed = sum(result.passed for result in results)
+    logger.info(f"Evaluated {len(results)} run(s) in {wall_ms:.2f} ms, {passed} passed")
+    return {
+        "label": label,
+        "started_at": started_at,
+        "repeats": repeats,
+        "concurrency": concurrency,
+        "wall_ms": round(wall_ms, 2),
+        "runs": len(results),
+        "pass_rate": round(passed / len(results), 4) if results else 0.0,
+        "scenarios": summaries,
+    }
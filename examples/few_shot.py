@@ -0,0 +1,83 @@
+# Description: Few-shot example store that picks the examples most relevant to each request within a token budget.
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from lexical import TfidfVectorizer, SparseVector, cosine, tokenize
+from tokens import count_tokens
+from prompts import format_message
+
+
+class FewShotExample(NamedTuple):
+    key: str
+    turns: Tuple[Tuple[str, str], ...]  # (role, text) pairs, roles are "user" or "assistant"
+
+
+class ExampleStore:
+    """
+    Indexes few-shot examples by the lexical similarity of their key text (usually the example input).
+
+    `select` returns the k most relevant examples for a request that fit in a token budget, so the
+    prompt stays the same size however many examples the store holds.
+    """
+
+    def __init__(self):
+        self.examples: List[FewShotExample] = []
+        self._vectorizer = TfidfVectorizer()
+        self._vectors: List[SparseVector] = []
+        self._tokens: List[Optional[int]] = []
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self.examples)
+
+    def add(self, turns: Sequence[Tuple[str, str]], key: Optional[str] = None) -> FewShotExample:
+        """
+        Adds an example made of (role, text) turns. The key defaults to the text of its user turns.
+        """
+        turns = tuple(turns)
+        if key is None:
+            key = " ".join(text for role, text in turns if role == "user")
+        example = FewShotExample(key, turns)
+        self.examples.append(example)
+        self._tokens.append(None)
+        self._dirty = True
+        return example
+
+    def tokens(self, i: int) -> int:
+        """Token count of the i-th example, counted on first use."""
+        if self._tokens[i] is None:
+            self._tokens[i] = sum(count_tokens(text) for _, text in self.examples[i].turns)
+        return self._tokens[i]
+
+    def _index(self) -> None:
+        documents = [tokenize(example.key) for example in self.examples]
+        self._vectorizer.fit(documents)
+        self._vectors = [self._vectorizer.transform(tokens) for tokens in documents]
+        self._dirty = False
+
+    def select(self, query: str, k: Optional[int] = None, token_budget: Optional[int] = None) -> List[FewShotExample]:
+        """
+        Returns up to `k` examples most similar to `query` whose total size fits in `token_budget`,
+        in the order they were added. With neither limit set, every example is returned.
+        """
+        if k is None and token_budget is None:
+            return list(self.examples)
+        if self._dirty:
+            self._index()
+
+        query_vector = self._vectorizer.transform(tokenize(query))
+        ranked = sorted(range(len(self.examples)), key=lambda i: cosine(query_vector, self._vectors[i]), reverse=True)
+
+        selected, used = [], 0
+        for i in ranked:
+            if k is not None and len(selected) >= k:
+                break
+            if token_budget is not None:
+                tokens = self.tokens(i)
+                if used + tokens > token_budget:
+                    continue
+                used += tokens
+            selected.append(i)
+        return [self.examples[i] for i in sorted(selected)]
+
+    @staticmethod
+    def to_context(examples: Sequence[FewShotExample], legacy_api: bool = True) -> List[Dict[str, str]]:
+        return [format_message(role, text, legacy_api) for example in examples for role, text in example.turns]
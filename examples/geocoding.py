@@ -0,0 +1,128 @@
+# Description: Local geocoding fast path that resolves place names in a query from a bundled gazetteer.
+import os
+import re
+import csv
+import logging
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+gazetteer_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.tsv")
+
+
+class Place(NamedTuple):
+    name: str
+    region: str
+    latitude: float
+    longitude: float
+
+
+def normalize(text: str) -> str:
+    """Lowercases, strips accents and punctuation and collapses whitespace: "São Paulo!" -> "sao paulo"."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+class Gazetteer:
+    """
+    Hash index from normalized place names (and aliases) to places.
+
+    `locate` scans a free-form query for the longest known place names. It only answers when the
+    query resolves to exactly one place; a name shared by several places (e.g. "Portland") is
+    disambiguated by a parent region mentioned in the same query ("Portland, Maine"), otherwise the
+    lookup is treated as ambiguous and returns None so the caller can fall back to the LLM.
+
+    Regions (countries, and any place that is the parent region of another entry) only serve to
+    disambiguate a city. A query that resolves to a region alone also returns None: in "Kyoto, Japan"
+    the city is simply missing from the gazetteer, and in "turkey dinner" there is no place at all.
+    """
+
+    def __init__(self, places: List[Place], aliases: Optional[Dict[str, List[str]]] = None, cache_size: int = 1024):
+        self.index: Dict[str, List[Place]] = {}
+        for place in places:
+            names = [place.name] + (aliases or {}).get(place.name + "|" + place.region, [])
+            for name in names:
+                entries = self.index.setdefault(normalize(name), [])
+                if place not in entries:
+                    entries.append(place)
+        self.max_words = max((len(name.split()) for name in self.index), default=0)
+        parents = {normalize(place.region) for place in places if place.region}
+        self.regions = {place for place in places if not place.region or normalize(place.name) in parents}
+        self.locate = lru_cache(maxsize=cache_size)(self._locate)
+
+    @classmethod
+    def load(cls, path: str = gazetteer_path, cache_size: int = 1024) -> "Gazetteer":
+        places, aliases = [], {}
+        with open(path, encoding="utf-8", newline="") as file:
+            rows = csv.DictReader((line for line in file if not line.startswith("#")), delimiter="\t")
+            for row in rows:
+                place = Place(row["name"], row["region"], float(row["latitude"]), float(row["longitude"]))
+                places.append(place)
+                if row["aliases"]:
+                    aliases[place.name + "|" + place.region] = row["aliases"].split("|")
+        return cls(places, aliases, cache_size=cache_size)
+
+    def lookup(self, name: str) -> List[Place]:
+        """Returns every place known under `name`."""
+        return list(self.index.get(normalize(name), []))
+
+    def _locate(self, query: str) -> Optional[Place]:
+        words = normalize(query).split()
+
+        # Greedy longest match, so "West Virginia" wins over "Virginia"
+        groups: List[List[Place]] = []
+        i = 0
+        while i < len(words):
+            for n in range(min(self.max_words, len(words) - i), 0, -1):
+                places = self.index.get(" ".join(words[i:i + n]))
+                if places:
+                    groups.append(places)
+                    i += n
+                    break
+            else:
+                i += 1
+
+        if not groups:
+            return None
+
+        # Use the other names in the query to disambiguate, then drop names that are only the
+        # parent region of another match ("Honolulu, Hawaii" -> Honolulu)
+        mentioned = {normalize(place.name) for places in groups for place in places}
+        resolved = []
+        for places in groups:
+            if len(places) > 1:
+                places = [place for place in places if normalize(place.region) in mentioned] or places
+            resolved.append(places)
+
+        regions = {normalize(places[0].region) for places in resolved if len(places) == 1}
+        resolved = [places for places in resolved
+                    if not (len(resolved) > 1 and normalize(places[0].name) in regions)]
+
+        candidates = {place for places in resolved for place in places}
+        if len(candidates) != 1:
+            logger.info(f"Ambiguous location in query, candidates: {sorted(p.name + ', ' + p.region for p in candidates)}")
+            return None
+        place = candidates.pop()
+        if place in self.regions:
+            logger.info(f"Only the region '{place.name}' is named in the query, leaving it to the LLM")
+            return None
+        return place
+
+
+_gazetteer: Optional[Gazetteer] = None
+
+
+def get_gazetteer() -> Gazetteer:
+    """Returns the bundled gazetteer, loading it on first use."""
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer.load()
+    return _gazetteer
+
+
+def locate(query: str) -> Optional[Place]:
+    """Resolves the single place mentioned in `query` using the bundled gazetteer, or None on a miss or ambiguity."""
+    return get_gazetteer().locate(query)
@@ -0,0 +1,129 @@
+# Description: Request hedging: send a duplicate of a slow request after an adaptive delay and keep whichever answers first.
+import time
+import asyncio
+import logging
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class HedgePolicy:
+    """
+    When to hedge, learned from the observed latency of each model.
+
+    Args:
+        quantile: Latency percentile after which a duplicate request is sent, e.g. 95 for p95.
+        min_delay: Lower bound of the hedge delay, in seconds.
+        default_delay: Hedge delay used until `min_samples` latencies have been observed.
+        min_samples: Observations needed before the percentile is trusted.
+        window: Number of recent latencies kept per model.
+        max_hedge_rate: Maximum fraction of requests that may be hedged, so hedging can't double
+            the load on a backend that is slow for everyone.
+        burst: Hedges allowed in a row before the rate limit applies.
+    """
+
+    def __init__(
+            self,
+            quantile: float = 95,
+            min_delay: float = 0.05,
+            default_delay: float = 2.0,
+            min_samples: int = 20,
+            window: int = 500,
+            max_hedge_rate: float = 0.1,
+            burst: float = 3,
+            ):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self.burst = burst
+        self.latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self.credits = burst
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "denied": 0}
+
+    def observe(self, key: str, latency: float) -> None:
+        self.latencies[key].append(latency)
+
+    def delay(self, key: str) -> float:
+        observed = self.latencies[key]
+        if len(observed) < self.min_samples:
+            return self.default_delay
+        ordered = sorted(observed)
+        index = min(len(ordered) - 1, int(len(ordered) * self.quantile / 100))
+        return max(self.min_delay, ordered[index])
+
+    def start(self) -> None:
+        # Every request earns a fraction of a hedge, up to the burst size
+        self.stats["requests"] += 1
+        self.credits = min(self.burst, self.credits + self.max_hedge_rate)
+
+    def try_hedge(self) -> bool:
+        if self.credits < 1:
+            self.stats["denied"] += 1
+            return False
+        self.credits -= 1
+        self.stats["hedged"] += 1
+        return True
+
+
+async def _timed(key: str, policy: HedgePolicy, request: Callable[[], Awaitable[T]], delay: float) -> T:
+    start_time = time.perf_counter()
+    try:
+        result = await request()
+    except asyncio.CancelledError:
+        # A cancelled attempt took at least this long; leaving it out would bias the window towards
+        # the fast requests and shrink the hedge delay exactly when the backend is slow
+        policy.observe(key, max(time.perf_counter() - start_time, delay))
+        raise
+    policy.observe(key, time.perf_counter() - start_time)
+    return result
+
+
+async def _cancel(tasks) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def hedged(
+        request: Callable[[], Awaitable[T]],
+        policy: HedgePolicy,
+        key: str,
+        hedge_request: Optional[Callable[[], Awaitable[T]]] = None,
+        ) -> T:
+    """
+    Runs `request()`. If it hasn't completed after the policy's delay for `key` and the hedge budget
+    allows, runs a second request concurrently, `hedge_request()` if given (e.g. to have the duplicate
+    take its own scheduler slot), `request()` otherwise. The first successful result wins and the other
+    request is cancelled. Only use this for idempotent, deterministic requests.
+    """
+    policy.start()
+    delay = policy.delay(key)
+    tasks = [asyncio.create_task(_timed(key, policy, request, delay))]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or not policy.try_hedge():
+            return await tasks[0]
+
+        logger.info(f"Request to '{key}' slower than {delay * 1000:.0f} ms, sending a hedge request")
+        tasks.append(asyncio.create_task(_timed(key, policy, hedge_request or request, delay)))
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is tasks[1]:
+                        policy.stats["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # The losing request, or both if the caller was cancelled
+        await _cancel([task for task in tasks if not task.done()])
+
+
+hedge_policy = HedgePolicy()
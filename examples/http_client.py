@@ -0,0 +1,35 @@
+# Description: Shared aiohttp sessions so repeated calls reuse pooled connections instead of opening a new connection per request.
+import os
+import asyncio
+import weakref
+import aiohttp
+
+# One session per event loop: aiohttp sessions are bound to the loop they were created on,
+# and notebooks / pytest-asyncio may run several loops in the same process.
+_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = weakref.WeakKeyDictionary()
+
+# Upper bound for any single request; pipelines set tighter bounds with deadline.deadline()
+request_timeout = float(os.getenv("REQUEST_TIMEOUT", "60"))
+
+
+def get_session(limit: int = 100) -> aiohttp.ClientSession:
+    """
+    Returns the pooled session for the running event loop, creating it on first use.
+
+    Args:
+        limit: Maximum number of simultaneous connections in the pool.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=limit, ttl_dns_cache=300)
+        session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=request_timeout))
+        _sessions[loop] = session
+    return session
+
+
+async def close_session() -> None:
+    """Closes the pooled session for the running event loop, if any."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
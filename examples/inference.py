@@ -1,10 +1,20 @@
 # Description: This script demonstrates how to use the Inflection AI API to generate text completions based on a given context.
 import os
+import json
 import time
 import aiohttp
 import logging
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Union
 from dotenv import load_dotenv
+from balancer import LoadBalancer
+from cassettes import request_json
+from hedging import hedge_policy, hedged
+from deadline import step
+from http_client import get_session
+from prompts import serialize_payload
+from scheduler import scheduler
+from tracing import traced
+from tokens import TokenBudgetExceeded, TruncationPolicy, count_tokens, enforce_budget, request_tokens, usage
 
 # load .env file
 load_dotenv()
@@ -16,14 +26,36 @@ logger = logging.getLogger(__name__)
 # Set your Inflection API key in your environment variables
 base_url = os.getenv("BASE_URL")
 inflection_api_key = os.getenv("INFLECTION_API_KEY")
+# Or a pool of endpoints and keys in INFLECTION_BACKENDS, see balancer.py
+balancer: Optional[LoadBalancer] = LoadBalancer.from_env()
 
+async def post_json(session: aiohttp.ClientSession, path: str, data: bytes) -> Dict[str, Any]:
+    """Posts a request body to the API, through the backend pool when one is configured."""
+    headers = {"Content-Type": "application/json"}
+    if balancer is not None:
+        return await balancer.request_json(session, "POST", path, headers=headers, data=data)
+    headers["Authorization"] = f"Bearer {inflection_api_key}"
+    return await request_json(session, "POST", base_url + path, headers=headers, data=data)
+
+def record_usage(model: str, context: List[Dict[str, Any]], chat_completion: Dict[str, Any], text: Optional[str], caller: Optional[str]) -> None:
+    """Adds the request to the token usage totals, preferring the counts reported by the API over local estimates."""
+    reported = chat_completion.get("usage") or {}
+    prompt_tokens = reported.get("prompt_tokens") or request_tokens(context)
+    completion_tokens = reported.get("completion_tokens") or count_tokens(text or "")
+    usage.record(model, prompt_tokens, completion_tokens, caller)
+
+@traced()
 async def fetch(
         context: List[Dict[str, str]], 
         model: str = "inflection_3_pi",
         temperature: float = 0.0,
         top_p: float = 1,
         web_search: bool = False,
-        legacy_api: bool = True
+        legacy_api: bool = True,
+        truncation: Union[str, TruncationPolicy] = "fail",
+        caller: Optional[str] = None,
+        hedge: bool = False,
+        priority: Optional[str] = None,
         ) -> Optional[str]:                                 
     """
     Fetches a response from the Inflection AI API based on the provided context and model.
@@ -32,58 +64,136 @@ async def fetch(
         context: The context for the API request.
         model: The model configuration to use for the API request. The default is "inflection_3_pi". The available models are: "inflection_3_pi" and "inflection_3_productivity".
         legacy_api: A boolean flag to determine whether to use the legacy API or the OpenAI API. The default is True.
+        truncation: What to do when the context doesn't fit the model's token budget: "fail" (don't send),
+            "drop_oldest", "trim_artifacts" or a custom policy. See tokens.py.
+        caller: Name the token usage is attributed to. Defaults to the one set with `tokens.attribute_usage`.
+        hedge: Send a duplicate request when this one is slower than the model's observed p95 latency, and use
+            whichever answers first. Only applies to deterministic (temperature 0) requests. The duplicate
+            waits for its own scheduler slot. See hedging.py.
+        priority: Scheduler priority class, "interactive" or "batch". Defaults to the one set with
+            `scheduler.schedule_as`. Requests wait for a slot of the model and share it fairly per caller.
 
     Returns:
         Optional: The text response from the API, or None if an error occurs.
     """
-    
-    headers = {
-        "Authorization": f"Bearer {inflection_api_key}",
-        "Content-Type": "application/json",
-    }
 
-    if legacy_api:
-        url = base_url + "/external/api/inference"
+    try:
+        context = enforce_budget(context, model, truncation)
 
-        json_payload = {
-            "config": model, 
-            "context": context,
-            "temperature": temperature,
-            "top_p": top_p,
-            "web_search": web_search,
-            }
-    else:
-        url = base_url + "/external/api/inference/openai/v1/chat/completions"
+        if legacy_api:
+            path = "/external/api/inference"
+
+            json_payload = {
+                "config": model, 
+                "context": context,
+                "temperature": temperature,
+                "top_p": top_p,
+                "web_search": web_search,
+                }
+        else:
+            path = "/external/api/inference/openai/v1/chat/completions"
+
+            json_payload = {
+                "model": model, 
+                "messages": context,
+                "temperature": temperature,
+                "top_p": top_p,
+                "web_search": web_search,
+                }
+
+        logger.info(f"Sending messages to Inflection AI model '{model}'...")
+
+        data = serialize_payload(json_payload, "context" if legacy_api else "messages")
+
+        async def send() -> Dict[str, Any]:
+            return await post_json(get_session(), path, data)
+
+        async def send_hedge() -> Dict[str, Any]:
+            # The duplicate is a request in flight like any other, so it queues for its own slot
+            async with scheduler.slot(model, priority, caller):
+                return await send()
+
+        async with scheduler.slot(model, priority, caller):
+            start_time = time.time()
+            async with step(f"fetch {model}"):
+                if hedge and temperature == 0:
+                    chat_completion = await hedged(send, hedge_policy, model, send_hedge)
+                else:
+                    chat_completion = await send()
+            end_time = time.time()
+        duration = (end_time - start_time) * 1000  # Convert to milliseconds
+        logger.info(f"Inflection AI API request took {duration:.2f} ms (Model=[{model}]) ")
+
+        if not chat_completion:
+            logger.error("Invalid response format: 'text' field missing or empty")
+
+        if legacy_api:
+            text = chat_completion.get("text", None)
+        else:
+            text = chat_completion.get("choices")[0].get("message").get("content", None)
+        record_usage(model, context, chat_completion, text, caller)
+        return text
+    except TokenBudgetExceeded as e:
+        logger.error(f"Request not sent: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Error occurred: {str(e)}")
+        return None
+
+@traced()
+async def fetch_message(
+        messages: List[Dict[str, Any]],
+        model: str = "inflection_3_with_tools",
+        tools: Optional[List[Dict[str, Any]]] = None,
+        temperature: float = 0.0,
+        top_p: float = 1,
+        truncation: Union[str, TruncationPolicy] = "fail",
+        caller: Optional[str] = None,
+        priority: Optional[str] = None,
+        ) -> Optional[Dict[str, Any]]:
+    """
+    Fetches the assistant message, including any tool calls, from the OpenAI compatible API.
+
+    Args:
+        messages: The messages for the API request, in the OpenAI (role/content) format.
+        model: The model to use. Tool calling requires "inflection_3_with_tools".
+        tools: The tool definitions in the OpenAI `tools` format.
+        truncation: Token budget policy, see `fetch`.
+        caller: Name the token usage is attributed to, see `fetch`.
+        priority: Scheduler priority class, see `fetch`.
+
+    Returns:
+        Optional: The assistant message as a dict, or None if an error occurs.
+    """
+
+    try:
+        messages = enforce_budget(messages, model, truncation)
+
+        path = "/external/api/inference/openai/v1/chat/completions"
 
         json_payload = {
-            "model": model, 
-            "messages": context,
+            "model": model,
+            "messages": messages,
             "temperature": temperature,
             "top_p": top_p,
-            "web_search": web_search,
             }
+        if tools:
+            json_payload["tools"] = tools
 
-    logger.info(f"Sending messages to Inflection AI model '{model}'...")
+        logger.info(f"Sending messages to Inflection AI model '{model}'...")
 
-    try:
-        async with aiohttp.ClientSession() as session:
+        async with scheduler.slot(model, priority, caller):
             start_time = time.time()
-            async with session.post(
-                url, headers=headers, json=json_payload
-            ) as response:
-                response.raise_for_status()
-                chat_completion = await response.json()
-                end_time = time.time()
-                duration = (end_time - start_time) * 1000  # Convert to milliseconds
-                logger.info(f"Inflection AI API request took {duration:.2f} ms (Model=[{model}]) ")
-
-                if not chat_completion:
-                    logger.error("Invalid response format: 'text' field missing or empty")
-
-                if legacy_api:
-                    return chat_completion.get("text", None)
-                else:
-                    return chat_completion.get("choices")[0].get("message").get("content", None)
+            async with step(f"fetch {model}"):
+                chat_completion = await post_json(get_session(), path, json.dumps(json_payload).encode())
+        duration = (time.time() - start_time) * 1000  # Convert to milliseconds
+        logger.info(f"Inflection AI API request took {duration:.2f} ms (Model=[{model}]) ")
+        message = chat_completion.get("choices")[0].get("message")
+        record_usage(model, messages, chat_completion, message.get("content"), caller)
+        return message
+    except TokenBudgetExceeded as e:
+        logger.error(f"Request not sent: {str(e)}")
+        return None
     except Exception as e:
         logger.error(f"Error occurred: {str(e)}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,182 @@
+# Description: Local nearest-centroid intent classifier in front of an LLM router, used only for low-confidence queries.
+import json
+import time
+import random
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from lexical import SparseVector, TfidfVectorizer, cosine, normalize_vector, tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def features(previous_intents: str, query: str) -> List[str]:
+    """Query tokens plus one token per previous intent, with extra weight on the most recent one."""
+    previous = [intent.strip() for intent in previous_intents.split("->") if intent.strip()]
+    tokens = tokenize(query)
+    tokens += [f"after:{intent}" for intent in previous]
+    if previous:
+        tokens.append(f"last:{previous[-1]}")
+    return tokens
+
+
+class RouterStats:
+    def __init__(self):
+        self.requests = 0
+        self.local_hits = 0
+        self.llm_calls = 0
+        self.compared = 0
+        self.agreements = 0
+        self.local_ms = 0.0
+        self.llm_ms = 0.0
+
+    def report(self) -> Dict[str, Optional[float]]:
+        return {
+            "requests": self.requests,
+            "hit_rate": round(self.local_hits / self.requests, 4) if self.requests else None,
+            "agreement_rate": round(self.agreements / self.compared, 4) if self.compared else None,
+            "local_ms_avg": round(self.local_ms / self.requests, 4) if self.requests else None,
+            "llm_ms_avg": round(self.llm_ms / self.llm_calls, 2) if self.llm_calls else None,
+        }
+
+
+class IntentRouter:
+    """
+    Routes (previous intents, query) pairs to an intent, locally when confident and through the LLM otherwise.
+
+    The local tier is a nearest-centroid classifier over TF-IDF vectors. Its confidence is the margin
+    between the best and second best centroid similarity; below `threshold` the query goes to
+    `llm_route`, and the LLM's decision is added to the training data.
+
+    Args:
+        llm_route: Coroutine function (previous_intents, query, **kwargs) -> intent, the fallback router.
+        threshold: Minimum confidence to answer locally, see `calibrate`.
+        shadow_rate: Fraction of local answers also sent to the LLM in the background to measure agreement.
+    """
+
+    def __init__(
+            self,
+            llm_route: Callable[..., Awaitable[str]],
+            threshold: float = 0.1,
+            shadow_rate: float = 0.0,
+            ):
+        self.llm_route = llm_route
+        self.threshold = threshold
+        self.shadow_rate = shadow_rate
+        self.stats = RouterStats()
+        self.examples: List[Tuple[List[str], str]] = []
+        self.vectorizer = TfidfVectorizer()
+        self.centroids: Dict[str, SparseVector] = {}
+        self._dirty = False
+        self._shadow_tasks = set()
+
+    @classmethod
+    def from_jsonl(cls, path: str, llm_route: Callable[..., Awaitable[str]], **kwargs) -> "IntentRouter":
+        router = cls(llm_route, **kwargs)
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    example = json.loads(line)
+                    router.add_example(example["previous_intents"], example["query"], example["intent"])
+        return router
+
+    @property
+    def intents(self) -> List[str]:
+        return sorted({intent for _, intent in self.examples})
+
+    def add_example(self, previous_intents: str, query: str, intent: str) -> None:
+        self.examples.append((features(previous_intents, query), intent))
+        self._dirty = True
+
+    def fit(self) -> None:
+        self.centroids = self._centroids(self.examples)
+        self._dirty = False
+
+    def _centroids(self, examples: List[Tuple[List[str], str]]) -> Dict[str, SparseVector]:
+        self.vectorizer.fit(tokens for tokens, _ in examples)
+        sums: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for tokens, intent in examples:
+            for term, value in self.vectorizer.transform(tokens).items():
+                sums[intent][term] += value
+        return {intent: normalize_vector(vector) for intent, vector in sums.items()}
+
+    def _predict(self, tokens: List[str], centroids: Dict[str, SparseVector]) -> Tuple[Optional[str], float]:
+        vector = self.vectorizer.transform(tokens)
+        scores = sorted(((cosine(vector, centroid), intent) for intent, centroid in centroids.items()), reverse=True)
+        if not scores:
+            return None, 0.0
+        runner_up = scores[1][0] if len(scores) > 1 else 0.0
+        return scores[0][1], scores[0][0] - runner_up
+
+    def predict(self, previous_intents: str, query: str) -> Tuple[Optional[str], float]:
+        """Returns the local classifier's (intent, confidence)."""
+        if self._dirty:
+            self.fit()
+        return self._predict(features(previous_intents, query), self.centroids)
+
+    def calibrate(self, target_precision: float = 0.95) -> float:
+        """
+        Sets `threshold` to the lowest confidence at which leave-one-out predictions on the training
+        examples reach `target_precision`, and returns it.
+        """
+        results = []
+        for i, (tokens, intent) in enumerate(self.examples):
+            centroids = self._centroids(self.examples[:i] + self.examples[i + 1:])
+            predicted, confidence = self._predict(tokens, centroids)
+            results.append((confidence, predicted == intent))
+        self._dirty = True
+
+        threshold, correct = float("inf"), 0
+        for n, (confidence, is_correct) in enumerate(sorted(results, reverse=True), start=1):
+            correct += is_correct
+            if correct / n >= target_precision:
+                threshold = confidence
+        self.threshold = threshold
+        logger.info(f"Calibrated intent router threshold={threshold:.4f} for precision={target_precision}")
+        return threshold
+
+    async def route(self, previous_intents: str, query: str, **llm_kwargs) -> Dict[str, object]:
+        """
+        Returns {"intent", "confidence", "source"} where source is "local" or "llm".
+        Extra keyword arguments (e.g. legacy_api) are passed to `llm_route`.
+        """
+        self.stats.requests += 1
+        start_time = time.perf_counter()
+        predicted, confidence = self.predict(previous_intents, query)
+        self.stats.local_ms += (time.perf_counter() - start_time) * 1000
+
+        if predicted is not None and confidence >= self.threshold:
+            self.stats.local_hits += 1
+            if self.shadow_rate and random.random() < self.shadow_rate:
+                task = asyncio.create_task(self._shadow(previous_intents, query, predicted, llm_kwargs))
+                self._shadow_tasks.add(task)
+                task.add_done_callback(self._shadow_tasks.discard)
+            return {"intent": predicted, "confidence": confidence, "source": "local"}
+
+        intent = await self._llm(previous_intents, query, llm_kwargs)
+        if predicted is not None and intent:
+            self._compare(predicted, intent)
+        return {"intent": intent, "confidence": confidence, "source": "llm"}
+
+    async def _llm(self, previous_intents: str, query: str, llm_kwargs: dict) -> str:
+        start_time = time.perf_counter()
+        intent = await self.llm_route(previous_intents, query, **llm_kwargs)
+        self.stats.llm_calls += 1
+        self.stats.llm_ms += (time.perf_counter() - start_time) * 1000
+        # Learn from the LLM's decisions, as long as it picked a known intent
+        if intent in self.intents:
+            self.add_example(previous_intents, query, intent)
+        return intent
+
+    async def _shadow(self, previous_intents: str, query: str, predicted: str, llm_kwargs: dict) -> None:
+        intent = await self._llm(previous_intents, query, llm_kwargs)
+        if intent:
+            self._compare(predicted, intent)
+
+    def _compare(self, predicted: str, intent: str) -> None:
+        self.stats.compared += 1
+        self.stats.agreements += predicted == intent
+
+    def report(self) -> Dict[str, Optional[float]]:
+        return {**self.stats.report(), "threshold": self.threshold, "examples": len(self.examples)}
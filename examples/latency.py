@@ -0,0 +1,21 @@
+# Description: Latency statistics shared by the evaluation report and the scheduler's queue wait report.
+import statistics
+from typing import Dict, Optional, Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile, `q` in [0, 100]."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def latency_summary(values: Sequence[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    return {
+        "mean": round(statistics.fmean(values), 2),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "max": round(max(values), 2),
+    }
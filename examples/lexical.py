@@ -0,0 +1,60 @@
+# Description: Small TF-IDF vectorizer over sparse dict vectors, used for lexical similarity without extra dependencies.
+import re
+import math
+from collections import Counter
+from typing import Dict, Iterable, List
+
+SparseVector = Dict[str, float]
+
+_word_pattern = re.compile(r"[a-z0-9_]+")
+
+stop_words = frozenset("""
+a an and are as at be but by can could do for from how i in is it me my of on or please so
+that the this to was we what when where which will with would you your
+""".split())
+
+
+def tokenize(text: str, bigrams: bool = True) -> List[str]:
+    """Lowercased word tokens without stop words, plus adjacent word bigrams."""
+    words = [word for word in _word_pattern.findall(text.lower()) if word not in stop_words]
+    if bigrams:
+        words += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return words
+
+
+def normalize_vector(vector: SparseVector) -> SparseVector:
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {term: value / norm for term, value in vector.items()} if norm else {}
+
+
+def cosine(a: SparseVector, b: SparseVector) -> float:
+    """Dot product of two L2-normalized sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(term, 0.0) for term, value in a.items())
+
+
+class TfidfVectorizer:
+    """TF-IDF with sublinear term frequency and smoothed IDF; vectors are L2-normalized."""
+
+    def __init__(self):
+        self.idf: Dict[str, float] = {}
+        self.default_idf = 1.0
+
+    def fit(self, documents: Iterable[List[str]]) -> "TfidfVectorizer":
+        document_frequency = Counter()
+        n = 0
+        for tokens in documents:
+            document_frequency.update(set(tokens))
+            n += 1
+        self.idf = {term: math.log((1 + n) / (1 + df)) + 1 for term, df in document_frequency.items()}
+        # Unseen terms get the IDF of a term seen in no document
+        self.default_idf = math.log(1 + n) + 1
+        return self
+
+    def transform(self, tokens: List[str]) -> SparseVector:
+        counts = Counter(tokens)
+        return normalize_vector({
+            term: (1 + math.log(count)) * self.idf.get(term, self.default_idf)
+            for term, count in counts.items()
+        })
@@ -0,0 +1,88 @@
+# Description: Map-reduce classification of long documents: classify chunks concurrently, vote, and stop once the vote is decided.
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, List, Optional
+from tokens import chunk_text
+from utils import get_context, get_response
+
+logger = logging.getLogger(__name__)
+
+
+def decided(votes: Counter, remaining: int) -> bool:
+    """True when the remaining chunks can no longer change the leading label."""
+    ranked = votes.most_common(2)
+    if not ranked:
+        return False
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0
+    return ranked[0][1] - runner_up > remaining
+
+
+async def classify_long_document(
+        text: str,
+        system_prompt: str,
+        key: str = "category",
+        labels: Optional[List[str]] = None,
+        chunk_tokens: int = 1500,
+        concurrency: int = 8,
+        early_stop: bool = True,
+        user_input_label: str = "User's input",
+        model: str = "inflection_3_productivity",
+        legacy_api: bool = True,
+        ) -> Dict[str, object]:
+    """
+    Classifies a document that may not fit in one prompt by majority vote over its chunks.
+
+    The text is split with the tiktoken chunker and every chunk is classified concurrently with the
+    single-document `system_prompt`. As soon as the leading label can't be overtaken by the chunks
+    still outstanding, the remaining requests are cancelled.
+
+    Args:
+        text: The document text.
+        system_prompt: The classification system prompt, e.g. `sip_classification`.
+        key: The XML key holding the label in the response.
+        labels: The valid labels; other answers are ignored. All answers count when None.
+        chunk_tokens: Maximum tokens per chunk.
+        concurrency: Maximum number of chunk requests in flight.
+
+    Returns:
+        A dict with the winning label under `key`, its `confidence` (share of valid votes), the
+        `votes` per label and the number of `chunks` and `classified` chunks.
+    """
+    chunks = chunk_text(text, chunk_tokens)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def classify(chunk: str) -> str:
+        context = get_context(system_prompt, chunk, user_input_label=user_input_label, legacy_api=legacy_api)
+        async with semaphore:
+            result = await get_response(context, [key], model, legacy_api=legacy_api)
+        return result[key].strip()
+
+    tasks = [asyncio.create_task(classify(chunk)) for chunk in chunks]
+    votes, classified = Counter(), 0
+    try:
+        for completed, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+            try:
+                label = await next_done
+            except Exception as e:
+                logger.error(f"Chunk classification failed: {str(e)}")
+                label = ""
+            classified += 1
+            if label and (labels is None or label in labels):
+                votes[label] += 1
+            if early_stop and decided(votes, len(tasks) - completed):
+                logger.info(f"Vote decided after {classified}/{len(tasks)} chunks, cancelling the rest")
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    label, count = votes.most_common(1)[0] if votes else ("", 0)
+    return {
+        key: label,
+        "confidence": round(count / sum(votes.values()), 4) if votes else 0.0,
+        "votes": dict(votes),
+        "chunks": len(chunks),
+        "classified": classified,
+    }
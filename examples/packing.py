@@ -0,0 +1,119 @@
+# Description: Packs several short inputs into one request that shares the system prompt, then splits the answers back per input.
+import re
+import asyncio
+import logging
+from typing import Dict, List, Optional
+from inference import fetch as fetch_inflection
+from scheduler import schedule_as
+from tokens import count_tokens
+from utils import get_context, get_response, parse_xml_response
+
+logger = logging.getLogger(__name__)
+
+packing_instruction = """
+# Batch Mode
+You will receive several inputs, each wrapped in <item index="N"></item> tags. Handle every input independently, exactly as the instructions above describe for a single input, and answer all of them in order. Wrap the complete output for each input in <result index="N"></result> tags carrying the same index. Do not skip, merge or reorder inputs.
+"""
+
+_result_pattern = re.compile(r'<result index="(\d+)">(.*?)</result>', re.DOTALL)
+
+
+def pack_inputs(inputs: Dict[int, str], user_input_label: str = "User's input") -> str:
+    return "\n".join(f'<item index="{index}">\n{user_input_label}: {text}\n</item>' for index, text in inputs.items())
+
+
+def split_results(response: Optional[str], keys: List[str], required: Optional[List[str]] = None) -> Dict[int, Dict[str, object]]:
+    """Returns the parsed result of every <result> block in `response` that contains all `required` keys (default: all `keys`)."""
+    results = {}
+    for index, block in _result_pattern.findall(response or ""):
+        parsed = parse_xml_response(block.replace("\n", " "), keys)
+        if all(parsed[key] for key in (keys if required is None else required)):
+            results[int(index)] = parsed
+    return results
+
+
+def plan_batches(
+        inputs: List[str],
+        token_budget: int,
+        max_batch_size: int,
+        output_tokens_per_item: int,
+        ) -> List[List[int]]:
+    """
+    Greedily groups input indexes into batches whose input plus expected output tokens fit in `token_budget`.
+    An input larger than the budget gets a batch of its own.
+    """
+    batches, batch, used = [], [], 0
+    for index, text in enumerate(inputs):
+        cost = count_tokens(text) + output_tokens_per_item + 10  # item tags and label
+        if batch and (used + cost > token_budget or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(index)
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+async def get_responses_packed(
+        system_prompt: str,
+        inputs: List[str],
+        keys: List[str],
+        user_input_label: str = "User's input",
+        token_budget: int = 4000,
+        max_batch_size: int = 20,
+        output_tokens_per_item: int = 100,
+        concurrency: int = 4,
+        model: str = "inflection_3_productivity",
+        legacy_api: bool = True,
+        priority: str = "batch",
+        ) -> List[Optional[Dict[str, object]]]:
+    """
+    Gets the XML response for many inputs, packing several inputs into each request.
+
+    Batches are sized so that the packed inputs and their expected outputs fit in `token_budget`
+    (on top of the system prompt). Inputs whose result is missing or incomplete in the packed
+    response are re-issued individually with `get_response`; an input whose individual request
+    fails too gets None, without losing the results of the others.
+
+    Args:
+        system_prompt: The single-input system prompt, e.g. `sip_classification`.
+        inputs: The inputs to process.
+        keys: The XML keys to extract for each input.
+        concurrency: Maximum number of requests in flight.
+        priority: Scheduler priority class of the requests, see scheduler.py.
+
+    Returns:
+        The parsed response for each input (None if it failed), in the same order as `inputs`.
+    """
+    packed_prompt = system_prompt + packing_instruction
+    semaphore = asyncio.Semaphore(concurrency)
+    results: Dict[int, Optional[Dict[str, object]]] = {}
+
+    async def run_batch(batch: List[int]) -> None:
+        context = get_context(packed_prompt, pack_inputs({i: inputs[i] for i in batch}, user_input_label),
+                              user_input_label="Inputs", legacy_api=legacy_api)
+        async with semaphore:
+            response = await fetch_inflection(context, model, legacy_api=legacy_api)
+        for index, parsed in split_results(response, keys).items():
+            if index in batch:
+                results[index] = parsed
+
+    async def run_single(index: int) -> None:
+        context = get_context(system_prompt, inputs[index], user_input_label=user_input_label, legacy_api=legacy_api)
+        async with semaphore:
+            try:
+                results[index] = await get_response(context, keys, model, legacy_api=legacy_api)
+            except Exception as e:
+                logger.error(f"Error occurred for input {index}: {str(e)}")
+                results[index] = None
+
+    batches = plan_batches(inputs, token_budget, max_batch_size, output_tokens_per_item)
+    with schedule_as(priority):
+        await asyncio.gather(*(run_batch(batch) for batch in batches))
+
+        failed = [index for index in range(len(inputs)) if index not in results]
+        logger.info(f"Packed {len(inputs)} inputs into {len(batches)} request(s), re-issuing {len(failed)} failed item(s)")
+        await asyncio.gather(*(run_single(index) for index in failed))
+
+    return [results[index] for index in range(len(inputs))]
@@ -0,0 +1,162 @@
+# Description: Registry of precompiled prompt templates whose static prefix is built and JSON-serialized once per API flavor.
+import json
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+# Message types of the legacy API for each OpenAI role
+legacy_types = {"system": "Instruction", "user": "Human", "assistant": "AI"}
+openai_roles = {legacy_type: role for role, legacy_type in legacy_types.items()}
+
+
+def format_message(role: str, text: str, legacy_api: bool = True) -> Dict[str, str]:
+    """Builds a message from an OpenAI role ("system", "user" or "assistant") in the format of the selected API."""
+    if legacy_api:
+        return {"type": legacy_types[role], "text": text}
+    return {"role": role, "content": text}
+
+
+def to_legacy(context: Sequence[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Converts messages to the legacy (type/text) format, keeping any other keys. Legacy messages are copied as is."""
+    converted = []
+    for message in context:
+        if "role" not in message:
+            converted.append(dict(message))
+            continue
+        if message["role"] not in legacy_types:
+            raise ValueError(f"Role '{message['role']}' has no legacy API equivalent")
+        rest = {key: value for key, value in message.items() if key not in ("role", "content")}
+        converted.append({"type": legacy_types[message["role"]], "text": message.get("content"), **rest})
+    return converted
+
+
+def to_openai(context: Sequence[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Converts messages to the OpenAI (role/content) format, keeping any other keys. OpenAI messages are copied as is."""
+    converted = []
+    for message in context:
+        if "type" not in message:
+            converted.append(dict(message))
+            continue
+        rest = {key: value for key, value in message.items() if key not in ("type", "text")}
+        converted.append({"role": openai_roles[message["type"]], "content": message["text"], **rest})
+    return converted
+
+
+def convert(context: Sequence[Dict[str, str]], legacy_api: bool) -> List[Dict[str, str]]:
+    return to_legacy(context) if legacy_api else to_openai(context)
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+class RenderedContext(list):
+    """
+    A context rendered from a template: a regular message list that also knows how to serialize itself
+    from the template's cached prefix bytes. Mutating the list, or editing one of its messages in place,
+    disables the shortcut. Every render gets its own copies of the prefix messages.
+    """
+
+    _mutators = ("__setitem__", "__delitem__", "__iadd__", "__imul__", "append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse")
+
+    def __init__(self, template: "PromptTemplate", legacy_api: bool, suffix: List[Dict[str, str]]):
+        super().__init__(dict(message) for message in template.prefix_messages(legacy_api))
+        super().extend(suffix)
+        self.template = template
+        self.legacy_api = legacy_api
+        self._suffix = suffix
+        self._modified = False
+
+    def to_json(self) -> bytes:
+        """Returns the context serialized as a compact JSON array."""
+        cached = self.template.prefix_messages(self.legacy_api)
+        # In-place edits of a message don't go through the list methods, so compare with the template's
+        if self._modified or any(message != original for message, original in zip(self, cached)):
+            return _dumps(list(self))
+        prefix = self.template.prefix_json(self.legacy_api)
+        if not self._suffix:
+            return prefix + b"]"
+        return prefix + b"," + _dumps(self._suffix)[1:]
+
+
+def _mark_modified(name: str):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._modified = True
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in RenderedContext._mutators:
+    setattr(RenderedContext, _name, _mark_modified(_name))
+
+
+class PromptTemplate:
+    """
+    A system prompt plus few-shot turns, stored once as an immutable tuple of (role, text) pairs.
+
+    The prefix messages and their serialized JSON are built lazily once per API flavor; `render`
+    only formats the user turns of each call.
+    """
+
+    def __init__(self, name: str, system_prompt: str, examples: Sequence[Tuple[str, str]] = ()):
+        self.name = name
+        self.turns: Tuple[Tuple[str, str], ...] = (("system", system_prompt),) + tuple(examples)
+        self._messages: Dict[bool, Tuple[Dict[str, str], ...]] = {}
+        self._json: Dict[bool, bytes] = {}
+
+    @property
+    def system_prompt(self) -> str:
+        return self.turns[0][1]
+
+    def prefix_messages(self, legacy_api: bool) -> Tuple[Dict[str, str], ...]:
+        messages = self._messages.get(legacy_api)
+        if messages is None:
+            messages = tuple(format_message(role, text, legacy_api) for role, text in self.turns)
+            self._messages[legacy_api] = messages
+        return messages
+
+    def prefix_json(self, legacy_api: bool) -> bytes:
+        """The serialized prefix, as a JSON array without its closing bracket."""
+        prefix = self._json.get(legacy_api)
+        if prefix is None:
+            prefix = _dumps(list(self.prefix_messages(legacy_api)))[:-1]
+            self._json[legacy_api] = prefix
+        return prefix
+
+    def render(self, *user_messages: str, legacy_api: bool = True) -> RenderedContext:
+        """Returns the prefix followed by one user turn per message."""
+        return RenderedContext(self, legacy_api, [format_message("user", text, legacy_api) for text in user_messages])
+
+
+templates: Dict[str, PromptTemplate] = {}
+
+
+def register_template(template: PromptTemplate) -> PromptTemplate:
+    templates[template.name] = template
+    return template
+
+
+def get_template(name: str) -> PromptTemplate:
+    return templates[name]
+
+
+@lru_cache(maxsize=256)
+def template_for(system_prompt: str) -> PromptTemplate:
+    """Returns the (unregistered) template for a bare system prompt, compiling it on first use."""
+    return PromptTemplate("system_prompt", system_prompt)
+
+
+def serialize_payload(payload: Dict[str, object], context_key: str) -> bytes:
+    """
+    Serializes a request payload, splicing in the cached bytes of `payload[context_key]` when it is a
+    RenderedContext instead of re-encoding the whole prompt.
+    """
+    context = payload[context_key]
+    if not isinstance(context, RenderedContext):
+        return _dumps(payload)
+    rest = _dumps({key: value for key, value in payload.items() if key != context_key})
+    head = b'{' + _dumps(context_key) + b':' + context.to_json()
+    return head + (b"," + rest[1:] if rest != b"{}" else b"}")
@@ -0,0 +1,212 @@
+# Description: Request scheduler in front of the inference client: priority classes, weighted fair queuing across tenants, per-model in-flight limits and load shedding.
+import os
+import asyncio
+import logging
+import contextvars
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Deque, Dict, Iterator, List, NamedTuple, Optional
+from latency import latency_summary
+from tokens import current_caller
+
+logger = logging.getLogger(__name__)
+
+
+class PriorityClass(NamedTuple):
+    name: str
+    rank: int  # lower ranks are always served first
+    max_queue: int
+    overflow: str  # "shed" rejects requests when the queue is full, "wait" blocks the caller until there is room
+    max_wait: Optional[float] = None  # queue wait SLA in seconds, misses are counted and logged
+
+
+default_classes = [
+    # Interactive traffic fails fast rather than queueing behind a backlog nobody is waiting for
+    PriorityClass("interactive", 0, max_queue=100, overflow="shed", max_wait=1.0),
+    PriorityClass("batch", 1, max_queue=1000, overflow="wait"),
+]
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when a request is shed because its priority class queue is full."""
+
+
+class _Waiter(NamedTuple):
+    start: float  # virtual start and finish times for weighted fair queuing
+    finish: float
+    seq: int
+    tenant: str
+    model: str
+    enqueued_at: float
+    future: asyncio.Future
+
+
+# The priority class of requests made in the current context, see `schedule_as`
+current_priority: contextvars.ContextVar[str] = contextvars.ContextVar("current_priority", default="interactive")
+
+
+@contextmanager
+def schedule_as(priority: str) -> Iterator[None]:
+    """Schedules every request made inside the block (including in tasks it starts) in the `priority` class."""
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class Scheduler:
+    """
+    Orders requests before they are sent, so bulk jobs and interactive traffic can share one API quota.
+
+    Classes are served in strict priority order. Within a class, tenants (the usage caller by default)
+    share the capacity in proportion to their weight, so one large job can't starve the others.
+
+    Args:
+        classes: The priority classes, see `default_classes`.
+        max_in_flight: Requests in flight per model, unless overridden in `model_limits`.
+        model_limits: In-flight limit per model name.
+        reserved: Slots per model that only the top priority class may use, so a bulk job that
+            fills the quota still leaves room for interactive requests to start immediately.
+        tenant_weights: Fair share weight per tenant, 1 by default.
+    """
+
+    def __init__(
+            self,
+            classes: Optional[List[PriorityClass]] = None,
+            max_in_flight: int = 16,
+            model_limits: Optional[Dict[str, int]] = None,
+            reserved: int = 2,
+            tenant_weights: Optional[Dict[str, float]] = None,
+            ):
+        self.classes = {c.name: c for c in sorted(classes or default_classes, key=lambda c: c.rank)}
+        self.top_rank = min(c.rank for c in self.classes.values())
+        self.max_in_flight = max_in_flight
+        self.model_limits = dict(model_limits or {})
+        self.reserved = reserved
+        self.tenant_weights = dict(tenant_weights or {})
+        self.in_flight: Dict[str, int] = defaultdict(int)
+        self.queues: Dict[str, List[_Waiter]] = {name: [] for name in self.classes}
+        self._virtual_time: Dict[str, float] = defaultdict(float)
+        self._last_finish: Dict[tuple, float] = defaultdict(float)
+        self._space_waiters: Dict[str, Deque[asyncio.Future]] = defaultdict(deque)
+        self._seq = 0
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.stats = {name: {"requests": 0, "shed": 0, "sla_misses": 0} for name in self.classes}
+        self.waits: Dict[str, Deque[float]] = {name: deque(maxlen=1000) for name in self.classes}
+
+    def limit(self, model: str, priority: str) -> int:
+        limit = self.model_limits.get(model, self.max_in_flight)
+        if self.classes[priority].rank == self.top_rank:
+            return limit
+        return max(1, limit - self.reserved)
+
+    def _has_capacity(self, model: str, priority: str) -> bool:
+        return self.in_flight[model] < self.limit(model, priority)
+
+    def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        for name, priority_class in self.classes.items():
+            queue = self.queues[name]
+            while queue:
+                ready = [waiter for waiter in queue if self._has_capacity(waiter.model, name)]
+                if not ready:
+                    break
+                waiter = min(ready, key=lambda w: (w.finish, w.seq))
+                queue.remove(waiter)
+                self._wake_space_waiter(name)
+                self._virtual_time[name] = max(self._virtual_time[name], waiter.start)
+                self.in_flight[waiter.model] += 1
+                self._record_wait(priority_class, waiter.tenant, loop.time() - waiter.enqueued_at)
+                waiter.future.set_result(None)
+
+    def _wake_space_waiter(self, priority: str) -> None:
+        waiters = self._space_waiters[priority]
+        while waiters:
+            future = waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+
+    def _record_wait(self, priority_class: PriorityClass, tenant: str, wait: float) -> None:
+        self.waits[priority_class.name].append(wait * 1000)
+        if priority_class.max_wait is not None and wait > priority_class.max_wait:
+            self.stats[priority_class.name]["sla_misses"] += 1
+            logger.warning(f"Request of '{tenant}' waited {wait * 1000:.0f} ms in the '{priority_class.name}' queue, "
+                           f"over its {priority_class.max_wait * 1000:.0f} ms SLA")
+
+    async def _wait_for_room(self, priority_class: PriorityClass) -> None:
+        queue = self.queues[priority_class.name]
+        while len(queue) >= priority_class.max_queue:
+            if priority_class.overflow == "shed":
+                self.stats[priority_class.name]["shed"] += 1
+                raise SchedulerOverloaded(f"The '{priority_class.name}' queue is full ({len(queue)} requests waiting)")
+            future = asyncio.get_running_loop().create_future()
+            self._space_waiters[priority_class.name].append(future)
+            await future
+
+    async def acquire(self, model: str, priority: Optional[str] = None, tenant: Optional[str] = None, cost: float = 1.0) -> None:
+        """
+        Waits for an in-flight slot for `model`. Every acquire must be followed by `release(model)`,
+        prefer `slot()`. `cost` is the request's share of its tenant's budget, e.g. its token count.
+
+        Raises:
+            SchedulerOverloaded: The request was shed.
+        """
+        priority = priority or current_priority.get()
+        tenant = tenant or current_caller.get()
+        if priority not in self.classes:
+            raise ValueError(f"Unknown priority class '{priority}', expected one of {list(self.classes)}")
+        priority_class = self.classes[priority]
+        self.stats[priority]["requests"] += 1
+        await self._wait_for_room(priority_class)
+
+        loop = asyncio.get_running_loop()
+        start = max(self._virtual_time[priority], self._last_finish[priority, tenant])
+        finish = start + cost / self.tenant_weights.get(tenant, 1.0)
+        self._last_finish[priority, tenant] = finish
+        self._seq += 1
+        waiter = _Waiter(start, finish, self._seq, tenant, model, loop.time(), loop.create_future())
+        self.queues[priority].append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # The slot was granted just as the caller was cancelled
+                self.release(model)
+            elif waiter in self.queues[priority]:
+                self.queues[priority].remove(waiter)
+                self._wake_space_waiter(priority)
+            raise
+
+    def release(self, model: str) -> None:
+        self.in_flight[model] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: Optional[str] = None, tenant: Optional[str] = None, cost: float = 1.0) -> AsyncIterator[None]:
+        """Holds an in-flight slot for `model` during the block, see `acquire`."""
+        await self.acquire(model, priority, tenant, cost)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "in_flight": {model: count for model, count in self.in_flight.items() if count},
+            "classes": {
+                name: {
+                    **self.stats[name],
+                    "queued": len(self.queues[name]),
+                    "wait_ms": latency_summary(list(self.waits[name])),
+                }
+                for name in self.classes
+            },
+        }
+
+
+scheduler = Scheduler(max_in_flight=int(os.getenv("MAX_IN_FLIGHT", "16")))
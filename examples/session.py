@@ -0,0 +1,147 @@
+# Description: Multi-turn conversation session over `fetch` that keeps the request size bounded with a sliding window or background summaries.
+import asyncio
+import logging
+from typing import Dict, List, NamedTuple, Optional
+from inference import fetch as fetch_inflection
+from prompts import format_message, openai_roles
+from tokens import count_tokens, message_overhead, message_text
+
+logger = logging.getLogger(__name__)
+
+summary_system_prompt = """
+You maintain the running summary of a conversation between a user and an AI assistant.
+You will receive the current summary, which may be empty, and the oldest turns of the conversation.
+Return an updated summary that keeps every fact, name, number, decision, preference and open question the assistant will need to continue the conversation. Be concise and write plain text without any preamble.
+"""
+
+
+class Turn(NamedTuple):
+    id: int
+    role: str  # "user" or "assistant"
+    text: str
+    tokens: int
+
+
+class Session:
+    """
+    A conversation whose history is appended turn by turn, with the token count of every turn
+    computed once, and compacted so the history sent with each request stays within `history_tokens`.
+
+    Args:
+        system_prompt: The system prompt sent first in every request.
+        history_tokens: Token budget for the turns (and summary) sent with each request.
+        policy: "window" drops the oldest turns. "summarize" folds them into a running summary
+            in a background task, falling back to the window while a summary is pending.
+        keep_turns: Number of most recent turns never summarized away.
+        summarize_at: Fraction of `history_tokens` at which summarization starts.
+    """
+
+    def __init__(
+            self,
+            system_prompt: str,
+            model: str = "inflection_3_pi",
+            legacy_api: bool = True,
+            history_tokens: int = 3000,
+            policy: str = "summarize",
+            keep_turns: int = 4,
+            summarize_at: float = 0.75,
+            ):
+        if policy not in ("window", "summarize"):
+            raise ValueError(f"Unknown history policy '{policy}', expected 'window' or 'summarize'")
+        self.system_prompt = system_prompt
+        self.model = model
+        self.legacy_api = legacy_api
+        self.history_tokens = history_tokens
+        self.policy = policy
+        self.keep_turns = keep_turns
+        self.summarize_at = summarize_at
+        self.turns: List[Turn] = []
+        self.summary = ""
+        self.summary_tokens = 0
+        self._next_id = 0
+        self._summary_task: Optional[asyncio.Task] = None
+
+    def add(self, role: str, text: str) -> Turn:
+        turn = Turn(self._next_id, role, text, count_tokens(text) + message_overhead)
+        self._next_id += 1
+        self.turns.append(turn)
+        return turn
+
+    def add_message(self, message: Dict[str, str]) -> Turn:
+        """Appends a user or assistant message in either the legacy (type/text) or OpenAI (role/content) format."""
+        role = message["role"] if "role" in message else openai_roles[message["type"]]
+        if role not in ("user", "assistant"):
+            raise ValueError(f"Only user and assistant turns can be added to a session, got '{role}'")
+        return self.add(role, message_text(message))
+
+    @property
+    def used_tokens(self) -> int:
+        return self.summary_tokens + sum(turn.tokens for turn in self.turns)
+
+    def context(self) -> List[Dict[str, str]]:
+        """The request context: system prompt (with the running summary, if any) followed by the retained turns."""
+        system_prompt = self.system_prompt
+        if self.summary:
+            system_prompt += f"\n\n# Summary of the earlier conversation\n{self.summary}"
+        return [format_message("system", system_prompt, self.legacy_api)] + \
+            [format_message(turn.role, turn.text, self.legacy_api) for turn in self.turns]
+
+    def _drop_oldest(self) -> None:
+        while self.used_tokens > self.history_tokens and len(self.turns) > 1:
+            dropped = self.turns.pop(0)
+            logger.debug(f"Dropped turn {dropped.id} ({dropped.tokens} tokens) from the session window")
+
+    def _maybe_summarize(self) -> None:
+        if self._summary_task is not None and not self._summary_task.done():
+            return
+        candidates = self.turns[:-self.keep_turns] if self.keep_turns else list(self.turns)
+        if self.used_tokens < self.history_tokens * self.summarize_at or not candidates:
+            return
+        self._summary_task = asyncio.create_task(self._summarize(candidates))
+
+    async def _summarize(self, turns: List[Turn]) -> None:
+        transcript = "\n".join(f"{turn.role}: {turn.text}" for turn in turns)
+        context = [
+            format_message("system", summary_system_prompt, self.legacy_api),
+            format_message("user", f"Current summary: {self.summary or '(empty)'}\n\nOldest turns:\n{transcript}", self.legacy_api),
+        ]
+        summary = await fetch_inflection(context, self.model, legacy_api=self.legacy_api)
+        if not summary:
+            logger.error("Session summarization failed, keeping the sliding window")
+            return
+        # Turns appended (or dropped by the window) meanwhile are left untouched
+        last_id = turns[-1].id
+        self.turns = [turn for turn in self.turns if turn.id > last_id]
+        self.summary = summary.strip()
+        self.summary_tokens = count_tokens(self.summary)
+        logger.info(f"Summarized {len(turns)} turn(s) into {self.summary_tokens} tokens")
+
+    def compact(self) -> None:
+        """Applies the history policy. Called after every turn; summarization runs in the background."""
+        if self.policy == "summarize":
+            self._maybe_summarize()
+        # Hard bound in both modes, e.g. while a summary is still being written
+        self._drop_oldest()
+
+    async def send(self, text: str, **kwargs) -> Optional[str]:
+        """
+        Appends the user turn, sends the conversation and appends the reply.
+        Extra keyword arguments are passed to `fetch` (e.g. `temperature`).
+
+        Returns:
+            The assistant reply, or None if the request failed (the user turn is then removed).
+        """
+        turn = self.add("user", text)
+        self.compact()
+        reply = await fetch_inflection(self.context(), self.model, legacy_api=self.legacy_api, **kwargs)
+        if reply is None:
+            self.turns = [t for t in self.turns if t.id != turn.id]
+            return None
+        self.add("assistant", reply)
+        self.compact()
+        return reply
+
+    async def close(self) -> None:
+        """Waits for a pending background summary."""
+        if self._summary_task is not None:
+            await self._summary_task
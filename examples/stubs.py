@@ -0,0 +1,92 @@
+# Description: Local stand-ins for the upstream HTTP APIs so tools can be tested and benchmarked offline.
+import asyncio
+from typing import Tuple
+from aiohttp import web
+
+# Per-app request counters, e.g. `app[stats]["requests"]`
+stats = web.AppKey("stats", dict)
+# Settings of a running stand-in that tests may change, e.g. `app[behavior]["status"] = 503`
+behavior = web.AppKey("behavior", dict)
+
+
+def forecast_app(temperature_celsius: float = 24.5, latency: float = 0.0) -> web.Application:
+    """
+    Returns an app serving the subset of the Open-Meteo `/v1/forecast` API used by weather.py.
+
+    Args:
+        temperature_celsius: The current temperature reported for every location.
+        latency: Seconds to wait before answering, to simulate a network round trip.
+    """
+    app = web.Application()
+    app[stats] = {"requests": 0}
+
+    async def forecast(request: web.Request) -> web.Response:
+        app[stats]["requests"] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        unit = request.query.get("temperature_unit", "celsius")
+        temperature = temperature_celsius if unit == "celsius" else round(temperature_celsius * 9 / 5 + 32, 1)
+        return web.json_response({
+            "latitude": float(request.query["latitude"]),
+            "longitude": float(request.query["longitude"]),
+            "current": {"temperature_2m": temperature, "wind_speed_10m": 10.0},
+        })
+
+    app.router.add_get("/v1/forecast", forecast)
+    return app
+
+
+def inference_app(reply: str = "Hello from the stand-in", latency: float = 0.0, status: int = 200) -> web.Application:
+    """
+    Returns an app standing in for the Inflection AI inference API, serving both the legacy and the
+    OpenAI compatible chat completion endpoints, plus `GET /` for health checks.
+
+    Args:
+        reply: The text of every completion.
+        latency: Seconds to wait before answering.
+        status: HTTP status of every response; anything but 200 answers with an error body.
+    """
+    app = web.Application()
+    app[stats] = {"requests": 0, "keys": {}}
+    app[behavior] = {"reply": reply, "latency": latency, "status": status}
+
+    async def respond(request: web.Request, body: dict) -> web.Response:
+        app[stats]["requests"] += 1
+        key = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        app[stats]["keys"][key] = app[stats]["keys"].get(key, 0) + 1
+        if app[behavior]["latency"]:
+            await asyncio.sleep(app[behavior]["latency"])
+        if app[behavior]["status"] != 200:
+            return web.json_response({"error": "stand-in failure"}, status=app[behavior]["status"])
+        return web.json_response(body)
+
+    async def legacy(request: web.Request) -> web.Response:
+        await request.json()
+        return await respond(request, {"text": app[behavior]["reply"]})
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        payload = await request.json()
+        return await respond(request, {
+            "model": payload.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": app[behavior]["reply"]}}],
+        })
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"}, status=app[behavior]["status"])
+
+    app.router.add_post("/external/api/inference", legacy)
+    app.router.add_post("/external/api/inference/openai/v1/chat/completions", chat_completions)
+    app.router.add_get("/", health)
+    return app
+
+
+async def start_stub(app: web.Application, host: str = "127.0.0.1", port: int = 0) -> Tuple[web.AppRunner, str]:
+    """
+    Starts `app` on a local port and returns the runner (call `runner.cleanup()` to stop it) and its base URL.
+    """
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}"
@@ -0,0 +1,36 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import re
+import pytest
+from cassettes import use_cassette
+
+cassette_dir = os.path.join(os.path.dirname(__file__), "cassettes")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "cassette: test calls live APIs and can be recorded/replayed")
+
+
+@pytest.fixture(autouse=True)
+def cassette(request):
+    """
+    Runs each test marked `cassette` against its own cassette file when CASSETTE_MODE is "record"
+    or "replay". Tests against local stubs are left alone. For example
+    `CASSETTE_MODE=record pytest tests/test_automated.py` once with API keys, then
+    `CASSETTE_MODE=replay pytest tests/test_automated.py` offline. CASSETTE_LATENCY=1 replays recorded timings.
+    """
+    mode = os.getenv("CASSETTE_MODE", "off")
+    if mode == "off" or request.node.get_closest_marker("cassette") is None:
+        # Explicitly off, so CASSETTE_MODE doesn't reach tests that talk to local stubs
+        with use_cassette(None, "off") as active:
+            yield active
+        return
+    module = request.module.__name__.rsplit(".", 1)[-1]
+    name = re.sub(r"[^\w.-]+", "_", request.node.name)
+    with use_cassette(os.path.join(cassette_dir, module, name + ".jsonl"), mode,
+                      os.getenv("CASSETTE_LATENCY") == "1") as active:
+        yield active
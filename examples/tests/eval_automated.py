@@ -0,0 +1,173 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Runs the test_automated scenarios concurrently and repeatedly, and writes a JSON report.
+# Usage (from the examples directory): python -m tests.eval_automated --repeats 5 --output eval_report.json
+
+import json
+import asyncio
+import argparse
+from artifacts import linkedin_notifications_artifact_content
+from evals import Scenario, run_evals
+from .helpers import (
+    get_service_router_context,
+    sip_code_generation,
+    sip_code_generation_validation,
+    sip_classification,
+    sip_emotional_intelligence_linkedin,
+    sip_intent_recognition,
+    sip_rag_enabled_agents,
+    get_extract_time_context,
+    retrieve,
+    handle_query,
+    fetch_json
+)
+from utils import get_context, get_response
+from inference import fetch as fetch_inflection
+
+judge_system_prompt = '''
+Evaluate the output from GPT to ensure the it matches the intent and desired output of the original instructions. Check for correctness, logical consistency and proper sentence structure.
+
+Return a JSON response with the following structure:
+{
+    "is_valid": boolean,
+    "reasoning": string
+}
+'''
+
+code_generation_instructions = """
+    Write a Python function to return the sum of two numbers.
+    """
+
+document_text = """
+    Project Alpha
+
+    Scope and Objectives:Develop a customer management platform for small businesses with user-friendly interfaces.
+
+    Deliverables:
+
+        - Functional web application.
+
+        - Deployment documentation.
+
+    Milestones:
+
+        - Prototype by March 15, 2025.
+
+        - Final delivery by May 30, 2025.
+
+    Payment Terms:
+
+        --50% upfront.
+
+        - 50% on final delivery.
+
+    Responsibilities:
+
+        Client: Provide requirements and feedback.
+
+        Contractor: Deliver on time and as specified.
+    """
+
+linkedin_message = linkedin_notifications_artifact_content + "\n # Which Notification Or Message The Human Wants You To Draft A Reply To: New Connection Request: John Smith"
+meeting_message = "Let's schedule the meeting for 5pm for 2 hours"
+weather_question = "What is the weather in Hawaii?"
+bug_email = "Good day! I stumbled upon a charming little bug in one of your functions, please fix."
+rag_question = "What are the benefits of electric vehicles?"
+
+
+def judge(instructions: str, system_prompt: str = judge_system_prompt):
+    async def validate(output) -> dict:
+        validation_prompt = f"""
+    Original Instructions:
+    {instructions}
+
+    Generated output:
+    {output}
+    """
+        return await fetch_json(system_prompt, validation_prompt)
+    return validate
+
+
+def expect(key: str, value: str):
+    # Deterministic check for scenarios with a known answer; no judge call needed
+    async def validate(output) -> dict:
+        return {"is_valid": output.get(key) == value, "reasoning": f"{key}={output.get(key)!r}"}
+    return validate
+
+
+async def generate_text(context, legacy_api: bool):
+    return await fetch_inflection(context, legacy_api=legacy_api)
+
+
+def generate_xml(keys):
+    async def generate(context, legacy_api: bool):
+        return await get_response(context, keys, legacy_api=legacy_api)
+    return generate
+
+
+async def generate_weather_answer(context, legacy_api: bool):
+    return await handle_query(weather_question, legacy_api=legacy_api)
+
+
+async def rag_context(legacy_api: bool):
+    # Retrieval runs in a worker thread, so concurrent scenarios keep the event loop free
+    query = f"Query: {rag_question}\nRetrieved context: {await retrieve(rag_question)}"
+    return get_context(sip_rag_enabled_agents, query, legacy_api=legacy_api)
+
+
+scenarios = [
+    Scenario("code_generation", generate_text,
+             judge(code_generation_instructions, sip_code_generation_validation),
+             lambda legacy_api: get_context(sip_code_generation, code_generation_instructions,
+                                            user_input_label="User's instructions:", legacy_api=legacy_api)),
+    Scenario("restaurant_review_flow", generate_xml(["reasoning", "intent"]),
+             expect("intent", "view_restaurant_reviews"),
+             lambda legacy_api: get_service_router_context("search_nearby_restaurants", "Please show me the reviews.",
+                                                           legacy_api=legacy_api)),
+    Scenario("document_classification", generate_xml(["category"]),
+             expect("category", "statement_of_work"),
+             lambda legacy_api: get_context(sip_classification, document_text, legacy_api=legacy_api)),
+    Scenario("emotional_intelligence", generate_xml(["response"]),
+             judge(linkedin_message),
+             lambda legacy_api: get_context(sip_emotional_intelligence_linkedin, linkedin_message, legacy_api=legacy_api)),
+    Scenario("few_shot_learning", generate_xml(["start_time", "end_time"]),
+             judge(meeting_message),
+             lambda legacy_api: get_extract_time_context(meeting_message, legacy_api=legacy_api)),
+    Scenario("function_calling", generate_weather_answer, judge(weather_question)),
+    Scenario("intent_recognition", generate_xml(["reasoning", "intent_recognized"]),
+             judge(bug_email),
+             lambda legacy_api: get_context(sip_intent_recognition, bug_email, user_input_label="Email body",
+                                            legacy_api=legacy_api)),
+    Scenario("rag_enabled_agents", generate_text, judge(rag_question), rag_context),
+]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the automated evaluation scenarios concurrently.")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per scenario and API flavor")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight")
+    parser.add_argument("--api", choices=["legacy", "openai", "both"], default="both")
+    parser.add_argument("--only", nargs="*", default=None, help="Scenario names to run (default: all)")
+    parser.add_argument("--label", default=None, help="Free-form run label, e.g. the model version")
+    parser.add_argument("--output", default="-", help="Report path ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    selected = [scenario for scenario in scenarios if not args.only or scenario.name in args.only]
+    legacy_apis = {"legacy": [True], "openai": [False], "both": [True, False]}[args.api]
+    report = asyncio.run(run_evals(selected, args.repeats, legacy_apis, args.concurrency, args.label))
+
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,15 @@ import os
 # Add the parent directory to sys.path so we can add examples/utils.py
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from typing import Optional
+from utils import get_response
+from prompts import PromptTemplate, format_message, register_template
+from few_shot import ExampleStore
+from intent_router import IntentRouter
+
+service_router_examples_path = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'service_router_examples.jsonl'))
+
 
 system_instruction_prompt = """
 You are an AI assistant designed to determine the correct service intent for routing a user's query. Follow a step-by-step approach based on the sequence of prior intents and the user's current input.
@@ -80,65 +89,73 @@ example_output_4 = """
 """
 
 
-def get_service_router_context(previous_intents: str, service_request: str, legacy_api: bool = True) -> list:
+router_example_store = ExampleStore()
+for _previous_intents, _user_query, _output in [
+    (example_previous_intents_1, example_previous_user_query_1, example_output_1),
+    (example_previous_intents_2, example_previous_user_query_2, example_output_2),
+    (example_previous_intents_3, example_previous_user_query_3, example_output_3),
+    (example_previous_intents_4, example_previous_user_query_4, example_output_4),
+]:
+    router_example_store.add(
+        [("user", _previous_intents), ("user", _user_query), ("assistant", _output)],
+        key=f"{_previous_intents} {_user_query}",
+    )
+
+# All examples, precompiled for the default (no selection) case
+service_router_template = register_template(PromptTemplate(
+    "service_router",
+    system_instruction_prompt,
+    [turn for example in router_example_store.examples for turn in example.turns],
+))
+
+
+def get_service_router_context(
+        previous_intents: str,
+        service_request: str,
+        legacy_api: bool = True,
+        k: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        ) -> list:
     """
     Returns the context for the service router.
-    """
 
-    if legacy_api:
-        context = [
-            {"type": "Instruction", "text": system_instruction_prompt},
-
-            {"type": "Human", "text": example_previous_intents_1},
-            {"type": "Human", "text": example_previous_user_query_1},
-            {"type": "AI", "text": example_output_1},
-
-            {"type": "Human", "text": example_previous_intents_2},
-            {"type": "Human", "text": example_previous_user_query_2},
-            {"type": "AI", "text": example_output_2},
-
-            {"type": "Human", "text": example_previous_intents_3},
-            {"type": "Human", "text": example_previous_user_query_3},
-            {"type": "AI", "text": example_output_3},
-
-            {"type": "Human", "text": example_previous_intents_4},
-            {"type": "Human", "text": example_previous_user_query_4},
-            {"type": "AI", "text": example_output_4},
-            {
-                "type": "Human",
-                "text": f"Query: {previous_intents}",
-            },
-            {
-                "type": "Human",
-                "text": f"Query: {service_request}",
-            },
-        ]
-    else:
-        context = [
-                {"role": "system", "content": system_instruction_prompt},
-
-                {"role": "user", "content": example_previous_intents_1},
-                {"role": "user", "content": example_previous_user_query_1},
-                {"role": "assistant", "content": example_output_1},
-
-                {"role": "user", "content": example_previous_intents_2},
-                {"role": "user", "content": example_previous_user_query_2},
-                {"role": "assistant", "content": example_output_2},
-
-                {"role": "user", "content": example_previous_intents_3},
-                {"role": "user", "content": example_previous_user_query_3},
-                {"role": "assistant", "content": example_output_3},
-
-                {"role": "user", "content": example_previous_intents_4},
-                {"role": "user", "content": example_previous_user_query_4},
-                {"role": "assistant", "content": example_output_4},
-                {
-                    "role": "user",
-                    "content": f"Query: {previous_intents}",
-                },
-                {
-                    "role": "user",
-                    "content": f"Query: {service_request}",
-                },
-            ]
+    With `k` and/or `token_budget` set, only the most relevant examples from `router_example_store`
+    are included instead of all of them.
+    """
+    if k is None and token_budget is None:
+        return service_router_template.render(
+            f"Query: {previous_intents}", f"Query: {service_request}", legacy_api=legacy_api)
+
+    examples = router_example_store.select(f"{previous_intents} {service_request}", k=k, token_budget=token_budget)
+    context = [format_message("system", system_instruction_prompt, legacy_api)]
+    context += router_example_store.to_context(examples, legacy_api)
+    context += [
+        format_message("user", f"Query: {previous_intents}", legacy_api),
+        format_message("user", f"Query: {service_request}", legacy_api),
+    ]
     return context
+
+
+async def llm_service_route(previous_intents: str, service_request: str, legacy_api: bool = True) -> str:
+    """
+    Returns the intent chosen by the LLM service router.
+    """
+    context = get_service_router_context(previous_intents, service_request, legacy_api=legacy_api)
+    result = await get_response(context, ["reasoning", "intent"], legacy_api=legacy_api)
+    return result["intent"]
+
+
+_service_router: Optional[IntentRouter] = None
+
+
+def get_service_router(target_precision: float = 0.95) -> IntentRouter:
+    """
+    Returns the shared service router: a local classifier trained on the labeled examples and
+    calibrated for `target_precision`, falling back to the LLM router below that confidence.
+    Use `await get_service_router().route(previous_intents, service_request, legacy_api=...)`.
+    """
+    global _service_router
+    if _service_router is None:
+        _service_router = IntentRouter.from_jsonl(service_router_examples_path, llm_service_route)
+        _service_router.calibrate(target_precision)
+    return _service_router
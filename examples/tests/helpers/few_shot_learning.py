@@ -1,3 +1,13 @@
+import sys
+import os
+
+# Add the parent directory to sys.path so we can add examples/utils.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from typing import Optional
+from prompts import PromptTemplate, format_message, register_template
+from few_shot import ExampleStore
+
 system_instruction_prompt = """
 You are an AI assistant designed to extract and format meeting time slots from user responses.
 
@@ -33,29 +43,35 @@ example_output_2 = """
 """
 
 
-def get_extract_time_context(message: str, legacy_api: bool = True) -> list:
-    if legacy_api:
-        context = [
-            {"type": "Instruction", "text": system_instruction_prompt},
-            {"type": "Human", "text": example_input_1},
-            {"type": "AI", "text": example_output_1},
-            {"type": "Human", "text": example_input_2},
-            {"type": "AI", "text": example_output_2},
-            {
-                "type": "Human",
-                "text": f"Email body: {message}",
-            },
-        ]
-    else:
-        context = [
-            {"role": "system", "content": system_instruction_prompt},
-            {"role": "user", "content": example_input_1},
-            {"role": "assistant", "content": example_output_1},
-            {"role": "user", "content": example_input_2},
-            {"role": "assistant", "content": example_output_2},
-            {
-                "role": "user",
-                "content": f"Email body: {message}",
-            },
-        ]
+extract_time_example_store = ExampleStore()
+extract_time_example_store.add([("user", example_input_1), ("assistant", example_output_1)])
+extract_time_example_store.add([("user", example_input_2), ("assistant", example_output_2)])
+
+# All examples, precompiled for the default (no selection) case
+extract_time_template = register_template(PromptTemplate(
+    "extract_time",
+    system_instruction_prompt,
+    [turn for example in extract_time_example_store.examples for turn in example.turns],
+))
+
+
+def get_extract_time_context(
+        message: str,
+        legacy_api: bool = True,
+        k: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        ) -> list:
+    """
+    Returns the context for extracting a meeting time slot.
+
+    With `k` and/or `token_budget` set, only the most relevant examples from
+    `extract_time_example_store` are included instead of all of them.
+    """
+    if k is None and token_budget is None:
+        return extract_time_template.render(f"Email body: {message}", legacy_api=legacy_api)
+
+    examples = extract_time_example_store.select(message, k=k, token_budget=token_budget)
+    context = [format_message("system", system_instruction_prompt, legacy_api)]
+    context += extract_time_example_store.to_context(examples, legacy_api)
+    context.append(format_message("user", f"Email body: {message}", legacy_api))
     return context
@@ -1,12 +1,21 @@
-import requests
 import sys
 import os
+import time
+import asyncio
+import logging
 
 # Add the parent directory to sys.path so we can add examples/utils.py & examples/inference.py
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from utils import get_context, get_response
 from inference import fetch as fetch_inflection
+from weather import get_weather
+from geocoding import locate
+from tokens import count_tokens, count_context_tokens
+from deadline import run_step
+from tracing import traced
+
+logger = logging.getLogger(__name__)
 
 system_instruction_prompt_intent = """
 You are a helpful AI assistant designed to determine the intent of a user's query.
@@ -83,48 +92,157 @@ You are a helpful AI assistant designed to assist users with their queries in a
 """
 
 
-def get_weather(latitude: str, longitude: str) -> dict:
+class SpeculationStats:
+    """
+    Running comparison of the latency saved by speculative execution against the extra tokens it spends.
+
+    A speculative branch saves min(intent latency, branch latency) over the sequential pipeline when it wins.
+    A losing branch costs its prompt tokens, plus its completion tokens if it finished before being discarded.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.runs = 0
+        self.saved_ms = 0.0
+        self.cancelled_branches = 0
+        self.discarded_branches = 0
+        self.wasted_prompt_tokens = 0
+        self.wasted_completion_tokens = 0
+
+    def report(self) -> dict:
+        wasted_tokens = self.wasted_prompt_tokens + self.wasted_completion_tokens
+        return {
+            "runs": self.runs,
+            "saved_ms_total": round(self.saved_ms, 2),
+            "saved_ms_per_run": round(self.saved_ms / self.runs, 2) if self.runs else 0.0,
+            "cancelled_branches": self.cancelled_branches,
+            "discarded_branches": self.discarded_branches,
+            "wasted_prompt_tokens": self.wasted_prompt_tokens,
+            "wasted_completion_tokens": self.wasted_completion_tokens,
+            "wasted_tokens_per_run": round(wasted_tokens / self.runs, 2) if self.runs else 0.0,
+            "wasted_tokens_per_saved_second": round(wasted_tokens / (self.saved_ms / 1000), 2) if self.saved_ms else None,
+        }
+
+
+speculation_stats = SpeculationStats()
+
+
+async def _timed(coro) -> tuple:
+    start_time = time.perf_counter()
+    result = await coro
+    return result, (time.perf_counter() - start_time) * 1000
+
+
+async def _discard(task: asyncio.Task, context: list) -> None:
+    """Cancels a losing speculative branch and records what it cost."""
+    speculation_stats.wasted_prompt_tokens += count_context_tokens(context)
+    if task.done() and not task.cancelled() and task.exception() is None:
+        speculation_stats.discarded_branches += 1
+        result, _ = task.result()
+        if isinstance(result, str):
+            speculation_stats.wasted_completion_tokens += count_tokens(result)
+        return
+    speculation_stats.cancelled_branches += 1
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def extract_lat_long(query: str, legacy_api: bool = True) -> tuple:
+    """
+    Returns the (latitude, longitude) of the location in the query, from the local gazetteer when it
+    resolves to a single place, otherwise from the LLM.
+    """
+    place = locate(query)
+    if place is not None:
+        return str(place.latitude), str(place.longitude)
+
+    context = get_context(system_instruction_prompt_lat_long, query, legacy_api=legacy_api)
+    result = await get_response(context, ["latitude", "longitude"], legacy_api=legacy_api)
+    return result["latitude"], result["longitude"]
+
+
+async def answer_weather(query: str, lat: str, long: str, legacy_api: bool = True) -> str:
+    weather = await run_step("weather", get_weather(lat, long))
+    message = f""" 
+    Original Message: {query}
+    Current temperature: {weather['temperature_celsius']}°C ({weather['temperature_fahrenheit']}°F)"""
+    context = get_context(system_instruction_prompt_weather, message, legacy_api=legacy_api)
+    return await run_step("answer", fetch_inflection(context, legacy_api=legacy_api))
+
+
+@traced()
+async def handle_query(query: str, legacy_api: bool=True, speculative: bool = False) -> str:
     """
-    Get the weather information for the given latitude and longitude.
+    Answers a query, calling the weather tool when the query is about the weather.
+
+    Args:
+        speculative: Launch the lat/long extraction and the general answer in parallel with intent
+            detection, then cancel or discard whichever branch the intent rules out. Trades extra
+            tokens for one fewer sequential round trip, see `speculation_stats.report()`.
+
+    Run it under `deadline.deadline(seconds)` to bound the whole pipeline; the intent, coordinates,
+    weather and answer steps are timed and kept as partial results.
     """
-    # Fetch the weather data in Celsius
-    response_celsius = requests.get(
-        f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current=temperature_2m,wind_speed_10m&hourly=temperature_2m,relative_humidity_2m,wind_speed_10m&temperature_unit=celsius")
-    data_celsius = response_celsius.json()
-    temperature_celsius = data_celsius['current']['temperature_2m']
-
-    # Fetch the weather data in Fahrenheit
-    response_fahrenheit = requests.get(
-        f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&current=temperature_2m,wind_speed_10m&hourly=temperature_2m,relative_humidity_2m,wind_speed_10m&temperature_unit=fahrenheit")
-    data_fahrenheit = response_fahrenheit.json()
-    temperature_fahrenheit = data_fahrenheit['current']['temperature_2m']
-
-    # Return both temperatures
-    return {
-        'temperature_celsius': temperature_celsius,
-        'temperature_fahrenheit': temperature_fahrenheit
-    }
-
-
-async def handle_query(query: str, legacy_api: bool=True) -> str:
-    
+    if speculative:
+        return await _handle_query_speculative(query, legacy_api)
+
     # Extract the intent
     context = get_context(system_instruction_prompt_intent, query, legacy_api=legacy_api)
-    result = await get_response(context, ["reasoning", "intent_recognized"], legacy_api=legacy_api)
+    result = await run_step("intent", get_response(context, ["reasoning", "intent_recognized"], legacy_api=legacy_api))
     intent = result["intent_recognized"]
 
     match intent:
         case "weather":
-            context_2 = get_context(system_instruction_prompt_lat_long, query, legacy_api=legacy_api)
-            result = await get_response(context_2, ["latitude", "longitude"], legacy_api=legacy_api)
-            lat = result["latitude"]
-            long = result["longitude"]
-            weather = get_weather(lat, long)
-            message = f""" 
-            Original Message: {query}
-            Current temperature: {weather['temperature_celsius']}°C ({weather['temperature_fahrenheit']}°F)"""
-            context_3 = get_context(system_instruction_prompt_weather, message, legacy_api=legacy_api)
-            return await fetch_inflection(context_3, legacy_api=legacy_api)
+            lat, long = await run_step("coordinates", extract_lat_long(query, legacy_api=legacy_api))
+            return await answer_weather(query, lat, long, legacy_api=legacy_api)
         case "other":
             context_2 = get_context(system_instruction_prompt_general, query, legacy_api=legacy_api)
-            return await fetch_inflection(context_2, legacy_api=legacy_api)
+            return await run_step("answer", fetch_inflection(context_2, legacy_api=legacy_api))
+
+
+async def _handle_query_speculative(query: str, legacy_api: bool) -> str:
+    context_intent = get_context(system_instruction_prompt_intent, query, legacy_api=legacy_api)
+    context_lat_long = get_context(system_instruction_prompt_lat_long, query, legacy_api=legacy_api)
+    context_general = get_context(system_instruction_prompt_general, query, legacy_api=legacy_api)
+
+    # Only speculate on the coordinates when the gazetteer can't resolve them locally
+    place = locate(query)
+    lat_long_task = None
+    if place is None:
+        lat_long_task = asyncio.create_task(
+            _timed(run_step("coordinates", get_response(context_lat_long, ["latitude", "longitude"], legacy_api=legacy_api))))
+    general_task = asyncio.create_task(_timed(run_step("answer", fetch_inflection(context_general, legacy_api=legacy_api))))
+
+    try:
+        result, intent_ms = await _timed(
+            run_step("intent", get_response(context_intent, ["reasoning", "intent_recognized"], legacy_api=legacy_api)))
+    except BaseException:
+        for task in (lat_long_task, general_task):
+            if task is not None:
+                task.cancel()
+        raise
+    intent = result["intent_recognized"]
+    speculation_stats.runs += 1
+
+    match intent:
+        case "weather":
+            await _discard(general_task, context_general)
+            if lat_long_task is None:
+                return await answer_weather(query, str(place.latitude), str(place.longitude), legacy_api=legacy_api)
+            result, branch_ms = await lat_long_task
+            speculation_stats.saved_ms += min(intent_ms, branch_ms)
+            logger.info(f"Speculation report: {speculation_stats.report()}")
+            return await answer_weather(query, result["latitude"], result["longitude"], legacy_api=legacy_api)
+        case "other":
+            if lat_long_task is not None:
+                await _discard(lat_long_task, context_lat_long)
+            response, branch_ms = await general_task
+            speculation_stats.saved_ms += min(intent_ms, branch_ms)
+            logger.info(f"Speculation report: {speculation_stats.report()}")
+            return response
+        case _:
+            if lat_long_task is not None:
+                await _discard(lat_long_task, context_lat_long)
+            await _discard(general_task, context_general)
@@ -0,0 +1,75 @@
+import sys
+import os
+
+# Add the examples directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import json
+import time
+import asyncio
+import logging
+import weakref
+from typing import Any, Dict, Optional
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, RateLimitError
+from cassettes import CassetteTransport
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+groq_api_key = os.getenv("GROQ_API_KEY")
+groq_base_url = "https://api.groq.com/openai/v1"
+
+# One client per event loop, like http_client.get_session: httpx connection pools are loop-bound
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+
+def get_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key=groq_api_key or "",  # replayed runs don't need a key
+            base_url=groq_base_url,
+            http_client=httpx.AsyncClient(transport=CassetteTransport()),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def fetch_json(system_message: str, user_message: str) -> Optional[Dict[str, Any]]:
+    """Fetches a JSON response from Groq API."""
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ]
+    logger.info("Sending messages to Groq API... ")
+    try:
+        start_time = time.time()
+        chat_completion = await get_client().chat.completions.create(
+            messages=messages,
+            model="llama3-70b-8192",
+            temperature=1e-08,
+            response_format={"type": "json_object"},
+        )
+        end_time = time.time()
+        duration = (end_time - start_time) * 1000
+        logger.info(f"Groq API request took {duration:.2f} ms")
+
+        json_string = chat_completion.choices[0].message.content
+        try:
+            json_response = json.loads(json_string)
+            logger.info(f"JSON response: {json_response}")
+            return json_response
+        except json.JSONDecodeError:
+            logger.exception("Failed to decode JSON string.")
+            return None
+    except RateLimitError:
+        logger.exception("Request exceeded rate limit")
+        return None
+    except Exception:
+        logger.exception("Error calling Groq.")
+        return None
@@ -1,8 +1,21 @@
+import sys
+import os
+
+# Add the parent directory to sys.path so we can add examples/tokens.py
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import asyncio
 import torch
-import tiktoken
 import numpy as np
 from scipy.spatial.distance import cdist
 from transformers import AutoTokenizer, AutoModel
+from typing import Optional
+from tokens import chunk_text
+from deadline import run_step
+from inference import fetch as fetch_inflection
+from utils import get_context
+from workflow import Workflow
+from tracing import traced
 
 model_name = "answerdotai/ModernBERT-base"
 tokenizer = AutoTokenizer.from_pretrained(model_name)
@@ -16,19 +29,13 @@ texts = [
 
 
 def get_chunks(texts: list, max_tokens: int = 10, encoding_name: str = "cl100k_base") -> list:
-    enc = tiktoken.get_encoding(encoding_name)
-    chunks = []
-    for text in texts:
-        tokens = enc.encode(text)
-        for i in range(0, len(tokens), max_tokens):
-            chunk = tokens[i:i + max_tokens]
-            chunks.append(enc.decode(chunk))
-    return chunks
+    return [chunk for text in texts for chunk in chunk_text(text, max_tokens, encoding_name)]
 
 
 processed_chunks = get_chunks(texts)
 
 
+@traced()
 def encode_text(text: str) -> np.ndarray:
     """Encodes a piece of text using ModernBERT"""
     inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True)
@@ -43,6 +50,7 @@ chunk_embeddings = np.array([encode_text(chunk) for chunk in processed_chunks])
 chunk_dict = {i: processed_chunks[i] for i in range(len(processed_chunks))}
 
 
+@traced()
 def retrieve_top_k(query: str, k: int = 4) -> list:
     """Encodes query, retrieves top k matching chunks using cosine similarity"""
     query_embedding = encode_text(query).reshape(1, -1)  # Encode query
@@ -53,6 +61,11 @@ def retrieve_top_k(query: str, k: int = 4) -> list:
     return retrieved_texts
 
 
+async def retrieve(query: str, k: int = 4) -> list:
+    """Runs retrieve_top_k off the event loop, as the "retrieval" step of the current deadline"""
+    return await run_step("retrieval", asyncio.to_thread(retrieve_top_k, query, k))
+
+
 system_instruction_prompt = """
 You are a helpful assistant. Your task is to answer the user's question strictly based on the provided context.
 
@@ -61,3 +74,17 @@ You are a helpful assistant. Your task is to answer the user's question strictly
 - Your answer must be based only on the provided context. Do not include any external information or assumptions.
 - If the answer is not in the context, state that explicitly. Do not attempt to infer or fabricate an answer.
 """
+
+# Retrieve-then-answer as a workflow: answers to repeated questions come from the memo
+rag_workflow = Workflow("rag")
+
+
+@rag_workflow.node()
+async def chunks(question: str) -> list:
+    return await retrieve(question)
+
+
+@rag_workflow.node()
+async def answer(question: str, chunks: list, legacy_api: bool) -> Optional[str]:
+    context = get_context(system_instruction_prompt, f"Query: {question}\nRetrieved context: {chunks}", legacy_api=legacy_api)
+    return await fetch_inflection(context, legacy_api=legacy_api)
@@ -0,0 +1,99 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import time
+import asyncio
+import pytest
+import agent
+from agent import ToolRegistry, run_agent
+
+
+def tool_schema(name: str) -> dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "parameters": {"type": "object", "properties": {"city": {"type": "string"}}},
+        },
+    }
+
+
+def tool_call(call_id: str, name: str, **arguments) -> dict:
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+
+def fake_model(turns: list, seen: list):
+    async def fetch_message(messages, model=None, tools=None, temperature=0.0):
+        seen.append(list(messages))
+        return turns.pop(0)
+    return fetch_message
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_in_one_turn_run_concurrently(monkeypatch):
+    registry = ToolRegistry()
+
+    @registry.register(tool_schema("slow_lookup"))
+    async def slow_lookup(city: str) -> dict:
+        await asyncio.sleep(0.2)
+        return {"city": city}
+
+    seen = []
+    turns = [
+        {"role": "assistant", "content": None, "tool_calls": [
+            tool_call("1", "slow_lookup", city="Honolulu"),
+            tool_call("2", "slow_lookup", city="Paris"),
+            tool_call("3", "slow_lookup", city="Tokyo"),
+        ]},
+        {"role": "assistant", "content": "Done"},
+    ]
+    monkeypatch.setattr(agent, "fetch_message", fake_model(turns, seen))
+
+    start = time.perf_counter()
+    response = await run_agent([{"role": "user", "content": "Weather?"}], registry)
+
+    assert response == "Done"
+    assert time.perf_counter() - start < 0.5
+    tool_messages = seen[1][2:]
+    assert [m["tool_call_id"] for m in tool_messages] == ["1", "2", "3"]
+    assert json.loads(tool_messages[1]["content"]) == {"city": "Paris"}
+
+
+@pytest.mark.asyncio
+async def test_tool_errors_and_timeouts_are_reported_to_the_model():
+    registry = ToolRegistry()
+
+    async def hangs(city: str) -> dict:
+        await asyncio.sleep(10)
+
+    def fails(city: str) -> dict:
+        raise ValueError("bad city")
+
+    registry.register(tool_schema("hangs"), hangs, timeout=0.05)
+    registry.register(tool_schema("fails"), fails)
+
+    timed_out = await registry.call(tool_call("1", "hangs", city="x"))
+    failed = await registry.call(tool_call("2", "fails", city="x"))
+    unknown = await registry.call(tool_call("3", "missing"))
+
+    assert "timed out" in timed_out["content"]
+    assert "bad city" in failed["content"]
+    assert "Unknown tool" in unknown["content"]
+
+
+@pytest.mark.asyncio
+async def test_max_iterations_guard(monkeypatch):
+    registry = ToolRegistry()
+    registry.register(tool_schema("echo"), lambda city: city)
+    looping_turn = {"role": "assistant", "content": None, "tool_calls": [tool_call("1", "echo", city="x")]}
+    seen = []
+    monkeypatch.setattr(agent, "fetch_message", fake_model([looping_turn] * 3, seen))
+
+    messages = [{"role": "user", "content": "Loop"}]
+    assert await run_agent(messages, registry, max_iterations=3) is None
+    assert len(seen) == 3
+    assert messages == [{"role": "user", "content": "Loop"}]
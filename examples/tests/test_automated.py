@@ -9,6 +9,7 @@ from artifacts import linkedin_notifications_artifact_content
 from .helpers import (
     get_service_router_context,
     sip_code_generation,
+    sip_code_generation_validation,
     sip_classification,
     sip_emotional_intelligence_linkedin,
     sip_intent_recognition,
@@ -23,21 +24,7 @@ from utils import get_context, get_response
 from inference import fetch as fetch_inflection
 from typing import Any, Dict, Optional
 
-pytestmark = pytest.mark.asyncio
-
-code_generation_validation_system_prompt = """
-You are a code reviewer responsible for validating generated code. Analyze the code based on:
-1. Correctness: Does the code solve the given problem?
-2. Syntax: Is the code syntactically correct?
-3. Best practices: Does it follow Python coding standards?
-
-Return a JSON response with the following structure:
-{
-    "is_valid": boolean,
-    "reasoning": string,
-    "suggestions": list[string] (if any improvements needed)
-}
-"""
+pytestmark = [pytest.mark.asyncio, pytest.mark.cassette]
 
 async def validate_generated_code(instructions: str, generated_code: str) -> Optional[Dict[str, Any]]:
     validation_prompt = f"""
@@ -50,7 +37,7 @@ async def validate_generated_code(instructions: str, generated_code: str) -> Opt
     Please validate if this code correctly implements the requirements.
     """
 
-    return await fetch_json(code_generation_validation_system_prompt, validation_prompt)
+    return await fetch_json(sip_code_generation_validation, validation_prompt)
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,157 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import asyncio
+import aiohttp
+import pytest
+from contextlib import asynccontextmanager
+import inference
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from balancer import Backend, KeyQuota, LoadBalancer, NoBackendAvailable, retry_after_seconds
+from http_client import close_session
+from stubs import behavior, inference_app, start_stub, stats
+
+path = "/external/api/inference"
+body = json.dumps({"config": "inflection_3_pi", "context": []}).encode()
+
+
+@asynccontextmanager
+async def stand_ins():
+    """Yields a function starting inference stand-ins, and a client session."""
+    runners = []
+
+    async def start(**kwargs):
+        app = inference_app(**kwargs)
+        runner, url = await start_stub(app)
+        runners.append(runner)
+        return app, url
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            yield start, session
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_ewma_prefers_the_faster_backend():
+    async with stand_ins() as (start, session):
+        fast, fast_url = await start(latency=0.0)
+        slow, slow_url = await start(latency=0.03)
+        balancer = LoadBalancer([Backend(fast_url, "key-fast"), Backend(slow_url, "key-slow")])
+
+        for _ in range(20):
+            assert await balancer.request_json(session, "POST", path, data=body) == {"text": "Hello from the stand-in"}
+        assert fast[stats]["requests"] > 3 * slow[stats]["requests"]
+        assert fast[stats]["keys"] == {"key-fast": fast[stats]["requests"]}
+
+
+@pytest.mark.asyncio
+async def test_failing_backend_is_ejected_and_recovers():
+    async with stand_ins() as (start, session):
+        healthy, healthy_url = await start()
+        failing, failing_url = await start(status=503)
+        balancer = LoadBalancer([Backend(healthy_url, "key-1"), Backend(failing_url, "key-2")],
+                                strategy="least_outstanding", failure_threshold=2)
+
+        # Failed requests are retried on the other backend, so every request succeeds
+        for _ in range(10):
+            await balancer.request_json(session, "POST", path, data=body)
+        assert failing[stats]["requests"] == 2
+        assert balancer.report()[balancer.backends[1].name]["healthy"] is False
+
+        failing[behavior]["status"] = 200
+        assert await balancer.check_health(session) == {healthy_url: True, failing_url: True}
+        for _ in range(10):
+            await balancer.request_json(session, "POST", path, data=body)
+        assert failing[stats]["requests"] > 2
+
+
+@pytest.mark.asyncio
+async def test_only_one_probe_after_the_ejection_time():
+    async with stand_ins() as (start, session):
+        recovering, recovering_url = await start(latency=0.05)
+        other, other_url = await start()
+        balancer = LoadBalancer([Backend(recovering_url, "key-1"), Backend(other_url, "key-2")],
+                                failure_threshold=1, ejection_time=0.01)
+        balancer.backends[0].ewma, balancer.backends[1].ewma = 0.001, 1.0
+        balancer._failure(balancer.backends[0])
+        await asyncio.sleep(0.02)
+
+        # The recovering backend scores best, yet only gets the probe until that succeeds
+        await asyncio.gather(*(balancer.request_json(session, "POST", path, data=body) for _ in range(5)))
+        assert recovering[stats]["requests"] == 1
+        assert balancer.backends[0].ejections == 0
+        await balancer.request_json(session, "POST", path, data=body)
+        assert recovering[stats]["requests"] == 2
+
+
+def test_retry_after_seconds_or_http_date():
+    assert retry_after_seconds("120") == 120.0
+    in_30_s = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= retry_after_seconds(in_30_s) <= 30
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert retry_after_seconds("soon") == 60.0
+    assert retry_after_seconds(None) == 60.0
+
+
+@pytest.mark.asyncio
+async def test_active_health_check_ejects_idle_backend():
+    async with stand_ins() as (start, session):
+        _, up_url = await start()
+        down = Backend("http://127.0.0.1:9", "key-down")
+        balancer = LoadBalancer([Backend(up_url, "key-up"), down], failure_threshold=1)
+        assert await balancer.check_health(session) == {up_url: True, "http://127.0.0.1:9": False}
+        assert down.stats["ejections"] == 1
+        assert balancer.pick() is balancer.backends[0]
+
+
+@pytest.mark.asyncio
+async def test_per_key_quota():
+    async with stand_ins() as (start, session):
+        first, first_url = await start()
+        second, second_url = await start()
+        shared = KeyQuota(requests_per_minute=3)
+        balancer = LoadBalancer([Backend(first_url, "shared", quota=shared), Backend(second_url, "shared", quota=shared)])
+
+        for _ in range(3):
+            await balancer.request_json(session, "POST", path, data=body)
+        with pytest.raises(NoBackendAvailable):
+            await balancer.request_json(session, "POST", path, data=body)
+        assert first[stats]["requests"] + second[stats]["requests"] == 3
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_key_is_skipped():
+    async with stand_ins() as (start, session):
+        limited, limited_url = await start(status=429)
+        _, other_url = await start()
+        balancer = LoadBalancer([Backend(limited_url, "key-1"), Backend(other_url, "key-2")], strategy="least_outstanding")
+
+        for _ in range(5):
+            await balancer.request_json(session, "POST", path, data=body)
+        assert limited[stats]["requests"] <= 1
+        assert balancer.backends[0].stats["ejections"] == 0
+
+
+@pytest.mark.asyncio
+async def test_fetch_uses_the_backend_pool(monkeypatch):
+    async with stand_ins() as (start, _):
+        stand_in_apps = [await start(reply=f"backend {i}") for i in range(2)]
+        balancer = LoadBalancer([Backend(url, f"key-{i}") for i, (_, url) in enumerate(stand_in_apps)])
+        monkeypatch.setattr(inference, "balancer", balancer)
+        monkeypatch.setattr(inference, "record_usage", lambda *args: None)
+        monkeypatch.setattr(inference, "enforce_budget", lambda context, model, policy: context)
+
+        context = [{"type": "Human", "text": "hi"}]
+        assert await inference.fetch(context) in ("backend 0", "backend 1")
+        message = await inference.fetch_message([{"role": "user", "content": "hi"}])
+        assert message["content"] in ("backend 0", "backend 1")
+        assert sum(app[stats]["requests"] for app, _ in stand_in_apps) == 2
+        await close_session()
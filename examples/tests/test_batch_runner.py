@@ -0,0 +1,121 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import asyncio
+import pytest
+import batch_runner
+from batch_runner import Checkpoint, run_batch
+from prompts import PromptTemplate, register_template
+from scheduler import current_priority
+
+register_template(PromptTemplate("echo", "Repeat the user's input in <answer></answer> tags."))
+
+
+def write_items(path, count, prompt="echo"):
+    with open(path, "w", encoding="utf-8") as file:
+        for i in range(count):
+            file.write(json.dumps({"id": f"item-{i}", "prompt": prompt, "input": f"text {i}", "keys": ["answer"]}) + "\n")
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def fake_get_response(context, keys, model, legacy_api=True):
+        calls.append(context[-1]["text"])
+        assert current_priority.get() == "batch"
+        await asyncio.sleep(0.001 * (len(calls) % 3))
+        return {"answer": context[-1]["text"].split(": ", 1)[1]}
+
+    monkeypatch.setattr(batch_runner, "get_response", fake_get_response)
+    return calls
+
+
+def test_checkpoint_watermark():
+    checkpoint = Checkpoint(None)
+    for line_number in (1, 2, 0, 4):
+        checkpoint.mark_done(line_number)
+    assert (checkpoint.watermark, checkpoint.done) == (3, {4})
+    assert checkpoint.is_done(2) and checkpoint.is_done(4) and not checkpoint.is_done(3)
+
+
+@pytest.mark.asyncio
+async def test_all_items_are_written(tmp_path, calls):
+    write_items(tmp_path / "in.jsonl", 50)
+    stats = await run_batch(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"), str(tmp_path / "ckpt"), concurrency=4)
+    assert stats == {"ok": 50, "error": 0}
+    records = read_records(tmp_path / "out.jsonl")
+    assert sorted(record["id"] for record in records) == sorted(f"item-{i}" for i in range(50))
+    assert all(record["result"]["answer"] == f"text {record['id'].split('-')[1]}" for record in records)
+
+
+@pytest.mark.asyncio
+async def test_interrupted_run_resumes_without_redoing_items(tmp_path, calls, monkeypatch):
+    write_items(tmp_path / "in.jsonl", 30)
+    paths = str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"), str(tmp_path / "ckpt")
+    process_item = batch_runner.process_item
+
+    async def interrupted(item, *args):
+        if item["id"] == "item-20":
+            raise Interrupted
+        return await process_item(item, *args)
+
+    monkeypatch.setattr(batch_runner, "process_item", interrupted)
+    with pytest.raises(Interrupted):
+        await run_batch(*paths, concurrency=2, checkpoint_every=5)
+    first_run = len(calls)
+
+    monkeypatch.setattr(batch_runner, "process_item", process_item)
+    stats = await run_batch(*paths, concurrency=2, checkpoint_every=5)
+    assert stats == {"ok": 30, "error": 0}
+    records = read_records(tmp_path / "out.jsonl")
+    # Every item exactly once, and only the items after the last checkpoint were sent again
+    assert sorted(record["id"] for record in records) == sorted(f"item-{i}" for i in range(30))
+    assert len(calls) - first_run <= 30 - 15
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("output", ["missing", "shorter"])
+async def test_checkpoint_without_its_output_starts_over(tmp_path, calls, output):
+    write_items(tmp_path / "in.jsonl", 10)
+    paths = str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"), str(tmp_path / "ckpt")
+    await run_batch(*paths, concurrency=2)
+    if output == "missing":
+        os.remove(tmp_path / "out.jsonl")
+    else:
+        with open(tmp_path / "out.jsonl", "r+b") as file:
+            file.truncate(10)
+
+    stats = await run_batch(*paths, concurrency=2)
+    assert stats == {"ok": 10, "error": 0}
+    assert len(calls) == 20
+    with open(tmp_path / "out.jsonl", "rb") as file:
+        assert b"\0" not in file.read()
+    assert sorted(record["id"] for record in read_records(tmp_path / "out.jsonl")) == sorted(f"item-{i}" for i in range(10))
+
+
+@pytest.mark.asyncio
+async def test_bad_items_are_reported(tmp_path, calls):
+    with open(tmp_path / "in.jsonl", "w", encoding="utf-8") as file:
+        file.write(json.dumps({"id": "unknown", "prompt": "missing", "input": "x", "keys": ["answer"]}) + "\n")
+        file.write("{not json\n")
+        file.write(json.dumps({"id": "no-input", "prompt": "echo", "keys": ["answer"]}) + "\n")
+    stats = await run_batch(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    assert stats == {"ok": 0, "error": 3}
+    errors = {record["id"]: record["error"] for record in read_records(tmp_path / "out.jsonl")}
+    assert errors["unknown"] == "Unknown prompt id 'missing'"
+    assert errors["no-input"] == "Missing field 'input'"
+    assert errors[None].startswith("Invalid JSON")
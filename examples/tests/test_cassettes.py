@@ -0,0 +1,69 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import time
+import httpx
+import pytest
+from stubs import forecast_app, start_stub, stats
+from http_client import close_session
+from weather import WeatherClient
+from cassettes import CassetteMiss, CassetteTransport, request_key, use_cassette
+
+
+def test_request_key_is_canonical():
+    key = request_key("POST", "https://a.example/v1/chat", b'{"model": "m", "messages": []}')
+    assert key == request_key("post", "http://localhost:1234/v1/chat", '{"messages":[],"model":"m"}')
+    assert key != request_key("POST", "https://a.example/v1/chat", '{"messages":[],"model":"other"}')
+    assert request_key("GET", "/v1/forecast", params={"b": 1, "a": 2}) == request_key("GET", "/v1/forecast?a=2&b=1")
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_offline(tmp_path):
+    path = str(tmp_path / "weather.jsonl")
+    app = forecast_app(temperature_celsius=3.0)
+    runner, url = await start_stub(app)
+    try:
+        with use_cassette(path, "record"):
+            recorded = await WeatherClient(base_url=url).get_weather("40.7128", "-74.0060")
+    finally:
+        await close_session()
+        await runner.cleanup()
+    assert app[stats]["requests"] == 1
+
+    # The stub is gone: only the cassette can answer
+    with use_cassette(path, "replay"):
+        replayed = await WeatherClient(base_url="http://127.0.0.1:9").get_weather("40.7128", "-74.0060")
+        assert replayed == recorded
+        with pytest.raises(CassetteMiss):
+            await WeatherClient(base_url="http://127.0.0.1:9").get_weather("1.0", "2.0")
+    await close_session()
+
+
+@pytest.mark.asyncio
+async def test_httpx_transport_replays_recorded_latency(tmp_path):
+    path = str(tmp_path / "judge.jsonl")
+    completion = {"choices": [{"message": {"content": "{\"is_valid\": true}"}}]}
+    upstream = httpx.MockTransport(lambda request: httpx.Response(200, json=completion))
+
+    with use_cassette(path, "record") as cassette:
+        async with httpx.AsyncClient(transport=CassetteTransport(upstream)) as client:
+            response = await client.post("https://judge.example/v1/chat/completions", json={"model": "m"})
+            assert response.json() == completion
+        # Pretend the upstream took 50 ms
+        entry = next(iter(cassette.entries.values()))
+        entry["chunks"][-1][0] = 50.0
+        cassette.modified = True
+
+    with open(path) as file:
+        assert json.loads(file.readline())["path"] == "/v1/chat/completions"
+
+    with use_cassette(path, "replay", replay_latency=True):
+        async with httpx.AsyncClient(transport=CassetteTransport(httpx.MockTransport(lambda request: 1 / 0))) as client:
+            start_time = time.perf_counter()
+            response = await client.post("https://other.example/v1/chat/completions", json={"model": "m"})
+            assert time.perf_counter() - start_time >= 0.05
+    assert response.json() == completion
@@ -0,0 +1,57 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import compaction
+from artifacts import linkedin_notifications_artifact_content
+from compaction import compact_artifact, expand_references
+
+
+def test_compacts_markdown():
+    artifact = """
+# ![Logo](logo.svg) Summary
+
+### 🔔 Notifications
+
+> **New Comment:**
+> #### [Jane Doe](https://www.linkedin.com/in/janedoe/") • 2 hours ago
+
+---
+
+| From                 | Message        |
+|----------------------|----------------|
+| [Jane Doe](https://www.linkedin.com/in/janedoe/)   |   "Hi   there"    |
+See https://example.com/post/1 for details.
+"""
+    compacted = compact_artifact(artifact)
+    assert compacted.text == "\n".join([
+        "# Summary",
+        "",
+        "# Notifications",
+        "",
+        "New Comment:",
+        "Jane Doe [r1] • 2 hours ago",
+        "",
+        "From | Message",
+        'Jane Doe [r1] | "Hi there"',
+        "See [r2] for details.",
+    ])
+    assert compacted.references == {"r1": "https://www.linkedin.com/in/janedoe/", "r2": "https://example.com/post/1"}
+
+
+def test_references_expand_back():
+    compacted = compact_artifact(linkedin_notifications_artifact_content)
+    assert "https://" not in compacted.text
+    assert len(compacted.text) < len(linkedin_notifications_artifact_content) * 0.6
+    reply = "Thanks Daryl [r5], happy to talk. Unknown [r99] stays."
+    assert expand_references(reply, compacted.references) == \
+        "Thanks Daryl https://www.linkedin.com/in/darylfeil/, happy to talk. Unknown [r99] stays."
+
+
+def test_memoized_by_content():
+    first = compact_artifact(linkedin_notifications_artifact_content)
+    # Equal content from a different string object hits the memo
+    assert compact_artifact("".join(list(linkedin_notifications_artifact_content))) is first
+    assert len(compaction._memo) <= compaction.memo_size
@@ -0,0 +1,89 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import re
+import json
+import pytest
+import compliance
+from compliance import ComplianceEngine, RuleSet, VerdictCache, extract_functions, normalize_verdict
+
+rules_path = os.path.join(os.path.dirname(__file__), '..', 'compliance_doc.txt')
+
+
+def test_parse_rules():
+    rules = RuleSet.load(rules_path)
+    assert [rule.title for rule in rules] == [
+        "Data Encryption", "Secure Authentication", "Transaction Logging", "Access Control", "Error Handling"]
+    assert [rule.id for rule in rules.select(["2", "access control"])] == [2, 4]
+    with pytest.raises(KeyError):
+        rules.select(["Unknown Rule"])
+
+
+def test_normalize_verdict():
+    assert normalize_verdict({"compliant": " Yes ", "explanation": "ok"})["compliant"] == "yes"
+    assert normalize_verdict({"compliant": "maybe"}) is None
+
+
+def test_extract_functions(tmp_path):
+    path = tmp_path / "service.py"
+    path.write_text("import os\n\ndef transfer(a, b):\n    return a + b\n\nclass Account:\n    pass\n")
+    functions = extract_functions(str(path))
+    assert list(functions) == [f"{path}::transfer", f"{path}::Account"]
+    assert functions[f"{path}::transfer"].startswith("def transfer")
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def fake_get_response(context, keys, model, legacy_api=True):
+        calls.append(context[-1]["text"])
+        compliant = "yes" if "Error Handling" in context[-1]["text"] else "no"
+        return {"compliant": compliant, "explanation": "checked", "recommendations": "none"}
+
+    monkeypatch.setattr(compliance, "get_response", fake_get_response)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_check_uses_cache(calls, tmp_path):
+    rules = RuleSet.load(rules_path)
+    cache_path = str(tmp_path / "cache.json")
+    functions = {"a": "def a(): pass", "b": "def b(): pass"}
+
+    report = await ComplianceEngine(rules, VerdictCache(cache_path)).check(functions)
+    assert len(calls) == 10
+    assert report["summary"] == {"functions": 2, "checks": 10, "cached": 0, "non_compliant": 8, "errors": 0}
+    assert not report["functions"][0]["compliant"]
+
+    # Only the changed function is re-checked on the next run
+    functions["b"] = "def b(): return 1"
+    report = await ComplianceEngine(rules, VerdictCache(cache_path)).check(functions)
+    assert len(calls) == 15
+    assert report["summary"]["cached"] == 5
+    assert len(json.load(open(cache_path))) == 15
+
+
+@pytest.mark.asyncio
+async def test_packed_rules_reissue_missing(calls, monkeypatch):
+    requests = []
+
+    async def fake_fetch(context, model, legacy_api=True):
+        requests.append(context[-1]["text"])
+        ids = re.findall(r'<rule index="(\d+)">', context[-1]["text"])
+        # The response misses the last rule of each request
+        return "".join(f'<result index="{i}"><compliant>no</compliant><explanation>x</explanation></result>'
+                       for i in ids[:-1])
+
+    monkeypatch.setattr(compliance, "fetch_inflection", fake_fetch)
+    rules = RuleSet.load(rules_path)
+    report = await ComplianceEngine(rules, rules_per_request=3).check({"a": "def a(): pass"})
+
+    assert len(requests) == 2
+    assert len(calls) == 2
+    checks = report["functions"][0]["checks"]
+    assert [check["compliant"] for check in checks] == ["no", "no", "no", "no", "yes"]
+    assert checks[0]["recommendations"] == ""
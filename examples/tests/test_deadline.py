@@ -0,0 +1,82 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import json
+import time
+import pytest
+import deadline as deadline_module
+from agent import ToolRegistry
+from deadline import DeadlineExceeded, deadline, remaining, run_step, timeout_for
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_keeps_step_timings_and_partial_results():
+    with pytest.raises(DeadlineExceeded) as e:
+        async with deadline(0.05):
+            await run_step("intent", asyncio.sleep(0.01, result="weather"))
+            await run_step("weather", asyncio.sleep(1, result="sunny"))
+
+    run = e.value.deadline
+    assert run.partial == {"intent": "weather"}
+    assert [(step.name, step.status) for step in run.steps] == [("intent", "ok"), ("weather", "timeout")]
+    assert run.report()["expired"]
+
+
+@pytest.mark.asyncio
+async def test_nested_deadline_only_shortens():
+    async with deadline(0.5) as outer:
+        async with deadline(10) as inner:
+            assert inner.expires_at == outer.expires_at
+            await run_step("step", asyncio.sleep(0))
+    assert [step.name for step in outer.steps] == ["step"]
+
+
+@pytest.mark.asyncio
+async def test_inner_timeout_is_not_a_deadline_miss():
+    with pytest.raises(TimeoutError) as error:
+        async with deadline(5.0):
+            await asyncio.wait_for(asyncio.sleep(1), timeout=0.01)
+    assert not isinstance(error.value, DeadlineExceeded)
+
+
+@pytest.mark.asyncio
+async def test_timeout_for_without_and_with_deadline():
+    assert remaining() is None
+    assert timeout_for(3) == 3
+    async with deadline(1):
+        assert timeout_for(3) <= 1
+        assert 0.5 < timeout_for(None) <= 1
+
+
+@pytest.mark.asyncio
+async def test_tasks_inherit_the_deadline():
+    async def branch():
+        return deadline_module.current_deadline.get()
+
+    async with deadline(1) as run:
+        assert await asyncio.create_task(branch()) is run
+
+
+@pytest.mark.asyncio
+async def test_tool_timeout_is_capped_by_the_deadline():
+    registry = ToolRegistry()
+    schema = {"type": "function", "function": {"name": "slow_lookup", "parameters": {"type": "object", "properties": {}}}}
+
+    @registry.register(schema, timeout=10)
+    async def slow_lookup() -> str:
+        await asyncio.sleep(1)
+        return "found"
+
+    start_time = time.perf_counter()
+    with pytest.raises(DeadlineExceeded) as e:
+        async with deadline(0.05):
+            message = await registry.call({"id": "1", "function": {"name": "slow_lookup", "arguments": "{}"}})
+            # The tool timed out with the deadline; the next step can't start
+            assert json.loads(message["content"]) == {"error": "Tool 'slow_lookup' timed out"}
+            await run_step("answer", asyncio.sleep(0))
+    assert time.perf_counter() - start_time < 0.5
+    assert e.value.deadline.steps[0].name == "tool slow_lookup"
@@ -0,0 +1,84 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import pytest
+import evals
+from evals import Scenario, percentile, run_evals
+
+
+@pytest.fixture(autouse=True)
+def fake_tokens(monkeypatch):
+    monkeypatch.setattr(evals, "count_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(evals, "count_context_tokens", lambda context: sum(len(m["text"].split()) for m in context))
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile([7], 95) == 7
+
+
+@pytest.mark.asyncio
+async def test_runs_overlap_and_report_pass_rates():
+    in_flight, peak = 0, 0
+    verdicts = iter([True, False, True, True])
+
+    async def generate(context, legacy_api):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return "four words of output"
+
+    async def judge(output):
+        return {"is_valid": next(verdicts)}
+
+    scenario = Scenario("echo", generate, judge, lambda legacy_api: [{"type": "Human", "text": "two words"}])
+    report = await run_evals([scenario], repeats=2, concurrency=3, label="test")
+
+    assert peak == 3
+    assert report["runs"] == 4
+    assert report["pass_rate"] == 0.75
+    assert [(s["legacy_api"], s["runs"]) for s in report["scenarios"]] == [(True, 2), (False, 2)]
+    summary = report["scenarios"][0]
+    assert summary["prompt_tokens"] == 2
+    assert summary["output_tokens"] == 4
+    assert set(summary["generate_ms"]) == {"mean", "p50", "p95", "max"}
+
+
+@pytest.mark.asyncio
+async def test_failures_are_counted_as_errors():
+    async def generate(context, legacy_api):
+        return None
+
+    async def judge(output):
+        raise AssertionError("judge should not run")
+
+    report = await run_evals([Scenario("broken", generate, judge)], legacy_apis=[False])
+    summary = report["scenarios"][0]
+    assert summary["errors"] == 1
+    assert summary["pass_rate"] == 0.0
+    assert summary["judge_ms"] is None
+
+
+@pytest.mark.asyncio
+async def test_async_context_is_awaited():
+    async def context(legacy_api):
+        await asyncio.sleep(0)
+        return [{"type": "Human", "text": "three words here"}]
+
+    async def generate(context, legacy_api):
+        return context[-1]["text"]
+
+    async def judge(output):
+        return {"is_valid": output == "three words here"}
+
+    report = await run_evals([Scenario("retrieval", generate, judge, context)], repeats=1, legacy_apis=[True])
+    assert report["pass_rate"] == 1.0
+    assert report["scenarios"][0]["prompt_tokens"] == 3
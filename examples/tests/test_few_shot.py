@@ -0,0 +1,52 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from few_shot import ExampleStore
+from tokens import count_tokens
+
+
+def make_store() -> ExampleStore:
+    store = ExampleStore()
+    store.add([("user", "Find me flights to Tokyo"), ("assistant", "<intent>search_flights</intent>")])
+    store.add([("user", "Add the black shoes to my cart"), ("assistant", "<intent>add_to_cart</intent>")])
+    store.add([("user", "Apply coupon SAVE20 to my cart"), ("assistant", "<intent>apply_discount</intent>")])
+    store.add([("user", "Book a table for two at 7pm"), ("assistant", "<intent>book_table</intent>")])
+    return store
+
+
+def test_without_limits_every_example_is_kept():
+    store = make_store()
+    assert store.select("anything") == store.examples
+
+
+def test_selects_most_relevant_examples_in_insertion_order():
+    store = make_store()
+    selected = store.select("Can I use a coupon code on my cart?", k=2)
+    assert [example.turns[0][1] for example in selected] == [
+        "Add the black shoes to my cart",
+        "Apply coupon SAVE20 to my cart",
+    ]
+
+
+def test_selection_respects_token_budget():
+    store = make_store()
+    budget = store.tokens(2) + 1
+    selected = store.select("Apply a coupon to my cart", token_budget=budget)
+    assert [example.turns[0][1] for example in selected] == ["Apply coupon SAVE20 to my cart"]
+    assert sum(count_tokens(text) for example in selected for _, text in example.turns) <= budget
+
+
+def test_to_context_formats_for_both_apis():
+    store = make_store()
+    example = store.examples[:1]
+    assert store.to_context(example, legacy_api=True) == [
+        {"type": "Human", "text": "Find me flights to Tokyo"},
+        {"type": "AI", "text": "<intent>search_flights</intent>"},
+    ]
+    assert store.to_context(example, legacy_api=False) == [
+        {"role": "user", "content": "Find me flights to Tokyo"},
+        {"role": "assistant", "content": "<intent>search_flights</intent>"},
+    ]
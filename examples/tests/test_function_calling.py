@@ -0,0 +1,134 @@
+import sys
+import os
+
+# Add the parent directory to sys.path, and the helpers directory so function_calling can be imported
+# without the helpers package, which loads the Groq client and the ModernBERT retrieval model
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'helpers')))
+
+import asyncio
+import pytest
+import function_calling
+from geocoding import Place
+from function_calling import handle_query, speculation_stats
+
+
+class FakeModel:
+    """Answers the intent, lat/long and chat requests of handle_query after a set delay, recording what happened."""
+
+    def __init__(self, intent="weather", intent_delay=0.02, lat_long_delay=0.01, general_delay=0.01):
+        self.intent = intent
+        self.delays = {"intent": intent_delay, "lat_long": lat_long_delay, "general": general_delay, "weather": 0}
+        self.calls = []
+        self.cancelled = []
+
+    @staticmethod
+    def kind(context):
+        system_prompt = context[0].get("text", context[0].get("content"))
+        for kind, prompt in (("intent", function_calling.system_instruction_prompt_intent),
+                             ("lat_long", function_calling.system_instruction_prompt_lat_long),
+                             ("general", function_calling.system_instruction_prompt_general),
+                             ("weather", function_calling.system_instruction_prompt_weather)):
+            if system_prompt == prompt:
+                return kind
+
+    async def respond(self, kind):
+        self.calls.append(kind)
+        try:
+            await asyncio.sleep(self.delays[kind])
+        except asyncio.CancelledError:
+            self.cancelled.append(kind)
+            raise
+        if kind == "intent" and isinstance(self.intent, Exception):
+            raise self.intent
+
+    async def get_response(self, context, keys, legacy_api=True):
+        kind = self.kind(context)
+        await self.respond(kind)
+        if kind == "intent":
+            return {"reasoning": "", "intent_recognized": self.intent}
+        return {"latitude": "48.85", "longitude": "2.35"}
+
+    async def fetch(self, context, legacy_api=True):
+        kind = self.kind(context)
+        await self.respond(kind)
+        return "general answer with several words" if kind == "general" else f"weather answer: {context[-1]['text'].strip()}"
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeModel()
+    coordinates = []
+
+    async def fake_get_weather(latitude, longitude):
+        coordinates.append((latitude, longitude))
+        return {"temperature_celsius": 20.0, "temperature_fahrenheit": 68.0}
+
+    monkeypatch.setattr(function_calling, "get_response", model.get_response)
+    monkeypatch.setattr(function_calling, "fetch_inflection", model.fetch)
+    monkeypatch.setattr(function_calling, "get_weather", fake_get_weather)
+    monkeypatch.setattr(function_calling, "locate", lambda query: None)
+    monkeypatch.setattr(function_calling, "count_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(function_calling, "count_context_tokens", lambda context: 100)
+    model.coordinates = coordinates
+    speculation_stats.reset()
+    yield model
+    speculation_stats.reset()
+
+
+@pytest.mark.asyncio
+async def test_correct_speculation_reuses_the_branch(model):
+    # The general answer finishes before the intent, so it's discarded rather than cancelled
+    answer = await handle_query("Weather in Smallville?", speculative=True)
+    assert answer.startswith("weather answer")
+    assert model.calls.count("lat_long") == 1
+    assert model.coordinates == [("48.85", "2.35")]
+
+    report = speculation_stats.report()
+    assert report["runs"] == 1
+    assert report["saved_ms_total"] > 0
+    assert (report["discarded_branches"], report["cancelled_branches"]) == (1, 0)
+    assert report["wasted_prompt_tokens"] == 100
+    assert report["wasted_completion_tokens"] == len("general answer with several words".split())
+
+
+@pytest.mark.asyncio
+async def test_wrong_speculation_is_cancelled(model):
+    model.intent = "other"
+    model.delays["lat_long"] = 1.0
+    assert await handle_query("Tell me a joke", speculative=True) == "general answer with several words"
+    assert model.cancelled == ["lat_long"]
+    assert model.calls.count("general") == 1
+    assert model.coordinates == []
+
+    report = speculation_stats.report()
+    assert (report["discarded_branches"], report["cancelled_branches"]) == (0, 1)
+    assert report["wasted_completion_tokens"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_intent_cancels_both_branches(model):
+    model.intent = ConnectionError("intent request failed")
+    model.delays.update(lat_long=1.0, general=1.0)
+    with pytest.raises(ConnectionError):
+        await handle_query("Weather in Smallville?", speculative=True)
+    await asyncio.sleep(0)
+    assert sorted(model.cancelled) == ["general", "lat_long"]
+    assert speculation_stats.runs == 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_intent_discards_both_branches(model):
+    model.intent = "unknown"
+    assert await handle_query("???", speculative=True) is None
+    report = speculation_stats.report()
+    assert report["discarded_branches"] + report["cancelled_branches"] == 2
+    assert report["wasted_prompt_tokens"] == 200
+
+
+@pytest.mark.asyncio
+async def test_gazetteer_hit_skips_the_lat_long_branch(model, monkeypatch):
+    monkeypatch.setattr(function_calling, "locate", lambda query: Place("Paris", "France", 1.5, 2.5))
+    await handle_query("Weather in Paris?", speculative=True)
+    assert "lat_long" not in model.calls
+    assert model.coordinates == [("1.5", "2.5")]
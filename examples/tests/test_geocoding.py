@@ -0,0 +1,55 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from geocoding import Gazetteer, Place, locate, normalize
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("What's the weather like in NYC today?", "New York"),
+    ("How warm is it in Honolulu, Hawaii?", "Honolulu"),
+    ("Is it snowing in West Virginia?", "West Virginia"),
+    ("Weather for São Paulo please", "Sao Paulo"),
+    ("Portland, Maine forecast", "Portland"),
+])
+def test_locate_resolves_single_place(query: str, expected: str):
+    place = locate(query)
+    assert place is not None
+    assert place.name == expected
+
+
+def test_parent_region_disambiguates_shared_names():
+    assert locate("Portland, Maine").region == "Maine"
+    assert locate("Portland, Oregon").region == "Oregon"
+    assert locate("Columbus, Georgia").region == "Georgia"
+
+
+@pytest.mark.parametrize("query", [
+    "What's the weather in Portland?",
+    "Is it colder in Paris or London?",
+    "Tell me a joke",
+    # A region on its own only disambiguates, the city may be missing from the gazetteer
+    "What is the weather in Hawaii?",
+    "Weather in Manchester, UK",
+    "How hot is it in Kyoto, Japan?",
+    "Is it sunny in Cancun, Mexico?",
+    "Fresno, California forecast",
+    "Any tips for a turkey dinner?",
+])
+def test_locate_returns_none_on_miss_or_ambiguity(query: str):
+    assert locate(query) is None
+
+
+def test_normalize():
+    assert normalize("  São   Paulo! ") == "sao paulo"
+    assert normalize("St. Louis") == "st louis"
+
+
+def test_lookups_are_cached():
+    gazetteer = Gazetteer([Place("Springfield", "Illinois", 39.78, -89.65)])
+    gazetteer.locate("weather in Springfield")
+    gazetteer.locate("weather in Springfield")
+    assert gazetteer.locate.cache_info().hits == 1
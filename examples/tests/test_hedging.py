@@ -0,0 +1,140 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import pytest
+import inference
+from hedging import HedgePolicy, hedged
+from scheduler import Scheduler
+
+
+def slow_then_fast(delays):
+    calls = {"started": 0, "cancelled": 0}
+    delays = iter(delays)
+
+    async def request():
+        calls["started"] += 1
+        delay = next(delays)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            calls["cancelled"] += 1
+            raise
+        return delay
+
+    return request, calls
+
+
+def test_delay_follows_observed_percentile():
+    policy = HedgePolicy(quantile=95, min_samples=10, default_delay=2.0, min_delay=0.01)
+    assert policy.delay("m") == 2.0
+    for i in range(1, 101):
+        policy.observe("m", i / 100)
+    assert policy.delay("m") == 0.96
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_and_loser_is_cancelled():
+    policy = HedgePolicy(default_delay=0.02)
+    request, calls = slow_then_fast([1.0, 0.01])
+    assert await hedged(request, policy, "m") == 0.01
+    assert calls == {"started": 2, "cancelled": 1}
+    assert policy.stats["hedge_wins"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_attempts_are_observed():
+    policy = HedgePolicy(default_delay=0.02)
+    request, calls = slow_then_fast([1.0, 0.01])
+    await hedged(request, policy, "m")
+    # The cancelled primary counts as at least as slow as the hedge delay, not as missing
+    assert len(policy.latencies["m"]) == 2
+    assert max(policy.latencies["m"]) >= 0.02
+
+    # Likewise for a request whose caller gave up before the hedge delay
+    policy = HedgePolicy(default_delay=5.0)
+    request, calls = slow_then_fast([1.0])
+    task = asyncio.create_task(hedged(request, policy, "m"))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert list(policy.latencies["m"]) == [5.0]
+
+
+@pytest.mark.asyncio
+async def test_fast_requests_are_not_hedged():
+    policy = HedgePolicy(default_delay=0.5)
+    request, calls = slow_then_fast([0.01])
+    assert await hedged(request, policy, "m") == 0.01
+    assert calls["started"] == 1
+    assert len(policy.latencies["m"]) == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_rate_is_capped():
+    policy = HedgePolicy(default_delay=0.01, max_hedge_rate=0.1, burst=1)
+    request, calls = slow_then_fast([0.05] * 20)
+    await asyncio.gather(*(hedged(request, policy, "m") for _ in range(10)))
+    # Ten slow requests, but only the burst and the earned tenth of a hedge per request are spent
+    assert policy.stats["hedged"] == 1
+    assert policy.stats["denied"] == 9
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back_to_hedge():
+    policy = HedgePolicy(default_delay=0.01)
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        if len(attempts) == 1:
+            await asyncio.sleep(0.03)
+            raise ConnectionError("replica down")
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    assert await hedged(request, policy, "m") == "ok"
+
+
+@pytest.mark.asyncio
+async def test_fetch_hedges_deterministic_requests(monkeypatch):
+    delays = iter([1.0, 0.01])
+
+    async def fake_request_json(session, method, url, headers=None, data=None, params=None):
+        await asyncio.sleep(next(delays))
+        return {"text": "fast replica"}
+
+    monkeypatch.setattr(inference, "request_json", fake_request_json)
+    monkeypatch.setattr(inference, "base_url", "http://inference.invalid")
+    monkeypatch.setattr(inference, "record_usage", lambda *args: None)
+    monkeypatch.setattr(inference, "hedge_policy", HedgePolicy(default_delay=0.02))
+    monkeypatch.setattr(inference, "enforce_budget", lambda context, model, policy: context)
+
+    context = [{"type": "Human", "text": "hi"}]
+    assert await inference.fetch(context, hedge=True) == "fast replica"
+
+
+@pytest.mark.asyncio
+async def test_fetch_hedge_takes_its_own_scheduler_slot(monkeypatch):
+    scheduler = Scheduler(max_in_flight=2, reserved=0)
+    delays, peak = iter([1.0, 0.01]), []
+
+    async def fake_request_json(session, method, url, headers=None, data=None, params=None):
+        peak.append(scheduler.in_flight["inflection_3_pi"])
+        await asyncio.sleep(next(delays))
+        return {"text": "fast replica"}
+
+    monkeypatch.setattr(inference, "scheduler", scheduler)
+    monkeypatch.setattr(inference, "request_json", fake_request_json)
+    monkeypatch.setattr(inference, "base_url", "http://inference.invalid")
+    monkeypatch.setattr(inference, "record_usage", lambda *args: None)
+    monkeypatch.setattr(inference, "hedge_policy", HedgePolicy(default_delay=0.02))
+    monkeypatch.setattr(inference, "enforce_budget", lambda context, model, policy: context)
+
+    assert await inference.fetch([{"type": "Human", "text": "hi"}], hedge=True) == "fast replica"
+    assert peak == [1, 2]
+    assert scheduler.in_flight["inflection_3_pi"] == 0
@@ -0,0 +1,65 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from intent_router import IntentRouter
+
+examples_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'service_router_examples.jsonl')
+
+
+def make_router(llm_intent: str = "book_table") -> tuple:
+    calls = []
+
+    async def llm_route(previous_intents: str, query: str, **kwargs) -> str:
+        calls.append((previous_intents, query))
+        return llm_intent
+
+    router = IntentRouter.from_jsonl(examples_path, llm_route)
+    router.calibrate(0.9)
+    return router, calls
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("previous_intents, service_request, expected", [
+    ("search_nearby_restaurants", "Please show me the reviews.", "view_restaurant_reviews"),
+    ("", "Show me restaurant reviews", "view_restaurant_reviews"),
+    ("search_product -> add_to_cart", "Apply my coupon", "apply_discount"),
+])
+async def test_confident_queries_are_routed_locally(previous_intents: str, service_request: str, expected: str):
+    router, calls = make_router()
+    result = await router.route(previous_intents, service_request)
+
+    assert result == {"intent": expected, "confidence": result["confidence"], "source": "local"}
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_low_confidence_falls_back_to_llm_and_learns():
+    router, calls = make_router(llm_intent="book_table")
+    router.threshold = 0.99
+    examples = len(router.examples)
+
+    result = await router.route("search_nearby_restaurants", "Get us a spot at 8 tonight")
+
+    assert result["source"] == "llm"
+    assert result["intent"] == "book_table"
+    assert len(calls) == 1
+    assert len(router.examples) == examples + 1
+
+    report = router.report()
+    assert report["requests"] == 1
+    assert report["hit_rate"] == 0.0
+    assert report["agreement_rate"] in (0.0, 1.0)
+
+
+@pytest.mark.asyncio
+async def test_unknown_llm_intents_are_not_learned():
+    router, _ = make_router(llm_intent="order_pizza")
+    router.threshold = float("inf")
+    examples = len(router.examples)
+
+    await router.route("", "Something unrelated")
+    assert len(router.examples) == examples
@@ -0,0 +1,61 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+from collections import Counter
+import pytest
+import long_document
+from long_document import classify_long_document, decided
+
+
+def test_decided():
+    assert decided(Counter({"statement_of_work": 3}), remaining=2)
+    assert not decided(Counter({"statement_of_work": 3, "other": 1}), remaining=2)
+    assert not decided(Counter(), remaining=0)
+
+
+@pytest.fixture
+def fake_chunks(monkeypatch):
+    # One chunk per line, so tests don't depend on the tokenizer
+    monkeypatch.setattr(long_document, "chunk_text", lambda text, max_tokens: text.splitlines())
+
+
+@pytest.mark.asyncio
+async def test_majority_vote_with_early_stop(fake_chunks, monkeypatch):
+    started = []
+
+    async def fake_get_response(context, keys, model, legacy_api=True):
+        chunk = context[-1]["text"]
+        started.append(chunk)
+        # Later chunks are slow so the vote is decided before they finish
+        index = int(chunk.rsplit(" ", 1)[-1])
+        await asyncio.sleep(0.01 if index < 3 else 1)
+        return {"category": "statement_of_work"}
+
+    monkeypatch.setattr(long_document, "get_response", fake_get_response)
+    text = "\n".join(f"chunk {i}" for i in range(5))
+    result = await classify_long_document(text, "Classify.", labels=["statement_of_work", "other"])
+
+    assert result["category"] == "statement_of_work"
+    assert result["confidence"] == 1.0
+    assert result["chunks"] == 5
+    assert result["classified"] == 3
+
+
+@pytest.mark.asyncio
+async def test_invalid_labels_are_ignored(fake_chunks, monkeypatch):
+    answers = iter(["other", "not_a_label", "statement_of_work", "other"])
+
+    async def fake_get_response(context, keys, model, legacy_api=True):
+        return {"category": next(answers)}
+
+    monkeypatch.setattr(long_document, "get_response", fake_get_response)
+    result = await classify_long_document("a\nb\nc\nd", "Classify.", labels=["statement_of_work", "other"],
+                                          concurrency=1, early_stop=False)
+
+    assert result["category"] == "other"
+    assert result["votes"] == {"other": 2, "statement_of_work": 1}
+    assert result["confidence"] == round(2 / 3, 4)
@@ -0,0 +1,87 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import re
+import pytest
+import packing
+from packing import get_responses_packed, plan_batches, split_results
+
+
+def test_split_results_keeps_complete_blocks_only():
+    response = """
+    <result index="0"><parts><category>statement_of_work</category></parts></result>
+    <result index="1"><parts><category></category></parts></result>
+    <result index="2">
+        <parts><category>other</category></parts>
+    </result>
+    """
+    assert split_results(response, ["category"]) == {
+        0: {"category": "statement_of_work"},
+        2: {"category": "other"},
+    }
+    assert split_results(None, ["category"]) == {}
+
+
+def test_plan_batches_respects_budget_and_size():
+    inputs = ["short email"] * 10
+    batches = plan_batches(inputs, token_budget=1000, max_batch_size=4, output_tokens_per_item=50)
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+
+    batches = plan_batches(inputs, token_budget=130, max_batch_size=20, output_tokens_per_item=50)
+    assert all(len(batch) <= 2 for batch in batches)
+    assert sorted(i for batch in batches for i in batch) == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_packed_requests_are_demultiplexed_and_failures_reissued(monkeypatch):
+    requests = []
+
+    async def fake_fetch(context, model, legacy_api=True):
+        user_message = context[-1]["text"]
+        requests.append(user_message)
+        indexes = re.findall(r'<item index="(\d+)">', user_message)
+        # The model "forgets" item 3
+        return "".join(
+            f'<result index="{i}"><parts><intent_recognized>intent_{i}</intent_recognized></parts></result>'
+            for i in indexes if i != "3"
+        )
+
+    single_calls = []
+
+    async def fake_get_response(context, keys, model, legacy_api=True):
+        single_calls.append(context[-1]["text"])
+        return {"intent_recognized": "intent_single"}
+
+    monkeypatch.setattr(packing, "fetch_inflection", fake_fetch)
+    monkeypatch.setattr(packing, "get_response", fake_get_response)
+
+    emails = [f"email {i}" for i in range(5)]
+    results = await get_responses_packed("Classify the email.", emails, ["intent_recognized"],
+                                         user_input_label="Email body", max_batch_size=5)
+
+    assert len(requests) == 1
+    assert single_calls == ["Email body: email 3"]
+    assert [r["intent_recognized"] for r in results] == [
+        "intent_0", "intent_1", "intent_2", "intent_single", "intent_4",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_fallback_keeps_the_other_results(monkeypatch):
+    async def fake_fetch(context, model, legacy_api=True):
+        return None
+
+    async def fake_get_response(context, keys, model, legacy_api=True):
+        if context[-1]["text"].endswith("email 1"):
+            # What get_response raises when its fetch returns None
+            raise TypeError("expected string or bytes-like object, got 'NoneType'")
+        return {"intent_recognized": "intent_single"}
+
+    monkeypatch.setattr(packing, "fetch_inflection", fake_fetch)
+    monkeypatch.setattr(packing, "get_response", fake_get_response)
+
+    results = await get_responses_packed("Classify the email.", [f"email {i}" for i in range(3)], ["intent_recognized"])
+    assert results == [{"intent_recognized": "intent_single"}, None, {"intent_recognized": "intent_single"}]
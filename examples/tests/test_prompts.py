@@ -0,0 +1,72 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import pytest
+from prompts import PromptTemplate, serialize_payload, to_legacy, to_openai
+from utils import get_context
+
+template = PromptTemplate("test", "You are a helpful assistant.", [("user", "2+2?"), ("assistant", "4")])
+
+
+@pytest.mark.parametrize("legacy_api", [True, False])
+def test_render_matches_plain_context(legacy_api: bool):
+    context = template.render("Question: 3+3?", legacy_api=legacy_api)
+    if legacy_api:
+        assert context == [
+            {"type": "Instruction", "text": "You are a helpful assistant."},
+            {"type": "Human", "text": "2+2?"},
+            {"type": "AI", "text": "4"},
+            {"type": "Human", "text": "Question: 3+3?"},
+        ]
+    else:
+        assert context[0] == {"role": "system", "content": "You are a helpful assistant."}
+        assert context[-1] == {"role": "user", "content": "Question: 3+3?"}
+
+
+@pytest.mark.parametrize("legacy_api", [True, False])
+def test_serialized_payload_is_equivalent_to_json(legacy_api: bool):
+    key = "context" if legacy_api else "messages"
+    payload = {"config": "inflection_3_pi", key: template.render("Hi", "there", legacy_api=legacy_api), "temperature": 0.0}
+    assert json.loads(serialize_payload(payload, key)) == json.loads(json.dumps(payload))
+    # The prefix bytes are cached on the template
+    assert template.prefix_json(legacy_api) is template.prefix_json(legacy_api)
+
+
+def test_mutated_context_is_reserialized():
+    context = template.render("Hi", legacy_api=True)
+    context.append({"type": "AI", "text": "Hello!"})
+    payload = {"context": context, "config": "inflection_3_pi"}
+    assert json.loads(serialize_payload(payload, "context"))["context"][-1] == {"type": "AI", "text": "Hello!"}
+
+
+def test_in_place_edits_stay_in_their_context():
+    earlier = get_context("SYS", "hi")
+    edited = get_context("SYS", "hi")
+    edited[0]["text"] += " EXTRA"
+    assert get_context("SYS", "yo")[0] == {"type": "Instruction", "text": "SYS"}
+    assert json.loads(earlier.to_json())[0] == {"type": "Instruction", "text": "SYS"}
+    assert json.loads(edited.to_json())[0] == {"type": "Instruction", "text": "SYS EXTRA"}
+
+
+def test_repeated_context_is_reserialized():
+    context = template.render("Hi", legacy_api=True)
+    context *= 2
+    assert json.loads(context.to_json()) == list(context)
+    assert len(list(context)) == 8
+
+
+def test_format_conversion_is_lossless():
+    legacy = list(template.render("Hi", legacy_api=True))
+    openai = list(template.render("Hi", legacy_api=False))
+    assert to_openai(legacy) == openai
+    assert to_legacy(openai) == legacy
+    assert to_legacy(to_openai(legacy)) == legacy
+
+
+def test_roles_without_legacy_equivalent_are_rejected():
+    with pytest.raises(ValueError):
+        to_legacy([{"role": "tool", "content": "{}", "tool_call_id": "1"}])
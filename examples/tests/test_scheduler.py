@@ -0,0 +1,96 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import pytest
+from scheduler import PriorityClass, Scheduler, SchedulerOverloaded, schedule_as
+
+
+async def run(scheduler, order, label, model="m", priority=None, tenant=None, duration=0.01):
+    async with scheduler.slot(model, priority, tenant):
+        order.append(label)
+        await asyncio.sleep(duration)
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_jump_the_batch_queue():
+    scheduler = Scheduler(max_in_flight=1, reserved=0)
+    order = []
+    with schedule_as("batch"):
+        batch = [asyncio.create_task(run(scheduler, order, f"batch {i}")) for i in range(5)]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(run(scheduler, order, "interactive"))
+    await asyncio.gather(*batch, interactive)
+    # Only the batch request already in flight runs before the interactive one
+    assert order[:2] == ["batch 0", "interactive"]
+
+
+@pytest.mark.asyncio
+async def test_reserved_slots_keep_interactive_requests_from_waiting():
+    scheduler = Scheduler(max_in_flight=3, reserved=1)
+    order = []
+    batch = [asyncio.create_task(run(scheduler, order, f"batch {i}", priority="batch", duration=0.05)) for i in range(6)]
+    await asyncio.sleep(0)
+    assert scheduler.in_flight["m"] == 2
+    await run(scheduler, order, "interactive", priority="interactive")
+    await asyncio.gather(*batch)
+    assert scheduler.report()["classes"]["interactive"]["wait_ms"]["max"] < 10
+
+
+@pytest.mark.asyncio
+async def test_tenants_share_a_class_by_weight():
+    scheduler = Scheduler(max_in_flight=1, tenant_weights={"backfill": 1, "scan": 2})
+    order = []
+    tasks = [asyncio.create_task(run(scheduler, order, "backfill", priority="batch", tenant="backfill", duration=0)) for _ in range(6)]
+    tasks += [asyncio.create_task(run(scheduler, order, "scan", priority="batch", tenant="scan", duration=0)) for _ in range(6)]
+    await asyncio.gather(*tasks)
+    # The backfill queued first, yet the scan gets two slots for each of the backfill's
+    assert order[:9].count("scan") == 6
+
+
+@pytest.mark.asyncio
+async def test_limits_are_per_model():
+    scheduler = Scheduler(max_in_flight=4, model_limits={"slow": 1}, reserved=0)
+    order = []
+    slow = [asyncio.create_task(run(scheduler, order, "slow", model="slow", duration=0.05)) for _ in range(3)]
+    await asyncio.sleep(0)
+    await run(scheduler, order, "fast", model="fast", duration=0)
+    assert order == ["slow", "fast"]
+    await asyncio.gather(*slow)
+
+
+@pytest.mark.asyncio
+async def test_full_interactive_queue_sheds_and_batch_queue_blocks():
+    classes = [PriorityClass("interactive", 0, max_queue=1, overflow="shed"),
+               PriorityClass("batch", 1, max_queue=1, overflow="wait")]
+    scheduler = Scheduler(classes, max_in_flight=1, reserved=0)
+    order = []
+    first = asyncio.create_task(run(scheduler, order, "first", duration=0.05))
+    queued = asyncio.create_task(run(scheduler, order, "queued"))
+    await asyncio.sleep(0)
+    with pytest.raises(SchedulerOverloaded):
+        await scheduler.acquire("m", "interactive")
+    assert scheduler.stats["interactive"]["shed"] == 1
+
+    batch = [asyncio.create_task(run(scheduler, order, f"batch {i}", priority="batch")) for i in range(3)]
+    await asyncio.sleep(0)
+    assert len(scheduler.queues["batch"]) == 1
+    await asyncio.gather(first, queued, *batch)
+    assert order == ["first", "queued", "batch 0", "batch 1", "batch 2"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = Scheduler(max_in_flight=1)
+    order = []
+    first = asyncio.create_task(run(scheduler, order, "first", duration=0.02))
+    waiting = asyncio.create_task(run(scheduler, order, "cancelled"))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    await asyncio.gather(first, waiting, return_exceptions=True)
+    assert scheduler.queues["interactive"] == []
+    assert scheduler.in_flight["m"] == 0
+    assert order == ["first"]
@@ -8,6 +8,8 @@ import pytest
 from .helpers import get_service_router_context
 from utils import get_response
 
+pytestmark = pytest.mark.cassette
+
 
 @pytest.mark.asyncio
 @pytest.mark.parametrize("legacy_api", [True, False])
@@ -0,0 +1,83 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import pytest
+import session as session_module
+from session import Session
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    monkeypatch.setattr(session_module, "count_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(session_module, "message_overhead", 0)
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    requests = []
+
+    async def fake_fetch(context, model, legacy_api=True, **kwargs):
+        requests.append(context)
+        if "running summary" in context[0].get("text", context[0].get("content", "")):
+            await asyncio.sleep(0.01)
+            return "summary of old turns"
+        return f"reply {len(requests)}"
+
+    monkeypatch.setattr(session_module, "fetch_inflection", fake_fetch)
+    return requests
+
+
+def test_add_messages_in_either_format():
+    session = Session("be brief", legacy_api=False)
+    session.add_message({"type": "Human", "text": "hello there"})
+    session.add_message({"role": "assistant", "content": "hi"})
+    assert session.context() == [
+        {"role": "system", "content": "be brief"},
+        {"role": "user", "content": "hello there"},
+        {"role": "assistant", "content": "hi"},
+    ]
+    assert session.used_tokens == 3
+    with pytest.raises(ValueError):
+        session.add_message({"role": "system", "content": "no"})
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_bounds_requests(requests):
+    session = Session("be brief", history_tokens=10, policy="window")
+    for i in range(10):
+        assert await session.send(f"question number {i}") is not None
+
+    assert all(sum(len(m["text"].split()) for m in context[1:]) <= 10 for context in requests)
+    assert requests[-1][0] == {"type": "Instruction", "text": "be brief"}
+    assert requests[-1][-1]["text"] == "question number 9"
+
+
+@pytest.mark.asyncio
+async def test_old_turns_are_summarized_in_the_background(requests):
+    session = Session("be brief", history_tokens=20, keep_turns=2, summarize_at=0.5)
+    for i in range(4):
+        await session.send(f"question number {i}")
+    await session.close()
+
+    assert session.summary == "summary of old turns"
+    # The summarized turns are gone; turns added while the summary was pending are kept
+    assert session.turns[0].id > 0
+    assert session.used_tokens <= 20
+    await session.send("next question")
+    assert "summary of old turns" in requests[-1][0]["text"]
+    assert requests[-1][-1]["text"] == "next question"
+
+
+@pytest.mark.asyncio
+async def test_failed_request_removes_user_turn(monkeypatch):
+    async def failing_fetch(context, model, legacy_api=True, **kwargs):
+        return None
+
+    monkeypatch.setattr(session_module, "fetch_inflection", failing_fetch)
+    session = Session("be brief")
+    assert await session.send("hello") is None
+    assert session.turns == []
@@ -0,0 +1,131 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import pytest
+import tokens
+import inference
+from tokens import (
+    TokenBudgetExceeded,
+    TokenUsage,
+    attribute_usage,
+    count_tokens,
+    enforce_budget,
+    request_tokens,
+)
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # One token per word, so tests don't depend on the tokenizer files
+    monkeypatch.setattr(tokens, "count_tokens", lambda text: len(text.split()))
+    monkeypatch.setattr(tokens, "message_overhead", 0)
+    tokens._cached_count.cache_clear()
+    yield
+    tokens._cached_count.cache_clear()
+
+
+def conversation():
+    return [
+        {"type": "Instruction", "text": "be brief"},
+        {"type": "Human", "text": "one two three four"},
+        {"type": "AI", "text": "five six"},
+        {"type": "Human", "text": "seven eight"},
+    ]
+
+
+def test_message_counts_are_cached(monkeypatch):
+    calls = []
+    monkeypatch.setattr(tokens, "count_tokens", lambda text: calls.append(text) or len(text.split()))
+    context = conversation()
+    assert request_tokens(context) == 10
+    assert request_tokens(context) == 10
+    assert len(calls) == 4
+
+
+def test_fits_unchanged():
+    context = conversation()
+    assert enforce_budget(context, "inflection_3_pi", budget=10) is context
+
+
+def test_fail_fast():
+    with pytest.raises(TokenBudgetExceeded) as error:
+        enforce_budget(conversation(), "inflection_3_pi", budget=9)
+    assert (error.value.tokens, error.value.budget) == (10, 9)
+
+
+def test_drop_oldest_keeps_system_prompt_and_last_turn():
+    context = enforce_budget(conversation(), "inflection_3_pi", "drop_oldest", budget=6)
+    assert [message["text"] for message in context] == ["be brief", "five six", "seven eight"]
+    with pytest.raises(TokenBudgetExceeded):
+        enforce_budget(conversation(), "inflection_3_pi", "drop_oldest", budget=3)
+
+
+def test_trim_artifacts_cuts_the_largest_message():
+    artifact = " ".join(f"w{i}" for i in range(200))
+    context = [{"role": "system", "content": "be brief"}, {"role": "user", "content": artifact}]
+    trimmed = enforce_budget(context, "inflection_3_pi", "trim_artifacts", budget=100)
+    assert request_tokens(trimmed) <= 100
+    content = trimmed[1]["content"]
+    assert content.startswith("w0 ") and content.endswith(" w199")
+    assert "[...truncated...]" in content
+    assert trimmed[0] == context[0]
+
+
+@pytest.mark.asyncio
+async def test_usage_is_attributed_to_callers():
+    usage = TokenUsage()
+
+    async def request(prompt_tokens):
+        usage.record("inflection_3_pi", prompt_tokens, 1)
+
+    with attribute_usage("compliance"):
+        await asyncio.gather(request(10), request(20))
+    usage.record("inflection_3_productivity", 5, 2, caller="router")
+    await request(1)
+
+    report = usage.report()
+    assert report["by_caller"]["compliance"] == {"requests": 2, "prompt_tokens": 30, "completion_tokens": 2}
+    assert report["by_caller"]["default"]["requests"] == 1
+    assert report["by_model"]["inflection_3_pi"]["prompt_tokens"] == 31
+
+
+@pytest.mark.asyncio
+async def test_fetch_fails_before_sending(monkeypatch):
+    sent = []
+
+    async def no_request(*args, **kwargs):
+        sent.append(args)
+        return {"text": "sent"}
+
+    monkeypatch.setattr(inference, "request_json", no_request)
+    monkeypatch.setitem(tokens.context_budgets, "inflection_3_pi", 5)
+    assert await inference.fetch(conversation()) is None
+    assert await inference.fetch_message(conversation(), model="inflection_3_pi") is None
+    assert sent == []
+
+
+@pytest.mark.asyncio
+async def test_budget_errors_are_caught_like_request_errors(monkeypatch):
+    def broken_budget(context, model, truncation):
+        raise KeyError("config")
+
+    monkeypatch.setattr(inference, "enforce_budget", broken_budget)
+    assert await inference.fetch(conversation()) is None
+    assert await inference.fetch_message(conversation()) is None
+
+
+def test_count_tokens_estimates_without_the_encoding(monkeypatch):
+    def offline(name=tokens.encoding_name):
+        raise ConnectionError("can't download the encoding")
+
+    monkeypatch.setattr(tokens, "get_encoding", offline)
+    tokens._default_encoding.cache_clear()
+    try:
+        assert count_tokens("") == 0
+        assert count_tokens("a" * 10) == 3
+    finally:
+        tokens._default_encoding.cache_clear()
@@ -0,0 +1,94 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import asyncio
+import inspect
+import pytest
+import tracing
+import utils
+from deadline import run_step
+from tracing import record, span, traced
+
+
+@traced()
+async def lookup(key):
+    await asyncio.sleep(0.01)
+    return await asyncio.to_thread(encode, key)
+
+
+@traced()
+def encode(key):
+    return key.upper()
+
+
+def spans_by_name(trace):
+    return {span.name: span for span in trace.spans}
+
+
+@pytest.mark.asyncio
+async def test_nothing_is_recorded_without_a_trace():
+    assert inspect.iscoroutinefunction(lookup)
+    with span("outside"):
+        assert await lookup("a") == "A"
+    assert tracing.current_span.get() is None
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_tasks_and_threads():
+    with record("test") as trace:
+        with span("request", user="u1"):
+            assert await asyncio.gather(lookup("a"), lookup("b")) == ["A", "B"]
+
+    assert len(trace.spans) == 5
+    request = spans_by_name(trace)["request"]
+    lookups = [s for s in trace.spans if s.name == "lookup"]
+    encodes = [s for s in trace.spans if s.name == "encode"]
+    assert {s.parent_id for s in lookups} == {request.id}
+    assert {s.parent_id for s in encodes} == {s.id for s in lookups}
+    assert request.attributes == {"user": "u1"}
+    assert all(request.start_ns <= s.start_ns and s.end_ns <= request.end_ns for s in trace.spans)
+
+
+@pytest.mark.asyncio
+async def test_chrome_trace_export(tmp_path):
+    with record("test") as trace:
+        await asyncio.gather(lookup("a"), lookup("b"))
+    trace.save(str(tmp_path / "trace.json"))
+
+    with open(tmp_path / "trace.json", encoding="utf-8") as file:
+        events = json.load(file)["traceEvents"]
+    complete = [event for event in events if event["ph"] == "X"]
+    assert {event["name"] for event in complete} == {"lookup", "encode"}
+    # Concurrent lookups are on separate rows, each row is named
+    assert len({event["tid"] for event in complete if event["name"] == "lookup"}) == 2
+    assert {event["tid"] for event in events if event["ph"] == "M"} == {event["tid"] for event in complete}
+    assert all(event["dur"] >= 0 and event["ts"] >= 0 for event in complete)
+
+
+@pytest.mark.asyncio
+async def test_failed_span_records_the_exception():
+    with record() as trace:
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("bad")
+    assert trace.spans[0].status == "ValueError"
+    assert trace.summary()["failing"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_pipeline_stages_are_traced(monkeypatch):
+    async def fake_fetch(context, model, temperature, top_p, web_search, legacy_api):
+        return "<intent_recognized>weather</intent_recognized>"
+
+    monkeypatch.setattr(utils, "fetch_inflection", fake_fetch)
+    with record() as trace:
+        result = await run_step("intent", utils.get_response([], ["intent_recognized"]))
+    assert result == {"intent_recognized": "weather"}
+
+    spans = spans_by_name(trace)
+    assert spans["get_response"].parent_id == spans["intent"].id
+    assert spans["parse_xml_response"].parent_id == spans["get_response"].id
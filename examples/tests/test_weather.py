@@ -0,0 +1,63 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import pytest
+from stubs import forecast_app, start_stub, stats
+from http_client import close_session
+from weather import WeatherClient, celsius_to_fahrenheit
+
+
+@pytest.mark.asyncio
+async def test_single_upstream_call_with_local_conversion():
+    app = forecast_app(temperature_celsius=1.0)
+    runner, url = await start_stub(app)
+    try:
+        client = WeatherClient(base_url=url)
+        weather = await client.get_weather("40.7128", "-74.0060")
+
+        assert weather == {"temperature_celsius": 1.0, "temperature_fahrenheit": 33.8}
+        assert app[stats]["requests"] == 1
+    finally:
+        await close_session()
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_cache_is_keyed_by_coordinate_bucket():
+    app = forecast_app(latency=0.05)
+    runner, url = await start_stub(app)
+    try:
+        client = WeatherClient(base_url=url, precision=1)
+        # Concurrent lookups in the same bucket share one request, later ones hit the cache
+        await asyncio.gather(*(client.get_weather("21.3069", "-157.8583") for _ in range(5)))
+        await client.get_weather("21.31", "-157.86")
+        assert app[stats]["requests"] == 1
+
+        await client.get_weather("19.8968", "-155.5828")
+        assert app[stats]["requests"] == 2
+    finally:
+        await close_session()
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_cache_entries_expire():
+    app = forecast_app()
+    runner, url = await start_stub(app)
+    try:
+        client = WeatherClient(base_url=url, ttl=0.0)
+        await client.get_weather("21.3", "-157.8")
+        await client.get_weather("21.3", "-157.8")
+        assert app[stats]["requests"] == 2
+    finally:
+        await close_session()
+        await runner.cleanup()
+
+
+def test_celsius_to_fahrenheit():
+    assert celsius_to_fahrenheit(0) == 32.0
+    assert celsius_to_fahrenheit(-40) == -40.0
@@ -0,0 +1,172 @@
+import sys
+import os
+
+# Add the parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import asyncio
+import pytest
+import workflow as workflow_module
+from workflow import Workflow, WorkflowError, llm_node
+
+
+def pipeline(calls, delay=0.05):
+    workflow = Workflow("pipeline")
+
+    @workflow.node()
+    async def intent(query):
+        calls.append("intent")
+        await asyncio.sleep(delay)
+        return "weather"
+
+    @workflow.node()
+    async def coordinates(query):
+        calls.append("coordinates")
+        await asyncio.sleep(delay * 2)
+        return (40.7, -74.0)
+
+    @workflow.node(cache=False)
+    def weather(coordinates):
+        calls.append("weather")
+        return {"temperature": 21}
+
+    @workflow.node()
+    async def answer(query, intent, weather):
+        calls.append("answer")
+        return f"{intent}: {weather['temperature']}"
+
+    return workflow
+
+
+@pytest.mark.asyncio
+async def test_independent_nodes_run_concurrently():
+    calls = []
+    start_time = time.perf_counter()
+    run = await pipeline(calls).run({"query": "weather in NYC?"})
+    assert time.perf_counter() - start_time < 0.14
+    assert run.outputs["answer"] == "weather: 21"
+    # The slower branch determines the run time
+    assert run.critical_path() == ["coordinates", "weather", "answer"]
+    assert [node["name"] for node in run.report()["nodes"]][:2] in (["intent", "coordinates"], ["coordinates", "intent"])
+
+
+@pytest.mark.asyncio
+async def test_outputs_are_memoized_by_input_hash():
+    calls = []
+    workflow = pipeline(calls, delay=0)
+    await workflow.run({"query": "weather in NYC?"})
+    calls.clear()
+
+    run = await workflow.run({"query": "weather in NYC?"})
+    # weather isn't cached, and its unchanged output lets answer come from the memo
+    assert calls == ["weather"]
+    assert run.timings["intent"].status == "cached"
+    assert run.timings["answer"].status == "cached"
+
+    calls.clear()
+    await workflow.run({"query": "weather in Paris?"})
+    assert sorted(calls) == ["answer", "coordinates", "intent", "weather"]
+
+
+@pytest.mark.asyncio
+async def test_only_inputs_hashable_by_content_are_memoized():
+    np = pytest.importorskip("numpy")
+    workflow, calls = Workflow("inputs"), []
+
+    @workflow.node()
+    def total(values):
+        calls.append("total")
+        return {"sum": float(sum(values))}
+
+    large = np.zeros(10_000)
+    await workflow.run({"values": large})
+    changed = large.copy()
+    changed[5000] = 1.0
+    # Both arrays have the same (elided) repr
+    assert (await workflow.run({"values": changed})).outputs["total"] == {"sum": 1.0}
+    await workflow.run({"values": changed.copy()})
+    assert calls == ["total", "total"]
+
+    # Sets aren't JSON, so they aren't hashed at all
+    await workflow.run({"values": {1, 2}})
+    await workflow.run({"values": {1, 2}})
+    assert calls == ["total"] * 4
+
+
+@pytest.mark.asyncio
+async def test_memoized_outputs_are_copies():
+    workflow = Workflow("copies")
+
+    @workflow.node()
+    def settings(name):
+        return {"name": name, "tags": []}
+
+    first = await workflow.run({"name": "a"})
+    first.outputs["settings"]["tags"].append("modified")
+    second = await workflow.run({"name": "a"})
+    assert second.timings["settings"].status == "cached"
+    assert second.outputs["settings"] == {"name": "a", "tags": []}
+
+
+@pytest.mark.asyncio
+async def test_targets_run_only_what_they_need():
+    calls = []
+    run = await pipeline(calls, delay=0).run({"query": "q"}, targets=["intent"])
+    assert calls == ["intent"]
+    assert "answer" not in run.outputs
+
+
+@pytest.mark.asyncio
+async def test_failed_node_cancels_the_rest():
+    workflow = Workflow("failing")
+    cancelled = []
+
+    @workflow.node()
+    async def slow(x):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    @workflow.node()
+    async def broken(x):
+        raise ValueError("bad input")
+
+    with pytest.raises(WorkflowError) as e:
+        await workflow.run({"x": 1})
+    assert e.value.node == "broken"
+    assert isinstance(e.value.__cause__, ValueError)
+    assert cancelled == ["slow"]
+    assert e.value.run.timings["slow"].status == "cancelled"
+
+
+def test_plan_rejects_cycles_and_unknown_inputs():
+    workflow = Workflow("invalid")
+    workflow.add("a", lambda b: b)
+    workflow.add("b", lambda a: a)
+    with pytest.raises(ValueError):
+        workflow.plan([])
+
+    workflow = Workflow("missing input")
+    workflow.add("a", lambda x: x)
+    with pytest.raises(KeyError):
+        workflow.plan([])
+    assert workflow.plan(["x"]) == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_llm_node(monkeypatch):
+    requests = []
+
+    async def fake_get_response(context, keys, model, legacy_api=True):
+        requests.append(context[-1]["text"])
+        return {key: "yes" for key in keys}
+
+    monkeypatch.setattr(workflow_module, "get_response", fake_get_response)
+    workflow = Workflow("llm")
+    workflow.add("verdict", llm_node("Judge the input.", ["compliant"], "code"))
+    run = await workflow.run({"code": "def f(): pass"})
+    assert run.outputs["verdict"] == {"compliant": "yes"}
+    assert requests == ["User's input: def f(): pass"]
@@ -0,0 +1,221 @@
+# Description: Token counting helpers based on tiktoken, with per-model context budgets, truncation policies and usage totals.
+import logging
+import contextvars
+import tiktoken
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Union
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# The Inflection tokenizer isn't public, cl100k_base is a close enough estimate for accounting purposes
+encoding_name = "cl100k_base"
+
+# Prompt token budget per model, checked before a request is sent. Adjust with `set_context_budget`.
+context_budgets: Dict[str, int] = {
+    "inflection_3_pi": 8000,
+    "inflection_3_productivity": 8000,
+    "inflection_3_with_tools": 8000,
+}
+default_context_budget = 8000
+
+# Approximate per-message framing overhead (role markers, separators)
+message_overhead = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = encoding_name) -> tiktoken.Encoding:
+    return tiktoken.get_encoding(name)
+
+
+def message_text(message: Dict[str, str]) -> str:
+    """Returns the text of a message in either the legacy (type/text) or OpenAI (role/content) format."""
+    return message.get("text") or message.get("content") or ""
+
+
+def is_system_message(message: Dict[str, str]) -> bool:
+    return message.get("type") == "Instruction" or message.get("role") == "system"
+
+
+@lru_cache(maxsize=None)
+def _default_encoding() -> Optional[tiktoken.Encoding]:
+    try:
+        return get_encoding()
+    except Exception as e:
+        # tiktoken downloads the encoding on first use, which fails offline
+        logger.warning(f"Couldn't load the {encoding_name} encoding, estimating 4 characters per token: {str(e)}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _default_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+@lru_cache(maxsize=4096)
+def _cached_count(text: str) -> int:
+    return count_tokens(text)
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    """
+    Token count of a message's text. Counts are cached by text, so system prompts and few-shot
+    examples repeated across requests are only encoded once.
+    """
+    return _cached_count(message_text(message))
+
+
+def count_context_tokens(context: List[Dict[str, str]]) -> int:
+    return sum(message_tokens(message) for message in context)
+
+
+def request_tokens(context: List[Dict[str, str]]) -> int:
+    """Estimated prompt tokens of a request: message texts plus per-message overhead."""
+    return count_context_tokens(context) + message_overhead * len(context)
+
+
+def chunk_text(text: str, max_tokens: int, encoding: str = encoding_name) -> List[str]:
+    """Splits text into consecutive chunks of at most `max_tokens` tokens."""
+    enc = get_encoding(encoding)
+    tokens = enc.encode(text)
+    return [enc.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+class TokenBudgetExceeded(ValueError):
+    """Raised before sending when a request doesn't fit the model's context budget."""
+
+    def __init__(self, model: str, tokens: int, budget: int):
+        super().__init__(f"Request of {tokens} tokens exceeds the {budget} token budget of model '{model}'")
+        self.model = model
+        self.tokens = tokens
+        self.budget = budget
+
+
+def get_context_budget(model: str) -> int:
+    return context_budgets.get(model, default_context_budget)
+
+
+def set_context_budget(model: str, tokens: int) -> None:
+    context_budgets[model] = tokens
+
+
+# Truncation policies take the context and the budget and return a context that fits, or raise TokenBudgetExceeded.
+TruncationPolicy = Callable[[List[Dict[str, str]], int, str], List[Dict[str, str]]]
+
+
+def fail_fast(context: List[Dict[str, str]], budget: int, model: str) -> List[Dict[str, str]]:
+    raise TokenBudgetExceeded(model, request_tokens(context), budget)
+
+
+def drop_oldest(context: List[Dict[str, str]], budget: int, model: str) -> List[Dict[str, str]]:
+    """Drops the oldest turns after the system prompt, always keeping the system prompt and the last message."""
+    context = list(context)
+    while request_tokens(context) > budget:
+        droppable = [i for i, message in enumerate(context[:-1]) if not is_system_message(message)]
+        if not droppable:
+            return fail_fast(context, budget, model)
+        del context[droppable[0]]
+    return context
+
+
+truncation_marker = "\n[...truncated...]\n"
+
+
+def trim_artifacts(context: List[Dict[str, str]], budget: int, model: str) -> List[Dict[str, str]]:
+    """
+    Shortens the largest non-system message (typically an embedded artifact or retrieved document)
+    by cutting out its middle, keeping the beginning and the end, until the request fits.
+    """
+    context = list(context)
+    while (excess := request_tokens(context) - budget) > 0:
+        candidates = [i for i, message in enumerate(context) if not is_system_message(message)]
+        if not candidates:
+            return fail_fast(context, budget, model)
+        index = max(candidates, key=lambda i: message_tokens(context[i]))
+        text = message_text(context[index])
+        tokens = message_tokens(context[index])
+        if tokens <= excess + count_tokens(truncation_marker):
+            return fail_fast(context, budget, model)
+        # Estimate the characters to cut from the message's chars/token ratio, with a small margin
+        cut = int(len(text) * (excess + count_tokens(truncation_marker) + 8) / tokens)
+        head = (len(text) - cut) // 2
+        trimmed = text[:head] + truncation_marker + text[len(text) - (len(text) - cut - head):]
+        message = dict(context[index])
+        message["text" if "text" in message else "content"] = trimmed
+        context[index] = message
+    return context
+
+
+truncation_policies: Dict[str, TruncationPolicy] = {
+    "fail": fail_fast,
+    "drop_oldest": drop_oldest,
+    "trim_artifacts": trim_artifacts,
+}
+
+
+@traced()
+def enforce_budget(
+        context: List[Dict[str, str]],
+        model: str,
+        policy: Union[str, TruncationPolicy] = "fail",
+        budget: Optional[int] = None,
+        ) -> List[Dict[str, str]]:
+    """
+    Returns `context` unchanged when it fits the model's prompt budget, otherwise the result of
+    the truncation `policy` (a name from `truncation_policies` or a callable).
+
+    Raises:
+        TokenBudgetExceeded: The request doesn't fit and the policy can't make it fit.
+    """
+    budget = budget if budget is not None else get_context_budget(model)
+    tokens = request_tokens(context)
+    if tokens <= budget:
+        return context
+    policy_function = truncation_policies[policy] if isinstance(policy, str) else policy
+    truncated = policy_function(context, budget, model)
+    logger.info(f"Truncated request from {tokens} to {request_tokens(truncated)} tokens to fit the {budget} token budget of model '{model}'")
+    return truncated
+
+
+# The caller that token usage is attributed to, see `attribute_usage`
+current_caller: contextvars.ContextVar[str] = contextvars.ContextVar("current_caller", default="default")
+
+
+@contextmanager
+def attribute_usage(caller: str) -> Iterator[None]:
+    """Attributes the token usage of every request made inside the block (including in tasks it starts) to `caller`."""
+    token = current_caller.set(caller)
+    try:
+        yield
+    finally:
+        current_caller.reset(token)
+
+
+class TokenUsage:
+    """Running prompt/completion token totals per model and per caller."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.by_model: Dict[str, Dict[str, int]] = defaultdict(lambda: {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        self.by_caller: Dict[str, Dict[str, int]] = defaultdict(lambda: {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0})
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int = 0, caller: Optional[str] = None) -> None:
+        for totals in (self.by_model[model], self.by_caller[caller or current_caller.get()]):
+            totals["requests"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+
+    def report(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        return {
+            "by_model": {model: dict(totals) for model, totals in self.by_model.items()},
+            "by_caller": {caller: dict(totals) for caller, totals in self.by_caller.items()},
+        }
+
+
+usage = TokenUsage()
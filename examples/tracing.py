@@ -0,0 +1,160 @@
+# Description: Lightweight tracing: nested spans propagated through asyncio tasks and threads via contextvars, exported as Chrome trace-event JSON.
+import json
+import time
+import asyncio
+import inspect
+import logging
+import functools
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Span(NamedTuple):
+    id: int
+    parent_id: Optional[int]
+    name: str
+    start_ns: int
+    end_ns: int
+    lane: Tuple[int, int]  # (thread, asyncio task) the span ran on
+    lane_name: str
+    status: str  # "ok" or the name of the exception raised
+    attributes: Dict[str, Any]
+
+
+class Trace:
+    """The spans recorded while `record()` was active. Spans may be appended from worker threads."""
+
+    def __init__(self, name: str = "trace"):
+        self.name = name
+        self.started_ns = time.perf_counter_ns()
+        self.spans: List[Span] = []
+        self._ids = iter(range(1, 1 << 62))
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count and total/max duration per span name, slowest first."""
+        totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        for span in self.spans:
+            duration = (span.end_ns - span.start_ns) / 1e6
+            totals[span.name]["count"] += 1
+            totals[span.name]["total_ms"] += duration
+            totals[span.name]["max_ms"] = max(totals[span.name]["max_ms"], duration)
+        ordered = sorted(totals.items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        return {name: {key: round(value, 2) for key, value in values.items()} for name, values in ordered}
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """
+        The trace in the Chrome trace-event format, to open in chrome://tracing or https://ui.perfetto.dev.
+        Every asyncio task and thread gets its own row, so concurrent work shows as a waterfall.
+        """
+        lanes: Dict[Tuple[int, int], int] = {}
+        events: List[Dict[str, Any]] = []
+        for span in sorted(self.spans, key=lambda span: span.start_ns):
+            if span.lane not in lanes:
+                lanes[span.lane] = len(lanes) + 1
+                events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": lanes[span.lane],
+                               "args": {"name": span.lane_name}})
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(" ", 1)[0],
+                "ph": "X",
+                "ts": (span.start_ns - self.started_ns) / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": 1,
+                "tid": lanes[span.lane],
+                "args": {"id": span.id, "parent_id": span.parent_id, "status": span.status, **span.attributes},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace": self.name}}
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_chrome(), file, default=repr)
+        logger.info(f"Saved {len(self.spans)} span(s) of trace '{self.name}' to {path}")
+
+
+# The trace being recorded and the innermost open span; both are copied into tasks and `asyncio.to_thread` calls
+current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+current_span: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("current_span", default=None)
+
+
+@contextmanager
+def record(name: str = "trace") -> Iterator[Trace]:
+    """
+    Records the spans of everything run inside the block, including in the tasks and threads it starts.
+
+        with tracing.record("handle_query") as trace:
+            await handle_query(query)
+        trace.save("handle_query.json")
+    """
+    trace = Trace(name)
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+
+
+def _lane() -> Tuple[Tuple[int, int], str]:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return (threading.get_ident(), id(task)), task.get_name()
+    return (threading.get_ident(), 0), threading.current_thread().name
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[None]:
+    """Times the block as a span, nested under the current one. Costs a contextvar lookup when not recording."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = trace.next_id()
+    parent_id = current_span.get()
+    token = current_span.set(span_id)
+    lane, lane_name = _lane()
+    start_ns, status = time.perf_counter_ns(), "ok"
+    try:
+        yield
+    except BaseException as e:
+        status = type(e).__name__
+        raise
+    finally:
+        current_span.reset(token)
+        trace.spans.append(Span(span_id, parent_id, name, start_ns, time.perf_counter_ns(), lane, lane_name, status, attributes))
+
+
+def traced(name: Optional[str] = None, **attributes: Any) -> Callable[[Callable], Callable]:
+    """Decorator running each call of a sync or async function in a span, named after the function by default."""
+    def decorator(function: Callable) -> Callable:
+        span_name = name or function.__name__
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                if current_trace.get() is None:
+                    return await function(*args, **kwargs)
+                with span(span_name, **attributes):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if current_trace.get() is None:
+                return function(*args, **kwargs)
+            with span(span_name, **attributes):
+                return function(*args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -1,7 +1,10 @@
 import re
 from typing import Dict
 from inference import fetch as fetch_inflection
+from prompts import format_message, template_for
+from tracing import traced
 
+@traced()
 def parse_xml_response(xml_string: str, keys_to_search: list) -> Dict[str, object]:
     result = {}
     for k in keys_to_search:
@@ -12,6 +15,7 @@ def parse_xml_response(xml_string: str, keys_to_search: list) -> Dict[str, objec
         result[k] = value
     return result
 
+@traced()
 async def get_response(
         context, 
         keys, 
@@ -32,25 +36,4 @@ async def get_response(
     return parse_xml_response(result, keys)
 
 def get_context(system_prompt: str, user_message: str, user_input_label: str = "User's input", legacy_api: bool = True) -> list:
-    if legacy_api:
-        context = [
-            {"type": "Instruction", 
-             "text": system_prompt
-             },
-            {
-                "type": "Human",
-                "text": f"{user_input_label}: {user_message}",
-                },
-        ]
-        return context
-    else: #OpenAI API
-        context = [
-            {"role": "system", 
-             "content": system_prompt
-            },
-            {
-            "role": "user",
-            "content": f"{user_input_label}: {user_message}",
-            },
-        ]
-    return context
\ No newline at end of file
+    return template_for(system_prompt).render(f"{user_input_label}: {user_message}", legacy_api=legacy_api)
@@ -0,0 +1,143 @@
+# Description: Async weather tool backed by the Open-Meteo forecast API, with a TTL cache keyed by rounded coordinates.
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+from cassettes import request_json
+from http_client import get_session
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Point WEATHER_API_URL at a local stand-in (see stubs.py) to run the tool offline
+weather_api_url = os.getenv("WEATHER_API_URL", "https://api.open-meteo.com")
+
+
+def celsius_to_fahrenheit(celsius: float) -> float:
+    return round(celsius * 9 / 5 + 32, 1)
+
+
+class WeatherClient:
+    """
+    Fetches the current temperature for a location.
+
+    A single upstream call is made in Celsius and Fahrenheit is derived locally. Results are cached
+    for `ttl` seconds per coordinate bucket (coordinates rounded to `precision` decimals, 1 decimal is
+    roughly 11 km), and concurrent lookups for the same bucket share one upstream request.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, ttl: float = 600.0, precision: int = 1):
+        self.base_url = base_url or weather_api_url
+        self.ttl = ttl
+        self.precision = precision
+        self._cache: Dict[Tuple[float, float], Tuple[float, Dict[str, float]]] = {}
+        self._in_flight: Dict[Tuple[float, float], asyncio.Task] = {}
+
+    def bucket(self, latitude: float, longitude: float) -> Tuple[float, float]:
+        return round(latitude, self.precision), round(longitude, self.precision)
+
+    @traced()
+    async def get_weather(self, latitude: str, longitude: str) -> Dict[str, float]:
+        """
+        Get the weather information for the given latitude and longitude.
+        """
+        key = self.bucket(float(latitude), float(longitude))
+
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return dict(cached[1])
+
+        # Share one upstream request between concurrent lookups for the same bucket; the task is
+        # shielded so a cancelled caller doesn't abort the request for everyone else.
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return dict(await asyncio.shield(task))
+
+    async def _refresh(self, key: Tuple[float, float]) -> Dict[str, float]:
+        weather = await self._fetch(*key)
+        self._cache[key] = (time.monotonic() + self.ttl, weather)
+        return weather
+
+    @traced("weather api")
+    async def _fetch(self, latitude: float, longitude: float) -> Dict[str, float]:
+        params = {
+            "latitude": str(latitude),
+            "longitude": str(longitude),
+            "current": "temperature_2m,wind_speed_10m",
+            "temperature_unit": "celsius",
+        }
+        start_time = time.time()
+        data = await request_json(get_session(), "GET", self.base_url + "/v1/forecast", params=params)
+        duration = (time.time() - start_time) * 1000
+        logger.info(f"Weather API request took {duration:.2f} ms")
+
+        temperature_celsius = data["current"]["temperature_2m"]
+        return {
+            "temperature_celsius": temperature_celsius,
+            "temperature_fahrenheit": celsius_to_fahrenheit(temperature_celsius),
+        }
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+weather_client = WeatherClient()
+
+# Tool definition for the tool-calling model, see agent.ToolRegistry
+get_weather_tool = {
+    "type": "function",
+    "function": {
+        "name": "get_weather",
+        "description": "Get the weather for a given location",
+        "parameters": {
+            "properties": {
+                "latitude": {
+                    "type": "string",
+                    "description": "Latitude of the location"
+                },
+                "longitude": {
+                    "type": "string",
+                    "description": "Longitude of the location"
+                }
+            },
+            "required": ["latitude", "longitude"],
+            "type": "object",
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+async def get_weather(latitude: str, longitude: str) -> Dict[str, float]:
+    """
+    Get the weather information for the given latitude and longitude using the shared client.
+    """
+    return await weather_client.get_weather(latitude, longitude)
+
+
+if __name__ == "__main__":
+    # Offline benchmark: cold vs cached lookups against the local forecast stand-in
+    from stubs import forecast_app, start_stub
+    from http_client import close_session
+
+    async def main(n: int = 200) -> None:
+        runner, url = await start_stub(forecast_app(latency=0.05))
+        client = WeatherClient(base_url=url)
+        try:
+            start = time.perf_counter()
+            await client.get_weather("21.3069", "-157.8583")
+            cold = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client.get_weather("21.31", "-157.86") for _ in range(n)))
+            warm = (time.perf_counter() - start) * 1000 / n
+            print(f"cold lookup: {cold:.2f} ms, cached lookup: {warm:.4f} ms ({n} calls)")
+        finally:
+            await close_session()
+            await runner.cleanup()
+
+    asyncio.run(main())
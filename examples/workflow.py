@@ -0,0 +1,250 @@
+# Description: Declarative workflow DAGs: steps declare their inputs, independent steps run concurrently, outputs are memoized and each run reports its critical path.
+import copy
+import json
+import time
+import asyncio
+import hashlib
+import inspect
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from deadline import step
+from utils import get_context, get_response
+
+logger = logging.getLogger(__name__)
+
+
+class Node(NamedTuple):
+    name: str
+    function: Callable[..., Any]  # called with one keyword argument per input
+    inputs: Tuple[str, ...]  # names of other nodes or of workflow inputs
+    cache: bool  # memoize the output by the hash of the inputs
+
+
+class NodeTiming(NamedTuple):
+    name: str
+    inputs: Tuple[str, ...]
+    start_ms: float  # since the run started
+    end_ms: float
+    status: str  # "ok", "cached", "error" or "cancelled"
+
+
+class WorkflowRun:
+    """The outputs of one run and the timing of every node it executed."""
+
+    def __init__(self, workflow: str):
+        self.workflow = workflow
+        self.started_at = time.perf_counter()
+        self.outputs: Dict[str, Any] = {}
+        self.timings: Dict[str, NodeTiming] = {}
+
+    def critical_path(self) -> List[str]:
+        """The chain of nodes that determined the run time: from the last node to finish, back through the input that finished last."""
+        if not self.timings:
+            return []
+        path = [max(self.timings.values(), key=lambda timing: timing.end_ms).name]
+        while True:
+            inputs = [self.timings[name] for name in self.timings[path[-1]].inputs if name in self.timings]
+            if not inputs:
+                return path[::-1]
+            path.append(max(inputs, key=lambda timing: timing.end_ms).name)
+
+    def report(self) -> Dict[str, Any]:
+        path = self.critical_path()
+        return {
+            "workflow": self.workflow,
+            "elapsed_ms": round(max((timing.end_ms for timing in self.timings.values()), default=0.0), 2),
+            "critical_path": path,
+            "critical_path_ms": {name: round(self.timings[name].end_ms - self.timings[name].start_ms, 2) for name in path},
+            "nodes": [timing._asdict() for timing in sorted(self.timings.values(), key=lambda timing: timing.start_ms)],
+        }
+
+
+class WorkflowError(Exception):
+    """Raised when a node fails. `run` holds the outputs and timings so far."""
+
+    def __init__(self, node: str, run: WorkflowRun):
+        super().__init__(f"Node '{node}' of workflow '{run.workflow}' failed")
+        self.node = node
+        self.run = run
+
+
+def _encode_input(value: Any) -> Any:
+    # Arrays by content; their repr elides the middle of large arrays. Object arrays hold pointers.
+    dtype = getattr(value, "dtype", None)
+    if dtype is not None and hasattr(value, "tobytes") and not dtype.hasobject:
+        return {"__array__": [str(dtype), list(getattr(value, "shape", ())), hashlib.sha256(value.tobytes()).hexdigest()]}
+    # Anything else has no stable encoding: a default repr contains the object's address
+    raise TypeError(f"Object of type {type(value).__name__} can't be hashed by content")
+
+
+def _hash_inputs(node: Node, arguments: Dict[str, Any]) -> Optional[str]:
+    """The memo key of a node's inputs, or None if they can't be hashed by content and the output mustn't be cached."""
+    try:
+        payload = json.dumps(arguments, sort_keys=True, default=_encode_input)
+    except (TypeError, ValueError) as e:
+        logger.info(f"Not caching node '{node.name}': {str(e)}")
+        return None
+    return hashlib.sha256(f"{node.name}\0{node.function.__qualname__}\0{payload}".encode("utf-8")).hexdigest()
+
+
+class Workflow:
+    """
+    A DAG of steps. Each node is a function, sync or async, whose parameters name the nodes or
+    workflow inputs it depends on:
+
+        workflow = Workflow("rag")
+
+        @workflow.node()
+        async def chunks(question):
+            return await retrieve(question)
+
+        @workflow.node()
+        async def answer(question, chunks):
+            ...
+
+        run = await workflow.run({"question": "..."})
+        run.outputs["answer"], run.report()["critical_path"]
+
+    Nodes run as soon as their inputs are ready, so independent nodes run concurrently.
+    Outputs of nodes with `cache=True` are memoized by the hash of their inputs, across runs;
+    use `cache=False` for nodes with side effects or time dependent outputs, e.g. the weather.
+    Only JSON-serializable inputs and arrays are hashed, a node called with anything else runs every
+    time. The memo holds copies, so callers may modify the outputs they get.
+    """
+
+    def __init__(self, name: str, memo_size: int = 256):
+        self.name = name
+        self.nodes: Dict[str, Node] = {}
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[str, Any]" = OrderedDict()
+        self.stats = {"runs": 0, "executed": 0, "cached": 0}
+
+    def add(self, name: str, function: Callable[..., Any], inputs: Optional[Sequence[str]] = None, cache: bool = True) -> Node:
+        """Adds a node. `inputs` defaults to the parameter names of `function`."""
+        if name in self.nodes:
+            raise ValueError(f"Workflow '{self.name}' already has a node '{name}'")
+        if inputs is None:
+            inputs = list(inspect.signature(function).parameters)
+        node = Node(name, function, tuple(inputs), cache)
+        self.nodes[name] = node
+        return node
+
+    def node(self, name: Optional[str] = None, inputs: Optional[Sequence[str]] = None, cache: bool = True):
+        """Decorator form of `add`, named after the function by default."""
+        def decorator(function: Callable[..., Any]) -> Callable[..., Any]:
+            self.add(name or function.__name__, function, inputs, cache)
+            return function
+        return decorator
+
+    def plan(self, inputs: Sequence[str], targets: Optional[Sequence[str]] = None) -> List[str]:
+        """The nodes needed for `targets` (default: all), in dependency order."""
+        order: List[str] = []
+        visiting = set()
+
+        def visit(name: str) -> None:
+            if name in order or name in inputs:
+                return
+            if name not in self.nodes:
+                raise KeyError(f"'{name}' is neither a node of workflow '{self.name}' nor one of its inputs")
+            if name in visiting:
+                raise ValueError(f"Workflow '{self.name}' has a cycle through '{name}'")
+            visiting.add(name)
+            for dependency in self.nodes[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for target in targets or self.nodes:
+            visit(target)
+        return order
+
+    async def _execute(self, node: Node, arguments: Dict[str, Any]) -> Tuple[Any, bool]:
+        key = _hash_inputs(node, arguments) if node.cache else None
+        if key is not None and key in self._memo:
+            self._memo.move_to_end(key)
+            self.stats["cached"] += 1
+            return copy.deepcopy(self._memo[key]), True
+
+        self.stats["executed"] += 1
+        async with step(f"node {node.name}"):
+            if inspect.iscoroutinefunction(node.function):
+                output = await node.function(**arguments)
+            else:
+                output = await asyncio.to_thread(node.function, **arguments)
+        # None is how the API helpers report a failed request, so it's not remembered
+        if key is not None and output is not None:
+            self._memo[key] = copy.deepcopy(output)
+            if len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return output, False
+
+    async def run(self, inputs: Dict[str, Any], targets: Optional[Sequence[str]] = None) -> WorkflowRun:
+        """
+        Runs the nodes needed for `targets` (default: all) and returns the run with every node output.
+
+        Raises:
+            WorkflowError: A node raised; the other nodes are cancelled.
+        """
+        order = self.plan(list(inputs), targets)
+        run = WorkflowRun(self.name)
+        run.outputs.update(inputs)
+        self.stats["runs"] += 1
+        tasks: Dict[str, asyncio.Task] = {}
+
+        def elapsed_ms() -> float:
+            return round((time.perf_counter() - run.started_at) * 1000, 2)
+
+        async def run_node(node: Node) -> None:
+            await asyncio.gather(*(tasks[name] for name in node.inputs if name in tasks))
+            start_ms = elapsed_ms()
+            try:
+                output, cached = await self._execute(node, {name: run.outputs[name] for name in node.inputs})
+                run.outputs[node.name] = output
+                status = "cached" if cached else "ok"
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            except Exception as e:
+                status = "error"
+                raise WorkflowError(node.name, run) from e
+            finally:
+                run.timings[node.name] = NodeTiming(node.name, node.inputs, start_ms, elapsed_ms(), status)
+
+        for name in order:
+            tasks[name] = asyncio.create_task(run_node(self.nodes[name]))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException as e:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            if isinstance(e, WorkflowError):
+                logger.error(f"{e}: {e.__cause__}")
+            raise
+        logger.info(f"Workflow '{self.name}' took {elapsed_ms():.2f} ms, critical path {' -> '.join(run.critical_path())}")
+        return run
+
+
+def llm_node(
+        system_prompt: str,
+        keys: Sequence[str],
+        input: str,
+        user_input_label: str = "User's input",
+        model: str = "inflection_3_productivity",
+        legacy_api: bool = True,
+        ) -> Callable[..., Any]:
+    """
+    A node function that sends the `input` node (or workflow input) to `get_response` and returns the parsed keys.
+
+        workflow.add("intent", llm_node(sip_intent_recognition, ["intent_recognized"], "query"))
+    """
+    async def call(**arguments: Any) -> Dict[str, object]:
+        context = get_context(system_prompt, str(arguments[input]), user_input_label=user_input_label, legacy_api=legacy_api)
+        return await get_response(context, list(keys), model, legacy_api=legacy_api)
+
+    # Part of the memo key, so nodes with different prompts or settings don't share outputs
+    prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:12]
+    call.__qualname__ = f"llm_node[{prompt_hash}:{','.join(keys)}:{user_input_label}:{model}:{legacy_api}]"
+    call.__signature__ = inspect.Signature([inspect.Parameter(input, inspect.Parameter.KEYWORD_ONLY)])
+    return call